@@ -0,0 +1,153 @@
+import os
+# Worker processes have no display, so render figures off screen. This has
+# to be set before main imports matplotlib
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import sim_logging
+import main
+
+
+def summarize(network):
+    '''
+    Returns a dict of summary statistics for a finished simulation
+    '''
+    flows = {}
+    for flow_id, flow in network.flows.items():
+        duration = None
+        throughput = None
+        if flow.time_finished is not None:
+            duration = flow.time_finished - flow.time_spawn
+            if duration > 0:
+                throughput = flow.size / duration
+        delays = flow.packet_delays.values
+        flows[flow_id] = {
+            "finished": flow.finished,
+            "time_finished": flow.time_finished,
+            "duration": duration,
+            "throughput": throughput,
+            "mean_packet_delay": sum(delays) / len(delays) if delays else None
+        }
+
+    links = {}
+    for link_id, link in network.links.items():
+        links[link_id] = {
+            "dropped": link.total_dropped
+        }
+
+    return {
+        "end_time": network.curr_time,
+        "flows": flows,
+        "links": links
+    }
+
+
+def run_one(filename, event_driven=False, make_graphs=False, quiet=True):
+    '''
+    Run a single scenario and return a result dict. Exceptions are caught
+    and recorded in the result, so that one bad scenario does not take the
+    rest of the batch down with it.
+    '''
+    if quiet:
+        sim_logging.set_stdout_level("WARNING")
+    result = {"filename": filename}
+    start = time.perf_counter()
+    try:
+        network = main.run_simulation(filename, event_driven,
+                                      make_graphs=make_graphs)
+        result["ok"] = True
+        result["summary"] = summarize(network)
+    except Exception:
+        result["ok"] = False
+        result["error"] = traceback.format_exc()
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+def expand_patterns(patterns):
+    '''
+    Expand a list of file names and glob patterns into a sorted list of
+    files without duplicates. A pattern that matches nothing is kept as is,
+    so that it shows up as a failed run instead of silently disappearing.
+    '''
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for filename in matches:
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def run_batch(patterns, workers=None, event_driven=False, make_graphs=False,
+              quiet=True):
+    '''
+    Run every scenario matched by patterns in a pool of worker processes.
+    Returns the results in the order of the scenarios.
+    '''
+    filenames = expand_patterns(patterns)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_one, filename, event_driven, make_graphs,
+                            quiet): filename
+            for filename in filenames
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                # The worker itself died, e.g. it ran out of memory
+                result = {"filename": filename, "ok": False,
+                          "error": traceback.format_exc(), "wall_time": None}
+            results[filename] = result
+            print_result(result)
+    return [results[filename] for filename in filenames]
+
+
+def print_result(result):
+    if not result["ok"]:
+        print("FAILED  %s" % result["filename"])
+        print(result["error"])
+        return
+    summary = result["summary"]
+    print("ok      %-40s wall %7.2fs  sim %8.3fs  dropped %d" % (
+        result["filename"], result["wall_time"], summary["end_time"],
+        sum(link["dropped"] for link in summary["links"].values())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run many network simulations in parallel")
+    parser.add_argument("scenarios", nargs="+",
+                        help="scenario JSON files or glob patterns")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, default one per core")
+    parser.add_argument("--events", action="store_true",
+                        help="use the event driven engine")
+    parser.add_argument("--graphs", action="store_true",
+                        help="also render the graphs of every run")
+    parser.add_argument("--verbose", action="store_true",
+                        help="let the workers print their log messages")
+    parser.add_argument("--summary-out",
+                        help="write the results of every run to this JSON file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_batch(args.scenarios, args.workers, args.events,
+                        args.graphs, not args.verbose)
+    num_failed = sum(1 for result in results if not result["ok"])
+    print("%d runs, %d failed, %.2fs" % (len(results), num_failed,
+                                         time.perf_counter() - start))
+
+    if args.summary_out:
+        with open(args.summary_out, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if num_failed else 0)
@@ -0,0 +1,296 @@
+import io
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import sim_logging
+import main
+import topology_generator
+from host import Host
+from router import Router
+from link import Link
+from flow import Flow
+
+# The bundled scenarios that are benchmarked
+SCENARIOS = ["test0.json", "test1.json", "test2.json", "test3.json",
+             "test5.json"]
+
+# Generated topologies that are benchmarked, as (name, topology function,
+# arguments, number of flows). The flows are kept small so that the
+# benchmark is about the size of the network rather than the run length.
+# They start once the routing tables have been flooded
+GENERATED = [
+    ("dumbbell_8", topology_generator.dumbbell, (8,), 8),
+    ("fat_tree_4", topology_generator.fat_tree, (4,), 8),
+    ("grid_6x6", topology_generator.grid, (6, 6), 8),
+]
+
+# Component types whose time is measured with --split
+COMPONENTS = ("host", "router", "link", "flow")
+
+# The methods that are timed, and the component their time is counted for.
+# Hosts and routers do most of their work when a link hands them a packet,
+# so receive_packet is timed along with run
+TIMED_METHODS = (("host", Host, "run"), ("host", Host, "receive_packet"),
+                 ("router", Router, "run"),
+                 ("router", Router, "receive_packet"),
+                 ("link", Link, "run"),
+                 ("flow", Flow, "run"), ("flow", Flow, "receive_packet"))
+
+# Default file that benchmark results are appended to
+HISTORY_FILE = "benchmark_history.json"
+
+
+class ComponentTimer:
+    '''
+    Times the TIMED_METHODS of every component type while it is installed.
+    The times are exclusive: when a link hands a packet to a host, which
+    hands it to its flow, the time is split between the link, the host and
+    the flow.
+    '''
+
+    def __init__(self):
+        self.times = dict((name, 0.0) for name in COMPONENTS)
+        self.calls = dict((name, 0) for name in COMPONENTS)
+        # Time spent in nested timed calls, one entry per active call
+        self.child_times = []
+        self.originals = []
+
+    def wrap(self, name, method):
+        timer = self
+        def timed(*args):
+            timer.child_times.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = timer.child_times.pop()
+                timer.times[name] += elapsed - children
+                timer.calls[name] += 1
+                if timer.child_times:
+                    timer.child_times[-1] += elapsed
+        return timed
+
+    def install(self):
+        for name, cls, attr in TIMED_METHODS:
+            method = getattr(cls, attr)
+            self.originals.append((cls, attr, method))
+            setattr(cls, attr, self.wrap(name, method))
+
+    def uninstall(self):
+        for cls, attr, method in reversed(self.originals):
+            setattr(cls, attr, method)
+        self.originals = []
+
+
+def load_case(name):
+    '''
+    Returns the scenario of a benchmark case as loaded JSON
+    '''
+    for case, topology, args, num_flows in GENERATED:
+        if case == name:
+            f = io.StringIO()
+            topology_generator.write_scenario(
+                f, topology(*args), num_flows, data="uniform:0.5:2",
+                start="uniform:0.5:1.5", seed=1)
+            return json.loads(f.getvalue())
+    with open(name) as f:
+        return json.load(f)
+
+
+def run_case(name, event_driven=False, split=False):
+    '''
+    Run one benchmark case and return its measurements. Meant to be run in
+    a fresh process so that the peak RSS is the case's own. Timing every
+    component call costs about as much as the calls themselves, so with
+    split the case is run a second time to measure the time split, and the
+    other numbers come from the run without timers.
+    '''
+    sim_logging.set_stdout_level("WARNING")
+    net_data = load_case(name)
+    start = time.perf_counter()
+    network = main.run_config(net_data, name, event_driven, make_graphs=False)
+    wall_time = time.perf_counter() - start
+
+    result = {
+        "wall_time": wall_time,
+        "sim_time": network.curr_time,
+        "sim_per_wall": network.curr_time / wall_time,
+        "packets": network.packets_created,
+        "packets_per_sec": network.packets_created / wall_time,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+    if split:
+        timer = ComponentTimer()
+        timer.install()
+        try:
+            main.run_config(net_data, name, event_driven, make_graphs=False)
+        finally:
+            timer.uninstall()
+        result["component_time"] = timer.times
+        result["component_calls"] = timer.calls
+    return result
+
+
+def run_isolated(name, event_driven, split):
+    # A new process for every case, so that the peak RSS of one case does
+    # not carry over to the next
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, name, event_driven, split).result()
+
+
+def run_suite(cases, repeat=1, event_driven=False, split=False):
+    '''
+    Run every case repeat times and keep the fastest run of each
+    '''
+    results = {}
+    for name in cases:
+        best = None
+        for _ in range(repeat):
+            result = run_isolated(name, event_driven, split)
+            if best is None or result["wall_time"] < best["wall_time"]:
+                best = result
+        results[name] = best
+        print_case(name, best)
+    return results
+
+
+def print_case(name, result):
+    line = "%-14s %8.2fs wall  %8.2f sim s/s  %10.0f pkts/s  %7.1f MB" % (
+        name, result["wall_time"], result["sim_per_wall"],
+        result["packets_per_sec"], result["peak_rss_mb"])
+    if "component_time" in result:
+        total = sum(result["component_time"].values()) or 1
+        line += "  " + " ".join(
+            "%s %2.0f%%" % (component, 100 * t / total)
+            for component, t in result["component_time"].items())
+    print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def append_history(filename, entry):
+    history = load_history(filename)
+    history.append(entry)
+    with open(filename, "w") as f:
+        json.dump(history, f, indent=1)
+
+
+def find_entry(history, key):
+    '''
+    Find an entry by label, revision, or index into the history (e.g. -1
+    for the latest)
+    '''
+    for entry in reversed(history):
+        if key in (entry.get("label"), entry.get("revision")):
+            return entry
+    return history[int(key)]
+
+
+def compare(base, new, threshold):
+    '''
+    Compare two history entries. Returns a list of regressions, each a
+    string describing a metric that got worse by more than threshold (a
+    fraction) in a case that is in both entries.
+    '''
+    regressions = []
+    # For each metric, whether bigger is better
+    metrics = (("sim_per_wall", True), ("packets_per_sec", True),
+               ("peak_rss_mb", False))
+    for name, new_result in new["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            continue
+        for metric, bigger_is_better in metrics:
+            old_value = base_result[metric]
+            new_value = new_result[metric]
+            if old_value == 0:
+                continue
+            change = (new_value - old_value) / old_value
+            print("%-14s %-16s %12.2f -> %12.2f  %+6.1f%%" % (
+                name, metric, old_value, new_value, 100 * change))
+            worse = -change if bigger_is_better else change
+            if worse > threshold:
+                regressions.append("%s %s %+.1f%%" % (name, metric,
+                                                      100 * change))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the simulator")
+    parser.add_argument("--history", default=HISTORY_FILE,
+                        help="JSON file of past results")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("cases", nargs="*",
+                            help="scenario files or generated case names, "
+                                 "default all of them")
+    run_parser.add_argument("--repeat", type=int, default=1,
+                            help="run each case this many times, keep the best")
+    run_parser.add_argument("--events", action="store_true",
+                            help="use the event driven engine")
+    run_parser.add_argument("--split", action="store_true",
+                            help="also measure the time split between host, "
+                                 "router, link and flow runs, in a second run")
+    run_parser.add_argument("--label", help="name of this run in the history")
+    run_parser.add_argument("--no-save", action="store_true",
+                            help="don't add the results to the history")
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two runs from the history")
+    compare_parser.add_argument("base", nargs="?", default="-2",
+                                help="label, revision or index, default -2")
+    compare_parser.add_argument("new", nargs="?", default="-1",
+                                help="label, revision or index, default -1")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="fraction a metric may get worse by")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        cases = args.cases or SCENARIOS + [case[0] for case in GENERATED]
+        results = run_suite(cases, args.repeat, args.events, args.split)
+        if not args.no_save:
+            append_history(args.history, {
+                "label": args.label,
+                "revision": git_revision(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "engine": "events" if args.events else "stepped",
+                "results": results
+            })
+    else:
+        history = load_history(args.history)
+        if len(history) < 2:
+            sys.exit("Need at least two runs in " + args.history)
+        regressions = compare(find_entry(history, args.base),
+                              find_entry(history, args.new), args.threshold)
+        if regressions:
+            print("Regressions beyond %.0f%%:" % (100 * args.threshold))
+            for regression in regressions:
+                print("    " + regression)
+            sys.exit(1)
+        print("No regressions beyond %.0f%%" % (100 * args.threshold))
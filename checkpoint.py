@@ -0,0 +1,134 @@
+import os
+import sys
+import zlib
+import pickle
+import random
+import struct
+from profiler import Profiler
+from topology import convert_to_bits, convert_to_seconds
+from utils import KB, Mb
+
+# A checkpoint file is MAGIC, the format version as a 2 byte big endian
+# integer, and then the zlib compressed pickle of a dict holding the
+# network and the state of the random module. The network is pickled as a
+# whole, so the file holds everything that the simulation continues from:
+# the link buffers and the packets in flight, the TCP state of the flows,
+# the routing tables, the pending routing epochs and timers, and the
+# metrics recorded so far.
+MAGIC = b"NETSIMCK"
+VERSION = 1
+HEADER = struct.Struct(">8sH")
+
+# The network is a graph of objects that point at each other, which pickle
+# walks recursively. Large topologies need more than the default limit
+RECURSION_LIMIT = 100000
+
+
+class CheckpointError(ValueError):
+    '''
+    Raised when a file is not a checkpoint that this version can load
+    '''
+    pass
+
+
+def save_checkpoint(network, filename, level=6):
+    '''
+    Save the network to filename. It must be between two timesteps (or
+    events), which is where the engines call this from when a checkpoint
+    was added with Network.add_checkpoint.
+    '''
+    state = {
+        "network": network,
+        "random_state": random.getstate()
+    }
+    # The profiler and the tracer belong to this run, and the tracer has a
+    # writer thread and an open file
+    profiler, network.profiler = network.profiler, None
+    tracer, network.tracer = network.tracer, None
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+    finally:
+        sys.setrecursionlimit(limit)
+        network.profiler = profiler
+        network.tracer = tracer
+
+    # Write to a temporary file first, so that an interrupted run never
+    # leaves a truncated checkpoint behind
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION))
+        f.write(zlib.compress(data, level))
+    os.replace(tmp, filename)
+
+
+def load_checkpoint(filename):
+    '''
+    Load a network saved by save_checkpoint and restore the state of the
+    random module, so that network.run_network() continues exactly as the
+    original run did. Every load gives an independent copy of the network,
+    so several variants can be forked from one checkpoint.
+    '''
+    with open(filename, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise CheckpointError(filename + " is not a checkpoint")
+        magic, version = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise CheckpointError(filename + " is not a checkpoint")
+        if version != VERSION:
+            raise CheckpointError(filename + " has checkpoint version " +
+                                  str(version) + ", expected " + str(VERSION))
+        data = zlib.decompress(f.read())
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        state = pickle.loads(data)
+    finally:
+        sys.setrecursionlimit(limit)
+
+    network = state["network"]
+    network.profiler = Profiler()
+    random.setstate(state["random_state"])
+    return network
+
+
+def apply_parameters(network, point, link_ids=None, flow_ids=None):
+    '''
+    Set the values of a sweep point (see sweep.py) on the links and flows
+    of a running network, e.g. one that was just loaded from a checkpoint.
+    Both directions of a scenario link are changed. Packets that are already
+    in flight keep their timing. "link_ids" and "flow_ids" restrict which
+    links and flows of the scenario are changed, by default all of them are.
+    The ids may be given as numbers or strings.
+    '''
+    if link_ids is not None:
+        link_ids = set(str(link_id) for link_id in link_ids)
+    if flow_ids is not None:
+        flow_ids = set(str(flow_id) for flow_id in flow_ids)
+    topology = network.topology
+    for index, link in enumerate(topology.links):
+        spec = topology.link_specs[index]
+        if link_ids is not None and str(spec["id"]) not in link_ids:
+            continue
+        if "link_rate" in point:
+            link.capacity = convert_to_bits(float(point["link_rate"]), Mb)
+        if "buff_size" in point:
+            link.queue_capacity = convert_to_bits(float(point["buff_size"]), KB)
+        if "prop_delay" in point:
+            link.prop_time = convert_to_seconds(float(point["prop_delay"]))
+
+    for _, flow in network.flows.items():
+        if flow_ids is not None and str(flow.id) not in flow_ids:
+            continue
+        if "window" in point:
+            flow.window = float(point["window"])
+        if "protocol" in point:
+            flow.set_protocol(point["protocol"])
+        for name in ("alpha", "gamma", "th"):
+            if name in point:
+                setattr(flow, name, float(point[name]))
+        # The new values may make the flow due earlier than it was armed
+        network.schedule_wakeup(flow)
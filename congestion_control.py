@@ -0,0 +1,278 @@
+import logging
+from collections import deque
+from sim_logging import get_logger
+
+log = get_logger("flow")
+
+
+class CongestionControl:
+    '''
+    Decides the window of a flow. The flow handles sending, acknowledging
+    and retransmitting packets and measures the round trip times, and calls
+    into its congestion control when something happens that may change the
+    window. The window, ssthresh and phase ("SS", "CA" or "FR") are kept on
+    the flow, since they are graphed and logged from there.
+
+    This base class leaves the window alone except on a timeout, which is
+    what a flow without a protocol does.
+    '''
+
+    def __init__(self, flow):
+        # The flow whose window this controls
+        self.flow = flow
+
+    def on_first_rtt(self):
+        '''
+        Called once the flow has measured its first round trip time
+        '''
+        pass
+
+    def on_ack(self):
+        '''
+        Called for an ACK that acknowledges new packets
+        '''
+        pass
+
+    def on_dup_ack(self):
+        '''
+        Called for an ACK that repeats the previous one.
+        flow.repeated_ack_count is the number of repeats so far.
+        '''
+        pass
+
+    def on_timeout(self):
+        '''
+        Called on a retransmission timeout, after the flow went back to
+        resending from its first unacknowledged packet. Sets ssthresh to
+        max(W/2, 2) and restarts slow start from a window of 1.
+        '''
+        flow = self.flow
+        flow.ssthresh = max(flow.window / 2, 2)
+        flow.window = 1
+        flow.tcp_phase = "SS"
+
+    def on_tick(self):
+        '''
+        Called every time the flow runs, for window updates that happen
+        over time rather than on ACKs
+        '''
+        pass
+
+    def next_timer(self):
+        '''
+        Returns the next time at which on_tick has something to do, for the
+        flow's timer. Infinity if there is none.
+        '''
+        return float("inf")
+
+
+class Reno(CongestionControl):
+    '''
+    TCP Reno: slow start, additive increase in congestion avoidance, and
+    fast retransmit / fast recovery after three duplicate ACKs
+    '''
+
+    def on_ack(self):
+        flow = self.flow
+        # Reset rto timer upon successful ack
+        flow.rto_timer = flow.curr_time
+        if flow.tcp_phase == "FR":
+            self.recovery_ack()
+        self.grow_window(True)
+        self.log_window()
+
+    def on_dup_ack(self):
+        flow = self.flow
+        # Reset rto timer upon 3 dup ack
+        if flow.repeated_ack_count == 3:
+            flow.rto_timer = flow.curr_time
+        if flow.tcp_phase == "FR":
+            # exit fr if window is large enough, otherwise inflate it
+            if flow.window >= 3 * flow.ssthresh - 1:
+                self.exit_frfr()
+            else:
+                flow.window += 1
+        elif flow.repeated_ack_count >= 3:
+            # If not in frfr and we get 3 dup acks, enter frfr
+            self.enter_frfr()
+        self.grow_window(False)
+        self.log_window()
+
+    def recovery_ack(self):
+        '''
+        A new ACK in fast recovery ends it
+        '''
+        self.exit_frfr()
+
+    def enter_frfr(self):
+        # 3 duplicate ack, enter frfr
+        flow = self.flow
+        log.debug(" duplicate acks")
+        flow.ssthresh = max(flow.window / 2, 2)
+        flow.window = flow.ssthresh + 3
+        flow.tcp_phase = "FR"
+        # Resend the lost packet
+        flow.send_single_packet(flow.expecting_packet)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(" sent packet %s of flow %s", flow.expecting_packet,
+                      flow.id)
+
+    def exit_frfr(self):
+        flow = self.flow
+        flow.tcp_phase = "CA"
+        flow.window = flow.ssthresh
+
+    def grow_window(self, new_ack):
+        '''
+        Slow start and congestion avoidance. new_ack is False for a
+        duplicate ACK, which only ends slow start
+        '''
+        flow = self.flow
+        if flow.tcp_phase == "SS":
+            # in slow start SS phase
+            if flow.window >= flow.ssthresh:
+                # if reach ssthresh, enter CA
+                flow.tcp_phase = "CA"
+            elif new_ack:
+                # still SS, increment window
+                flow.window += 1
+        elif flow.tcp_phase == "CA":
+            # in congestion avoidance CA (linear) phase
+            if new_ack:
+                flow.window += 1 / flow.window
+
+    def log_window(self):
+        flow = self.flow
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s %s W = %s dup-ack = %s", flow.curr_time,
+                      flow.tcp_phase, flow.window, flow.repeated_ack_count)
+
+
+class Fast(Reno):
+    '''
+    FAST TCP. Slow start ends when the queueing delay passes a threshold,
+    and in congestion avoidance the window is set once every other round
+    trip time from the ratio of the minimum to the current RTT:
+
+        W <- min(2W, (1 - gamma) W + gamma (min_rtt / rtt W + alpha))
+
+    The change is spread over n_window_inc equal steps. alpha, gamma, th
+    and n_window_inc are read from the flow. Fast retransmit and recovery
+    are the same as in Reno.
+    '''
+
+    def __init__(self, flow):
+        super().__init__(flow)
+
+        # FAST window update time marker
+        self.rtt_endpoint = float("inf")
+        # False -> freeze, True -> update window
+        self.is_update_rtt = False
+        # Amount to update window by for each increment
+        self.window_increment = 0
+        # The times for incrementally updating the window over the period
+        self.next_update_times = deque()
+        # Slow start only grows the window on every other ACK
+        self.update_flag = False
+
+    def on_first_rtt(self):
+        flow = self.flow
+        self.rtt_endpoint = flow.curr_time + flow.avg_rtt
+
+    def recovery_ack(self):
+        flow = self.flow
+        unack_packets = flow.unack_packets
+        if (len(unack_packets) > 0 and
+            unack_packets.first_packet() == flow.expecting_packet and
+            unack_packets.first_send_time() < flow.curr_time - flow.rto):
+            # if the new expecting packet was sent too long ago
+            self.enter_frfr()
+        else:
+            self.exit_frfr()
+
+    def exit_frfr(self):
+        super().exit_frfr()
+        # Reset things when we exit frfr
+        self.rtt_endpoint = self.flow.curr_time
+        self.is_update_rtt = False
+
+    def grow_window(self, new_ack):
+        flow = self.flow
+        if flow.tcp_phase == "SS" and self.update_flag:
+            if (flow.window >= flow.ssthresh or
+                (1/flow.min_rtt - 1/flow.rtt) != 0 and
+                flow.window * flow.min_rtt >= flow.th / (1/flow.min_rtt - 1/flow.rtt)):
+                # if reach ssthresh, enter CA
+                flow.tcp_phase = "CA"
+            elif new_ack:
+                # still SS, increment window
+                flow.window += 1
+        self.update_flag = not self.update_flag
+
+    def calculate_window_change(self):
+        '''
+        Returns the change of the window over the next update period
+        '''
+        flow = self.flow
+        delta_w = 1
+        if flow.tcp_phase == "CA":
+            delta_w = min(
+                2 * flow.window,
+                (1-flow.gamma) * (flow.window) +
+                (flow.gamma) * (flow.min_rtt / flow.rtt * flow.window + flow.alpha)
+            ) - flow.window
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s W = %s  W_new = %s", flow.tcp_phase, flow.window,
+                      delta_w + flow.window)
+        return delta_w
+
+    def on_tick(self):
+        flow = self.flow
+        if flow.tcp_phase != "CA":
+            return
+        curr_time = flow.curr_time
+
+        # If we reach the rtt endpoint, switch to the next rtt period
+        if self.rtt_endpoint <= curr_time:
+            if self.is_update_rtt:
+                # Schecule update of window, split it up over timesteps
+                self.window_increment = \
+                    self.calculate_window_change() / flow.n_window_inc
+                delta_t = flow.avg_rtt / flow.n_window_inc
+                # Mark the update times in a list
+                while delta_t <= flow.avg_rtt:
+                    self.next_update_times.append(curr_time + delta_t)
+                    delta_t += flow.avg_rtt / flow.n_window_inc
+            self.is_update_rtt = not self.is_update_rtt
+            self.rtt_endpoint = curr_time + flow.avg_rtt
+
+        # If we have updates scheduled at this time
+        if (len(self.next_update_times) > 0 and
+            curr_time >= self.next_update_times[0]):
+            # Update window by an increment
+            flow.window += self.window_increment
+            self.next_update_times.popleft()
+
+    def next_timer(self):
+        if self.flow.tcp_phase != "CA":
+            return float("inf")
+        wakeup_time = self.rtt_endpoint
+        if len(self.next_update_times) > 0:
+            wakeup_time = min(wakeup_time, self.next_update_times[0])
+        return wakeup_time
+
+
+# Congestion controls that can be named in the "protocol" field of a flow
+CONGESTION_CONTROLS = {
+    "": CongestionControl,
+    "NONE": CongestionControl,
+    "RENO": Reno,
+    "FAST": Fast
+}
+
+
+def create_congestion_control(name, flow):
+    '''
+    Create the congestion control of flow from its name, ignoring case
+    '''
+    return CONGESTION_CONTROLS[name.upper()](flow)
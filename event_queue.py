@@ -0,0 +1,285 @@
+import heapq
+from bisect import bisect_left
+from itertools import accumulate, chain, islice, repeat
+
+
+class EventQueue:
+    '''
+    A priority queue of timed callbacks.
+    Events are ordered by time, and events scheduled for the same time are
+    run in the order that they were scheduled.
+    '''
+
+    def __init__(self):
+        # Heap of entries. Each entry is a LIST of the form
+        # [time, sequence number, callback, args] so that it can be
+        # cancelled in place by clearing the callback
+        self.heap = []
+
+        # Tie breaker so that events at the same time keep their order
+        self.sequence = 0
+
+    def schedule(self, time, callback, *args):
+        '''
+        Schedule callback(*args) to be run at the given time. Returns the
+        entry so that the caller can cancel it later.
+        '''
+        entry = [time, self.sequence, callback, args]
+        self.sequence += 1
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        '''
+        Cancel an event that was returned by schedule. The entry stays in
+        the heap and is skipped when it reaches the top.
+        '''
+        entry[2] = None
+
+    def peek_time(self):
+        '''
+        Returns the time of the next event, or infinity if there is none
+        '''
+        heap = self.heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        if heap:
+            return heap[0][0]
+        return float("inf")
+
+    def pop(self):
+        '''
+        Remove the next event and return it as a tuple of the form
+        (time, callback, args). Returns None if there are no events left.
+        '''
+        heap = self.heap
+        while heap:
+            time, _, callback, args = heapq.heappop(heap)
+            if callback is not None:
+                return time, callback, args
+        return None
+
+    def __len__(self):
+        return len(self.heap)
+
+
+# Number of steps whose times StepQueue computes at once
+CHUNK_STEPS = 16384
+
+# Positions in a StepQueue entry, which is a LIST of the form
+# [step, phase, order, sequence number, callback, args, time, offset]
+STEP, PHASE, ORDER, SEQUENCE, CALLBACK, ARGS, TIME, OFFSET = range(8)
+
+
+class StepQueue:
+    '''
+    The event queue of the event driven engine. The stepped engine does
+    everything at the times of its steps, so for both engines to give the
+    same results every event here is run at a step as well: an event for
+    some time runs at the first step whose time plus the event's offset is
+    not before it. The events of one step are run by phase, which is the
+    order in which the stepped engine runs the parts of a step, then by
+    order, the position of the component in the network. An event for a
+    phase of the current step that already ran is run at the next step.
+
+    The stepped engine gets the time of a step by adding the timestep to
+    the time of the step before. The times here are summed the same way,
+    CHUNK_STEPS at a time, so that they are exactly the same. Only the
+    times of the steps around the current one are kept. Events further
+    ahead wait in a second heap, ordered by time, until the steps reach
+    them. Steps with no events are never visited.
+    '''
+
+    def __init__(self, time, timestep):
+        self.timestep = timestep
+
+        # The times of the steps from first_step to last_step
+        self.first_step = 0
+        self.last_step = 0
+        self.times = [time]
+        self.add_steps()
+
+        # The step, phase and order of the event that ran last
+        self.step = 0
+        self.phase = -1
+        self.order = -1
+
+        # Heap of the entries whose step is known
+        self.heap = []
+
+        # Heap of [time - offset, sequence number, entry] for the entries
+        # past the known steps
+        self.future = []
+
+        # Tie breaker so that events at the same step, phase and order keep
+        # their order
+        self.sequence = 0
+
+    def add_steps(self):
+        '''
+        Compute the times of the next CHUNK_STEPS steps. The times of the
+        last two known steps are kept, so that the step before any step
+        that can be run is always known.
+        '''
+        times = self.times
+        steps = accumulate(chain([times[-1]],
+                                 repeat(self.timestep, CHUNK_STEPS)))
+        self.first_step += max(len(times) - 2, 0)
+        self.times = times[-2:] + list(islice(steps, 1, None))
+        self.last_step = self.first_step + len(self.times) - 1
+
+    def set_timestep(self, timestep):
+        '''
+        Space the steps after the current one by a new timestep. The events
+        that were scheduled for a time move to the steps of the new times,
+        the ones scheduled for a step keep their step.
+        '''
+        self.timestep = timestep
+        self.times = self.times[:self.step - self.first_step + 1]
+        self.last_step = self.step
+        entries = self.heap + [item[2] for item in self.future]
+        self.heap = [entry for entry in entries
+                     if entry[TIME] is None and entry[CALLBACK] is not None]
+        heapq.heapify(self.heap)
+        self.future = []
+        self.add_steps()
+        for entry in entries:
+            if entry[TIME] is not None and entry[CALLBACK] is not None and \
+                    not self.place(entry):
+                heapq.heappush(self.future, [entry[TIME] - entry[OFFSET],
+                                             entry[SEQUENCE], entry])
+
+    def time_of(self, step):
+        '''
+        Returns the time of a step, which must be the current step, the one
+        before it or a later one
+        '''
+        while step > self.last_step:
+            self.add_steps()
+            self.place_future()
+        return self.times[step - self.first_step]
+
+    def step_of(self, time, offset=0):
+        '''
+        Returns the first known step whose time plus offset is not before
+        time, or None if that is past the known steps
+        '''
+        times = self.times
+        if offset == 0:
+            index = bisect_left(times, time)
+        else:
+            index = bisect_left(times, time - offset)
+            # The subtraction may round either way
+            while index > 0 and times[index - 1] + offset >= time:
+                index -= 1
+            while index < len(times) and times[index] + offset < time:
+                index += 1
+        if index == len(times):
+            return None
+        return self.first_step + index
+
+    def schedule(self, time, phase, order, callback, *args, offset=0):
+        '''
+        Schedule callback(*args) to be run at the first step whose time plus
+        offset is not before time, in the given phase and order. Returns the
+        entry so that the caller can cancel it later.
+        '''
+        entry = [None, phase, order, self.sequence, callback, args, time,
+                 offset]
+        self.sequence += 1
+        if not self.place(entry):
+            heapq.heappush(self.future,
+                           [time - offset, entry[SEQUENCE], entry])
+        return entry
+
+    def schedule_step(self, step, phase, order, callback, *args):
+        '''
+        Schedule callback(*args) to be run at the given step
+        '''
+        entry = [step, phase, order, self.sequence, callback, args, None, 0]
+        self.sequence += 1
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def place(self, entry):
+        '''
+        Give an entry its step and put it in the heap. Returns False if its
+        step is past the known steps.
+        '''
+        step = self.step_of(entry[TIME], entry[OFFSET])
+        if step is None:
+            return False
+        if step < self.step:
+            step = self.step
+        if step == self.step and \
+                (entry[PHASE], entry[ORDER]) <= (self.phase, self.order):
+            step += 1
+            if step > self.last_step:
+                return False
+        entry[STEP] = step
+        heapq.heappush(self.heap, entry)
+        return True
+
+    def place_future(self):
+        '''
+        Move the entries that the known steps reach into the heap
+        '''
+        future = self.future
+        last_time = self.times[-1]
+        later = []
+        while future and future[0][0] <= last_time:
+            entry = heapq.heappop(future)[2]
+            if entry[CALLBACK] is not None and not self.place(entry):
+                later.append([entry[TIME] - entry[OFFSET], entry[SEQUENCE],
+                              entry])
+        for item in later:
+            heapq.heappush(future, item)
+
+    def cancel(self, entry):
+        '''
+        Cancel an event that was returned by schedule. The entry stays in
+        its heap and is skipped when it reaches the top.
+        '''
+        entry[CALLBACK] = None
+
+    def peek_step(self):
+        '''
+        Returns the step of the next event, or None if there are no events
+        left
+        '''
+        heap = self.heap
+        while True:
+            while heap and heap[0][CALLBACK] is None:
+                heapq.heappop(heap)
+            # An event past the known steps may come before the first one
+            # in the heap
+            if self.future and (not heap or heap[0][STEP] > self.last_step):
+                self.add_steps()
+                self.place_future()
+                continue
+            if heap:
+                return heap[0][STEP]
+            return None
+
+    def pop(self):
+        '''
+        Remove the next event and return it as a tuple of the form
+        (step, callback, args). Returns None if there are no events left.
+        '''
+        heap = self.heap
+        # Only look for events past the known steps when there may be some
+        if self.future or not heap or heap[0][CALLBACK] is None:
+            if self.peek_step() is None:
+                return None
+        entry = heapq.heappop(heap)
+        step = self.step = entry[STEP]
+        self.phase = entry[PHASE]
+        self.order = entry[ORDER]
+        # Events scheduled while this one runs may be for the next step
+        if step >= self.last_step:
+            self.add_steps()
+            self.place_future()
+        return step, entry[CALLBACK], entry[ARGS]
+
+    def __len__(self):
+        return len(self.heap) + len(self.future)
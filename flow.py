@@ -1,9 +1,16 @@
 from utils import (
     DEBUG, RENO, PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE
 )
-from math import ceil
+from math import ceil, nextafter
+from sliding_window import SenderWindow, ReceiverWindow
+from sim_logging import get_logger
+from packet_trace import RECEIVE
+from congestion_control import create_congestion_control
+import logging
 import random
 
+log = get_logger("flow")
+
 class Flow:
 
     def __init__(self, size, source, destination, time_spawn, window, protocol,
@@ -26,12 +33,16 @@ class Flow:
         self.spawned = False
         # If all packets are acknowledged by receiver
         self.finished = False
+        # The time at which the last packet was acknowledged
+        self.time_finished = None
         # Field to keep track of current time
         self.curr_time = 0
 
         # ================ Source host =============================
-        # Protocol, "", "RENO" or "FAST"
+        # Protocol, a name in CONGESTION_CONTROLS such as "RENO" or "FAST"
         self.protocol = protocol
+        # Decides the window, see congestion_control.py
+        self.congestion_control = create_congestion_control(protocol, self)
         # Current phase: "SS", "CA", "FR"
         self.tcp_phase = "SS"
         # Slow start threshold
@@ -51,8 +62,8 @@ class Flow:
         self.repeated_ack_count = 0
         # The next packet to send in normal situations
         self.next_packet_to_send = 1
-        # Unacknowledged packets of the sender: tuple (pkt_no, sent_time)
-        self.unack_packets = []
+        # Unacknowledged packets of the sender and their send times
+        self.unack_packets = SenderWindow()
         # The current window size
         self.window = window
         # Most current round trip time
@@ -63,36 +74,29 @@ class Flow:
         self.min_rtt = float("inf")
         # Queueing delay
         self.qdelay = 0
-        # FAST window update time marker
-        self.rtt_endpoint = float("inf")
-        # False -> freeze, True -> update window
-        self.is_update_rtt = False
-        # Amount to update window by for each increment
-        self.window_increment = 0
-        # The times for incrementally updating the window over the period
-        self.next_update_times = []
         # Retransmission timeout time
         # Compared to (curr_time - rto_timer) to determine timeout
         self.rto = 3
         # Timeout timer, reset to curr_time at successful acks and timeouts
         self.rto_timer = 0
 
-        self.update_flag = False
-
         # ================ Destination host ========================
         # Received packets of the receiver
-        self.received_packets = {}
+        self.received_packets = ReceiverWindow()
         # The smallest packet that the receiver has not received
         self.next_missing_packet = 1
 
         # ================ Graphing logs ===========================
         # Keep track of the window sizes over time
-        self.window_sizes = []
+        self.window_sizes = network.metrics.create_series(
+            "flow", id, "window_sizes")
         # keep track of the packet delays (time between spawning and arriving)
         # at destination host
-        self.packet_delays = []
+        self.packet_delays = network.metrics.create_series(
+            "flow", id, "packet_delays")
         # Flow rate of the bits recived per time step
-        self.flow_rates = []
+        self.flow_rates = network.metrics.create_series(
+            "flow", id, "flow_rates")
         # Number of packets received over a particular time period
         self.num_packets_received = 0
     
@@ -112,7 +116,7 @@ class Flow:
             #     print(" sent packet", self.next_packet_to_send, "of flow", self.id)
 
             # Update flow's unacknowledged packets list & next packet to send
-            self.unack_packets.append((self.next_packet_to_send, self.curr_time))
+            self.unack_packets.append(self.next_packet_to_send, self.curr_time)
             self.next_packet_to_send += 1
 
 
@@ -137,12 +141,20 @@ class Flow:
         Take a packet/ack that arrives from the link, update the queues
         Send an ack back if a packet is received
         '''
+        if self.network.tracer is not None:
+            # ACKs come back to the source and packets reach the destination
+            host = self.source if pkt.packet_type == ACK else self.destination
+            self.network.tracer.record(RECEIVE, host.incoming_link, pkt)
         # See if it is acknowledgement
         if pkt.packet_type == ACK:
             # Check if all the packets in the flow have been received
             if pkt.expecting_packet == self.num_packets + 1:
-                self.finished = True
-                print("flow no", self.id, "has finished sending")
+                # A duplicate of the last ACK can still arrive afterwards
+                if not self.finished:
+                    self.finished = True
+                    self.time_finished = self.curr_time
+                    self.network.flow_finished(self)
+                    log.info("flow no %s has finished sending", self.id)
                 return
             
             # Book keeping for resetting during a timeout
@@ -158,7 +170,7 @@ class Flow:
             # Initialize average RTT
             if self.avg_rtt < 0:
                 self.avg_rtt = self.rtt
-                self.rtt_endpoint = self.curr_time + self.avg_rtt
+                self.congestion_control.on_first_rtt()
             # Calculate queueing delay
             self.q_delay = self.avg_rtt - self.min_rtt
             # Update average RTT for next iteration
@@ -174,9 +186,7 @@ class Flow:
                 self.repeated_ack_count += 1
 
             # If 0th packet is acked, remove all packets before expecting pkt
-            while (len(self.unack_packets) > 0 and
-            self.unack_packets[0][0] < pkt.expecting_packet):
-                self.unack_packets.pop(0)
+            if self.unack_packets.acknowledge(pkt.expecting_packet) > 0:
                 self.repeated_ack_count = 0
 
             # print(self.tcp_phase, "ack", pkt.expecting_packet,
@@ -189,24 +199,25 @@ class Flow:
             # print("  rto_timer:", self.rto_timer, "RTO:", self.rto)
 
             # Handle the ack according to protocol
-            if self.protocol == "RENO" or self.protocol == "FAST":
-                self.update_flow_control_ack()
+            if self.repeated_ack_count == 0:
+                self.congestion_control.on_ack()
+            else:
+                self.congestion_control.on_dup_ack()
 
         # Check if the received object is a packet
         elif pkt.packet_type == PACKET:
-            # update dictionary for received packets
+            # update the window of received packets
             self.num_packets_received += 1
-            self.received_packets[pkt.packet_no] = True
-            self.packet_delays.append([self.curr_time, self.curr_time - pkt.time_spawn])       
-            if DEBUG:
-                print(" host no", self.destination.id,
-                      "received packet number", pkt.packet_no,
-                      "of flow", pkt.flow.id, "from host no", pkt.source.id,
-                      self.curr_time)
+            self.next_missing_packet = \
+                self.received_packets.receive(pkt.packet_no)
+            self.packet_delays.append(self.curr_time, self.curr_time - pkt.time_spawn)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(" host no %s received packet number %s of flow %s "
+                          "from host no %s %s", self.destination.id,
+                          pkt.packet_no, pkt.flow.id, pkt.source.id,
+                          self.curr_time)
 
             # Create an acknowledgement for the packet
-            while self.next_missing_packet in self.received_packets:
-                self.next_missing_packet += 1
             ack_packet = self.network.create_packet(
                 ACK_SIZE, ACK,
                 pkt.destination, pkt.source, pkt.time_spawn,
@@ -226,122 +237,38 @@ class Flow:
         if (self.curr_time - self.rto_timer) >= self.rto:
             # If this flow has timed out, update flow control
             self.update_flow_control_rto()
-            print(" timeout occured! next_packet_to_send",
-                  self.next_packet_to_send, self.curr_time)
-            self.window_sizes.append([self.curr_time, self.window])
+            log.info(" timeout occured! next_packet_to_send %s %s",
+                     self.next_packet_to_send, self.curr_time)
+            self.window_sizes.append(self.curr_time, self.window)
 
 
     def update_flow_control_rto(self):
-        ''' 
-        Update window size and thresholds according to protocol,
-        upon a retransmission timeout.
-        Set ssthresh to max(W/2, 2), reset W
+        '''
+        Go back to resending from the first unacknowledged packet upon a
+        retransmission timeout, and let the protocol update the window
         '''
         self.rto *= 2
         self.rto_timer = self.curr_time
-        self.ssthresh = max(self.window / 2, 2)
-        self.window = 1
         self.next_packet_to_send = self.expecting_packet
-        self.unack_packets = []
-        self.tcp_phase = "SS"
+        self.unack_packets.clear()
+        self.congestion_control.on_timeout()
 
-        self.window_sizes.append([self.curr_time, self.window])
-        if DEBUG:
-            print(" Timeout", self.curr_time, " W:", self.window, "ssthresh:",
-                  self.ssthresh, "repeated ack:", self.repeated_ack_count)
+        self.window_sizes.append(self.curr_time, self.window)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(" Timeout %s  W: %s ssthresh: %s repeated ack: %s",
+                      self.curr_time, self.window, self.ssthresh,
+                      self.repeated_ack_count)
 
 
-    def calculate_flow_control_fast(self):
+    def set_protocol(self, protocol):
         '''
-        This function is called periodically to calculate the window size
-        according to FAST protocol.
+        Switch to another protocol. The window, ssthresh and phase carry
+        over, any other state of the old protocol is dropped
         '''
-        delta_w = 1
-        if self.tcp_phase == "CA":
-            delta_w = min(
-                2 * self.window,
-                (1-self.gamma) * (self.window) + 
-                (self.gamma) * (self.min_rtt / self.rtt * self.window + self.alpha)
-            ) - self.window
-        print(self.tcp_phase, "W =", self.window, " W_new =", delta_w + self.window)
-        return delta_w
-
-    def enter_frfr(self):
-        # 3 duplicate ack, enter frfr
-        print(" duplicate acks")
-        self.ssthresh = max(self.window / 2, 2)
-        self.window = self.ssthresh + 3
-        self.tcp_phase = "FR"
-        # Resend the lost packet
-        self.send_single_packet(self.expecting_packet)
-        print(" sent packet", self.expecting_packet,
-                "of flow", self.id)
-
-    def update_flow_control_ack(self):
-        ''' 
-        Update window size and thresholds according to RENO protocol,
-        upon receiving an acknowledgement.
-        '''	
-        # Reset rto timer upon successful ack or 3 dup ack
-        if self.repeated_ack_count == 0 or self.repeated_ack_count == 3:
-            self.rto_timer = self.curr_time
-
-        # frfr is approximately the same for both RENO and FAST
-        if self.tcp_phase == "FR":
-            # in fast recovery (exponential) phase
-            if (self.repeated_ack_count == 0 and
-                self.protocol == "FAST" and
-                len(self.unack_packets) > 0 and
-                self.unack_packets[0][0] == self.expecting_packet and
-                self.unack_packets[0][1] < self.curr_time - self.rto):
-                # if the new expecting packet was sent too long ago
-                self.enter_frfr()
-            
-            elif (self.repeated_ack_count == 0 or
-                  self.window >= 3 * self.ssthresh - 1):
-                # exit fr if window is large enough or get successful ack
-                self.tcp_phase = "CA"
-                self.window = self.ssthresh
-                # Reset things when we exit frfr
-                if self.protocol == "FAST":
-                    self.rtt_endpoint = self.curr_time
-                    self.is_update_rtt = False
-            else:
-                self.window += 1
-        
-        # If not in frfr and we get 3 dup acks, enter frfr
-        elif self.repeated_ack_count >= 3:
-            self.enter_frfr()
-
-        if self.protocol == "FAST":
-            if self.tcp_phase == "SS" and self.update_flag:
-                if (self.window >= self.ssthresh or
-                    (1/self.min_rtt - 1/self.rtt) != 0 and
-                    self.window * self.min_rtt >= self.th / (1/self.min_rtt - 1/self.rtt)):
-                    # if reach ssthresh, enter CA
-                    self.tcp_phase = "CA"
-                elif self.repeated_ack_count == 0:
-                    # still SS, increment window
-                    self.window += 1
-            self.update_flag = not self.update_flag
-
-        elif self.protocol == "RENO":
-            if self.tcp_phase == "SS":
-                # in slow start SS phase
-                if self.window >= self.ssthresh:
-                    # if reach ssthresh, enter CA
-                    self.tcp_phase = "CA"
-                elif self.repeated_ack_count == 0:
-                    # still SS, increment window
-                    self.window += 1
-            elif self.tcp_phase == "CA":
-                # in congestion avoidance CA (linear) phase
-                if self.repeated_ack_count == 0:
-                    self.window += 1 / self.window
-
-        print(self.curr_time, self.tcp_phase, "W =",
-                self.window, "dup-ack =", self.repeated_ack_count)
-        
+        self.protocol = protocol
+        self.congestion_control = create_congestion_control(protocol, self)
+        if self.avg_rtt >= 0:
+            self.congestion_control.on_first_rtt()
 
 
     def run(self, curr_time):
@@ -368,48 +295,51 @@ class Flow:
             self.check_for_timeouts()
         
         # periodically update window size
-        if self.protocol == "FAST" and self.tcp_phase == "CA":
+        self.congestion_control.on_tick()
 
-            # If we reach the end of SS, switch to CA
-            if self.tcp_phase == "SS" and self.window >= self.ssthresh:
-                self.tcp_phase = "CA"
-            
-            # If we reach the rtt endpoint, switch to the next rtt period
-            if self.rtt_endpoint <= self.curr_time:
-                if self.is_update_rtt:
-                    # Schecule update of window, split it up over timesteps
-                    self.window_increment = self.calculate_flow_control_fast() / self.n_window_inc
-                    delta_t = self.avg_rtt / self.n_window_inc
-                    # Mark the update times in a list
-                    while delta_t <= self.avg_rtt:
-                        self.next_update_times.append(self.curr_time + delta_t)
-                        delta_t += self.avg_rtt / self.n_window_inc
-                self.is_update_rtt = not self.is_update_rtt
-                self.rtt_endpoint = self.curr_time + self.avg_rtt
-            
-            # If we have updates scheduled at this time
-            if (len(self.next_update_times) > 0 and
-                self.curr_time >= self.next_update_times[0]):
-                # Update window by an increment
-                self.window += self.window_increment
-                self.next_update_times.pop(0)
-
-        # use this so that we dont get every point
-        if self.network.counter % 1000 == 0:
-            self.window_sizes.append([self.curr_time, self.window])
-        if self.network.counter % 5000 == 0:
-            if len(self.flow_rates) != 0:
-                self.flow_rates.append([
-                    curr_time - (5000 * self.network.timestep),
-                    (self.num_packets_received * PACKET_SIZE / 1e6) /
-                    (5000 * self.network.timestep)
-                ])
-            self.flow_rates.append([
-                curr_time,
-                (self.num_packets_received * PACKET_SIZE / 1e6) / 
-                (5000 * self.network.timestep)
-            ])
-            self.num_packets_received = 0 
-        
-        
-            
+
+    def next_wakeup_time(self):
+        '''
+        Returns the earliest time at which the flow has something to do:
+        spawning, sending packets that the window allows, a retransmission
+        timeout or a timer of the congestion control. Returns infinity if
+        there is none.
+        '''
+        if self.finished:
+            return float("inf")
+        if not self.spawned:
+            return self.time_spawn
+
+        # The window has room for more packets, so we can send right away
+        if (len(self.unack_packets) < self.window and
+            self.next_packet_to_send <= self.num_packets):
+            return self.curr_time
+
+        # check_for_timeouts compares (curr_time - rto_timer) with rto, which
+        # may round to just under rto at exactly rto_timer + rto
+        wakeup_time = self.rto_timer + self.rto
+        if wakeup_time <= self.curr_time:
+            wakeup_time = nextafter(self.curr_time, float("inf"))
+
+        return min(wakeup_time, self.congestion_control.next_timer())
+
+
+    def record_window_size(self, curr_time):
+        '''
+        Called by the metrics recorder to sample the window size
+        '''
+        self.window_sizes.append(curr_time, self.window)
+
+
+    def record_flow_rate(self, curr_time, prev_time):
+        '''
+        Called by the metrics recorder to sample the flow rate. It is
+        plotted as a step over the period since the previous sample, which
+        was at prev_time.
+        '''
+        if prev_time is not None and curr_time > prev_time:
+            flow_rate = (self.num_packets_received * PACKET_SIZE / 1e6) / \
+                (curr_time - prev_time)
+            self.flow_rates.append(prev_time, flow_rate)
+            self.flow_rates.append(curr_time, flow_rate)
+        self.num_packets_received = 0
@@ -1,24 +1,53 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+# Figures are only ever saved to files, so never open a display
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from utils import (
     INDIV_SERIES, INDIV_GRAPHS, GRAPHS_TOGETHER, PLOT_PARALLEL, TEST_2_DIRECTION, 
-    ISOLATE_LINKS
+    ISOLATE_LINKS, MAX_PLOT_POINTS
 )
-import os
 
-# Helper function for converting the dictionaries to a list 
-# representation. We use this so that we only have to convert one time 
-# and can store results
-def convert_to_lists(time_dicts, series_labels):
+# The hashes of the inputs of the figures rendered in a directory are kept
+# in this file, so that unchanged figures are not rendered again
+RENDER_CACHE = ".render_cache.json"
+
+# Largest-Triangle-Three-Buckets downsampling. Keeps the first and last
+# points and, for every bucket in between, the point that makes the largest
+# triangle with the point kept from the previous bucket and the average of
+# the next bucket. This keeps the peaks and drops that a plot should show.
+def downsample(x_axis, y_axis, max_points=MAX_PLOT_POINTS):
+    n = len(x_axis)
+    if n <= max_points or max_points < 3:
+        return x_axis, y_axis
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    prev = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x_axis[end:next_end].mean()
+        avg_y = y_axis[end:next_end].mean()
+        area = np.abs((x_axis[prev] - avg_x) * (y_axis[start:end] - y_axis[prev])
+            - (x_axis[prev] - x_axis[start:end]) * (avg_y - y_axis[prev]))
+        prev = start + int(np.argmax(area))
+        keep[i + 1] = prev
+    return x_axis[keep], y_axis[keep]
+
+# Helper function for converting the recorded time series to a list 
+# representation. The columns of each series are plotted directly, so there
+# is no per point work here
+def convert_to_lists(time_series, series_labels):
     all_series = []
-    for i in range(len(time_dicts)):
-        time_dict = time_dicts[i]
-        series = series_labels[i]
-        x_axis = []
-        y_axis = []
-        for element in time_dict:
-            x_axis.append(element[0])
-            y_axis.append(element[1])
-        all_series.append([x_axis, y_axis, series])
+    for i in range(len(time_series)):
+        x_axis, y_axis = downsample(*time_series[i].to_numpy())
+        all_series.append([x_axis, y_axis, series_labels[i]])
     return all_series
 
 # Helper function called to plot each subplot
@@ -52,24 +81,83 @@ def plot_graphs(points_dict, last_time, num_subplots, plot_name, width_scale, \
     plt.savefig(plot_name)
     plt.close()
 
+# A figure to render later. The arguments are the same as plot_graphs
+def add_figure(figures, points_dict, last_time, num_subplots, plot_name, \
+    width_scale, anchor_x, anchor_y, max_time):
+    figures.append((points_dict, last_time, num_subplots, plot_name, \
+        width_scale, anchor_x, anchor_y, max_time))
+
+# A hash of everything that goes into a figure
+def figure_hash(figure):
+    points_dict = figure[0]
+    digest = hashlib.sha256(repr(figure[1:]).encode())
+    for y_label, series_list in points_dict.items():
+        digest.update(y_label.encode())
+        for x_axis, y_axis, series in series_list:
+            digest.update(series.encode())
+            digest.update(np.ascontiguousarray(x_axis).tobytes())
+            digest.update(np.ascontiguousarray(y_axis).tobytes())
+    return digest.hexdigest()
+
+def render_figure(figure):
+    plot_graphs(*figure)
+    return figure[3]
+
+def load_render_cache(directory):
+    try:
+        with open(os.path.join(directory, RENDER_CACHE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_render_cache(directory, cache):
+    with open(os.path.join(directory, RENDER_CACHE), 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+# Render the figures that are missing or whose inputs changed since the last
+# render. With more than one worker the figures are rendered in a process
+# pool. Returns the number of figures that were rendered.
+def render_figures(figures, directory, workers=1):
+    cache = load_render_cache(directory)
+    todo = []
+    hashes = {}
+    for figure in figures:
+        plot_name = figure[3]
+        key = os.path.relpath(plot_name, directory)
+        hashes[key] = figure_hash(figure)
+        if cache.get(key) != hashes[key] or not os.path.exists(plot_name):
+            todo.append(figure)
+
+    if workers == 1 or len(todo) <= 1:
+        rendered = [render_figure(figure) for figure in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = list(executor.map(render_figure, todo))
+
+    for plot_name in rendered:
+        key = os.path.relpath(plot_name, directory)
+        cache[key] = hashes[key]
+    save_render_cache(directory, cache)
+    return len(rendered)
+
 # Each graph separate, but series are not separate
-def plot_each_graph_separate(points_dict, last_time, test_case, protocol, max_time):
+def plot_each_graph_separate(figures, points_dict, last_time, test_case, protocol, max_time):
     for item in points_dict.items():
         graph_dict = {}
         graph_dict[item[0]] = item[1]
-        plot_graphs(graph_dict, last_time, 1, test_case + '/' + protocol + 
+        add_figure(figures, graph_dict, last_time, 1, test_case + '/' + protocol + 
             item[0].split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
 
 # For each series in each graph, we should plot them separately
-def plot_each_series_separate(points_dict, last_time, test_case, protocol, max_time):
+def plot_each_series_separate(figures, points_dict, last_time, test_case, protocol, max_time):
     for item in points_dict.items():
         for i in range(len(item[1])):
             series_dict = {}
             series_dict[item[0]] = [item[1][i]]
-            plot_graphs(series_dict, last_time, 1, test_case + '/' + protocol +
+            add_figure(figures, series_dict, last_time, 1, test_case + '/' + protocol +
                 item[1][i][2] + item[0].split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
 
-def plot_2_direction(data, last_time, y_label, protocol, max_time):
+def plot_2_direction(figures, data, last_time, y_label, protocol, max_time):
     L1_right = None
     L1_left = None
     L2_right = None
@@ -89,9 +177,9 @@ def plot_2_direction(data, last_time, y_label, protocol, max_time):
             L3_right = element
         elif element[2] == 'L3_left':
             L3_left = element
-    plot_graphs({y_label: [L1_right, L2_right, L3_right]}, last_time, 1, 'test2/' + \
+    add_figure(figures, {y_label: [L1_right, L2_right, L3_right]}, last_time, 1, 'test2/' + \
     'test2RightDirection' + protocol + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
-    plot_graphs({y_label: [L1_left, L2_left, L3_left]}, last_time, 1, 'test2/' + \
+    add_figure(figures, {y_label: [L1_left, L2_left, L3_left]}, last_time, 1, 'test2/' + \
     'test2LeftDirection' + protocol + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
 
 # Below are the series' we need to plot together:
@@ -99,7 +187,7 @@ def plot_2_direction(data, last_time, y_label, protocol, max_time):
 # L3_right and L4_right
 # L1_left and L2_left
 # L3_left and L4_left
-def plot_parallel_links(data, last_time, y_label, protocol, max_time):
+def plot_parallel_links(figures, data, last_time, y_label, protocol, max_time):
     L1_right = None
     L1_left = None
     L2_right = None
@@ -125,13 +213,13 @@ def plot_parallel_links(data, last_time, y_label, protocol, max_time):
             L4_right = element
         elif element[2] == 'L4_left':
             L4_left = element
-    plot_graphs({y_label: [L1_right, L2_right]}, last_time, 1, 'test1/' +  
+    add_figure(figures, {y_label: [L1_right, L2_right]}, last_time, 1, 'test1/' +  
         protocol + 'Parallel' + "L1L2_right" + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
-    plot_graphs({y_label: [L3_right, L4_right]}, last_time, 1, 'test1/' + 
+    add_figure(figures, {y_label: [L3_right, L4_right]}, last_time, 1, 'test1/' + 
         protocol + 'Parallel' + "L3L4_right" + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
-    plot_graphs({y_label: [L1_left, L2_left]}, last_time, 1, 'test1/' + 
+    add_figure(figures, {y_label: [L1_left, L2_left]}, last_time, 1, 'test1/' + 
         protocol + 'Parallel' + "L1L2_left" + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
-    plot_graphs({y_label: [L3_left, L4_left]}, last_time, 1, 'test1/' + 
+    add_figure(figures, {y_label: [L3_left, L4_left]}, last_time, 1, 'test1/' + 
         protocol + 'Parallel' + "L3L4_left" + y_label.split(' (')[0] + '.png', 1, 0.5, 1.15, max_time)
 
 def isolate_links(data):
@@ -156,10 +244,13 @@ def isolate_links(data):
             L3_left = element
     return [L1_right, L2_right, L3_right, L1_left, L2_left, L3_left]
 
-# The function that should be called from outside this file
+# The function that should be called from outside this file. Figures whose
+# inputs did not change since they were last rendered are skipped, and with
+# more than one worker the figures are rendered in parallel
 def create_graphs(buffer_occ_dicts, packet_loss_dicts, last_time, \
     link_rate_dicts, wind_size_dicts, flow_rate_dicts, packet_delay_dicts, \
-    link_order, flow_order, test_case, protocol, max_time):
+    link_order, flow_order, test_case, protocol, max_time, workers=1):
+    figures = []
     points_dict = {}
     points_dict['Buffer Occupancy (pkts)'] = convert_to_lists(buffer_occ_dicts, 
         link_order)
@@ -181,39 +272,44 @@ def create_graphs(buffer_occ_dicts, packet_loss_dicts, last_time, \
             os.makedirs(directory)
     except OSError:
         print ('Error: Creating directory. ' +  directory)
+        return 0
 
     # All graphs on one figure
     if GRAPHS_TOGETHER:
-        plot_graphs(points_dict, last_time, 6, test_case + '/' + protocol + 
+        add_figure(figures, points_dict, last_time, 6, test_case + '/' + protocol + 
             'AllGraphs.png', 0.8, 1.2, 0.8, max_time)
 
     # Each graph in different figure
     if INDIV_GRAPHS:
-        plot_each_graph_separate(points_dict, last_time, test_case, protocol, max_time)
+        plot_each_graph_separate(figures, points_dict, last_time, test_case, protocol, max_time)
 
     # Each series for each graph in a separate figure
     if INDIV_SERIES:
-        plot_each_series_separate(points_dict, last_time, test_case, protocol, max_time)
+        plot_each_series_separate(figures, points_dict, last_time, test_case, protocol, max_time)
 
     # Graph the links in parallel together. We need to hard code this for 
     # test case 1. do for link rates and buffer occupancy
     if PLOT_PARALLEL and test_case == 'test1':
-        plot_parallel_links(points_dict['Buffer Occupancy (pkts)'], \
+        plot_parallel_links(figures, points_dict['Buffer Occupancy (pkts)'], \
             last_time, 'Buffer Occupancy (pkts)', protocol, max_time)
-        plot_parallel_links(points_dict['Link Rate (Mbps)'], \
+        plot_parallel_links(figures, points_dict['Link Rate (Mbps)'], \
             last_time, 'Link Rate (Mbps)', protocol, max_time)
 
     if TEST_2_DIRECTION and test_case == 'test2':
-        plot_2_direction(points_dict['Buffer Occupancy (pkts)'], \
+        plot_2_direction(figures, points_dict['Buffer Occupancy (pkts)'], \
             last_time, 'Buffer Occupancy (pkts)', protocol, max_time)
-        plot_2_direction(points_dict['Link Rate (Mbps)'], \
+        plot_2_direction(figures, points_dict['Link Rate (Mbps)'], \
             last_time, 'Link Rate (Mbps)', protocol, max_time)
 
     if ISOLATE_LINKS and (test_case == 'extra_test' or test_case == 'extra_test_no_switching'):
+        # The figures above are only rendered at the end, so don't change
+        # the dict that they plot
+        points_dict = dict(points_dict)
         points_dict['Buffer Occupancy (pkts)'] = isolate_links(points_dict['Buffer Occupancy (pkts)'])
         points_dict['Link Rate (Mbps)'] = isolate_links(points_dict['Link Rate (Mbps)'])
         points_dict['Packet Loss (pkts)'] = isolate_links(points_dict['Packet Loss (pkts)'])
-        plot_graphs(points_dict, last_time, 6, test_case + '/' + protocol + 
+        add_figure(figures, points_dict, last_time, 6, test_case + '/' + protocol + 
             'AllGraphsIsolatedLinks.png', 0.8, 1.2, 0.8, max_time)
-        plot_each_graph_separate(points_dict, last_time, test_case, 'IsolatedLinks' + protocol, max_time)
+        plot_each_graph_separate(figures, points_dict, last_time, test_case, 'IsolatedLinks' + protocol, max_time)
 
+    return render_figures(figures, directory, workers)
@@ -1,7 +1,11 @@
 from collections import deque
+from sim_logging import get_logger
 from utils import (
     DEBUG, RENO, PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE
 )
+import logging
+
+log = get_logger("host")
 
 class Host:
     def __init__(self, ip_address, link_connected, id, network):
@@ -50,12 +54,21 @@ class Host:
         Receives a packet. Calls the flow's receive packet function
         '''
         if pkt.packet_type == MESSAGE:
-            if DEBUG:
-                print(" host " + str(self.id) + " received message from " +
-                      str(pkt.source.id) + " with cost of " + str(pkt.current_cost))
-            return        
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(" host %s received message from %s with cost of %s",
+                          self.id, pkt.source.id, pkt.current_cost)
         else:
-            pkt.flow.receive_packet(pkt)
+            flow = pkt.flow
+            if not flow.finished:
+                # Flows only run when they have work to do. They run after
+                # the links, so bring the flow's clock to the step before,
+                # as if it ran at every timestep
+                flow.curr_time = self.network.flow_time
+            flow.receive_packet(pkt)
+            self.network.schedule_wakeup(flow)
+
+        # The packet has reached its destination
+        self.network.release_packet(pkt)
 
     def run(self, curr_time):
         '''
@@ -3,11 +3,13 @@ from utils import (
     DEBUG, RENO,
     PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE
 )
+from queue_discipline import DropTail
+from packet_trace import ENQUEUE, DROP, TRANSMIT, ARRIVE
 import random
 
 class Link:
     def __init__(self, connection1, connection2, buffer_size, 
-                 capacity, prop_time, id, network):
+                 capacity, prop_time, id, network, queue_discipline=None):
 
         # The id of the link represented as an integer
         self.id = id
@@ -26,6 +28,12 @@ class Link:
         # setting the field equal to the host or router object it is 
         # connected to
         self.connection2 = connection2
+
+        # The link going the opposite direction, between the same two nodes
+        self.reverse = None
+
+        # Position of the link in the VectorLinkLayer, if there is one
+        self.index = None
         
         # Intialize the link buffer
         self.buffer = deque()
@@ -45,19 +53,40 @@ class Link:
 
         self.queue_capacity = buffer_size
 
+        # Running total of the bits of all the packets in the buffer. This
+        # is updated whenever a packet goes in or out of the buffer so that
+        # we never have to sum over the buffer
+        self.buffer_bits = 0
+
+        # Decides which packets are dropped. Drop tail if none is given
+        if queue_discipline is None:
+            queue_discipline = DropTail()
+        self.queue_discipline = queue_discipline
+
         # Field to keep track of current time
         self.curr_time = 0
 
         # Use this to keep track of the buffer occupancy over time. 
         # Should map timestamp to number of packets
-        self.buffer_occupancy = []
+        self.buffer_occupancy = network.metrics.create_series(
+            "link", id, "buffer_occupancy")
 
         # Keep track of the packet loss in this link
-        self.packet_loss = [[0, 0]]
+        self.packet_loss = network.metrics.create_series(
+            "link", id, "packet_loss")
 
         # Keep track of the link rates over time. this should be the 
         # number of bits sent over the timestep
-        self.link_rates = [[0, 0]]
+        self.link_rates = network.metrics.create_series(
+            "link", id, "link_rates")
+
+        # The number of packets dropped and bits delivered since the last
+        # sample
+        self.num_dropped = 0
+        self.bits_delivered = 0
+
+        # The number of packets dropped over the whole simulation
+        self.total_dropped = 0
 
         self.curr_pkt_transmit = None
         self.end_transmit_time = 0
@@ -79,13 +108,18 @@ class Link:
                 self.send_packet(self.curr_pkt_transmit)
 
             # If we can, pop it off of the buffer and send this packet
-            if len(self.buffer) > 0:
+            self.curr_pkt_transmit = None
+            while len(self.buffer) > 0:
                 packet = self.buffer.popleft()
+                self.buffer_bits -= packet.num_bits
+                if self.queue_discipline.drop_on_dequeue(self, packet,
+                                                         self.curr_time):
+                    self.drop_packet(packet)
+                    continue
                 self.curr_pkt_transmit = packet
                 self.end_transmit_time = self.curr_time + \
                     (packet.num_bits / self.capacity)
-            else:
-                self.curr_pkt_transmit = None
+                break
 
 
     def add_packets(self, packets):
@@ -93,24 +127,32 @@ class Link:
         Takes a list of packets, puts them into the link buffer.
         This function will be called by connection1
         '''
-        # Check if the buffer will be full
-        buffer_used = 0
-        for pkt in self.buffer:
-            buffer_used += pkt.num_bits
-        
+        curr_time = self.network.curr_time
         for pkt in packets:
-            buffer_used += pkt.num_bits
-        # If we have space, put packet in the buffer
-        if buffer_used < self.queue_capacity:
-            self.buffer.append(pkt)
-        else:
-            # We don't need to do anything with the packet reference, but we 
-            # should keep track that a packet was dropped at this timestamp
-            
-            self.packet_loss[len(self.packet_loss) - 1][1] += 1
-            self.packet_loss[len(self.packet_loss) - 2][1] += 1
+            # If we have space, put packet in the buffer
+            if self.queue_discipline.drop_on_enqueue(self, pkt, curr_time):
+                self.drop_packet(pkt)
+            else:
+                pkt.time_enqueued = curr_time
+                self.buffer.append(pkt)
+                self.buffer_bits += pkt.num_bits
+                if self.network.tracer is not None:
+                    self.network.tracer.record(ENQUEUE, self, pkt)
+                self.network.schedule_wakeup(self)
+
+
+    def drop_packet(self, pkt):
+        '''
+        Drops a packet that was going to be, or was, in the buffer
+        '''
+        # We don't need the packet anymore, but we should keep track that a
+        # packet was dropped at this timestamp
+        self.num_dropped += 1
+        self.total_dropped += 1
+        if self.network.tracer is not None:
+            self.network.tracer.record(DROP, self, pkt)
 
-            pkt.curr_pos = self
+        self.network.release_packet(pkt)
 
 
     def send_packet(self, packet):
@@ -124,6 +166,8 @@ class Link:
             packet.current_cost += self.calculate_dynamic_cost()
         arrival_time = self.curr_time + self.prop_time
         self.traveling_packets.append((arrival_time, packet))
+        if self.network.tracer is not None:
+            self.network.tracer.record(TRANSMIT, self, packet)
 
     
     def finish_sending_packet(self, packet):
@@ -131,17 +175,19 @@ class Link:
         This function will be invoked when the packet is supposed to 
         finish sending. 
         '''
-        # Tell connection2 that the packet has arrived
-        self.connection2.receive_packet(packet)
+        if self.network.tracer is not None:
+            self.network.tracer.record(ARRIVE, self, packet)
         packet.curr_pos = self.connection2
         packet.prev_link = self
 
-
         # Link rate = total bits from packets so far + bits of this 
         # packet / TIMESTEP
-        self.link_rates[len(self.link_rates) - 1][1] += (packet.num_bits / 1e6)
-        self.link_rates[len(self.link_rates) - 2][1] += (packet.num_bits / 1e6)
-        
+        self.bits_delivered += packet.num_bits
+
+        # Tell connection2 that the packet has arrived. It may release the
+        # packet, so nothing may touch it after this
+        self.connection2.receive_packet(packet)
+
 
     def run(self, curr_time):
         '''
@@ -163,23 +209,35 @@ class Link:
         
         self.transmit_packet()
 
-        # use this so that we dont get every point
-        if self.network.counter % 10000 == 0:
 
-            self.buffer_occupancy.append([curr_time, len(self.buffer)])
-
-            if len(self.link_rates) > 1:
-                prev_time = curr_time - (10000 * self.network.timestep)
-                self.link_rates.append([prev_time, 0])
-            self.link_rates.append([curr_time, 0])
-
-            # Update the previous values
-            if len(self.link_rates) - 4 > 0:
-                self.link_rates[len(self.link_rates) - 4][1] /= (10000 * self.network.timestep)
-                self.link_rates[len(self.link_rates) - 3][1] /= (10000 * self.network.timestep)
+    def next_wakeup_time(self):
+        '''
+        Returns the earliest time at which the link has something to do,
+        either a packet arriving at connection2 or a packet finishing its
+        transmission. Returns infinity if the link is idle.
+        '''
+        wakeup_time = float("inf")
+        if len(self.traveling_packets) > 0:
+            wakeup_time = self.traveling_packets[0][0]
+        if self.curr_pkt_transmit != None or len(self.buffer) > 0:
+            wakeup_time = min(wakeup_time, self.end_transmit_time)
+        return wakeup_time
 
 
-            self.packet_loss.append([curr_time, 0])
-            self.packet_loss.append([curr_time + 10000 * self.network.timestep, 0])
+    def record_metrics(self, curr_time, prev_time):
+        '''
+        Called by the metrics recorder to sample the graphing logs. The
+        packet loss and link rate are plotted as a step over the period
+        since the previous sample, which was at prev_time.
+        '''
+        self.buffer_occupancy.append(curr_time, len(self.buffer))
 
+        if prev_time is not None and curr_time > prev_time:
+            link_rate = self.bits_delivered / 1e6 / (curr_time - prev_time)
+            self.link_rates.append(prev_time, link_rate)
+            self.link_rates.append(curr_time, link_rate)
+            self.packet_loss.append(prev_time, self.num_dropped)
+            self.packet_loss.append(curr_time, self.num_dropped)
 
+        self.num_dropped = 0
+        self.bits_delivered = 0
@@ -0,0 +1,78 @@
+from heapq import heappop, heappush
+import numpy as np
+
+
+class VectorLinkLayer:
+    '''
+    Runs the links in the stepped engine. Instead of running every link at
+    every timestep, the time at which each link next has something to do
+    (a packet arriving at connection2 or a transmission finishing, see
+    Link.next_wakeup_time) is kept in a NumPy array, and a single
+    comparison per timestep finds the links that are due. Only those are
+    run, so a timestep costs time in proportion to the busy links rather
+    than all of them.
+
+    The due time of a link only changes when it runs or when packets are
+    added to its buffer, which the link reports to the network with
+    schedule_wakeup. Links are run in the same order as in the network, and
+    a link that becomes due while the links are running (an ACK sent by a
+    host that just received a packet, say) still runs in the same timestep
+    if it comes later in that order, exactly like the plain loop.
+    '''
+
+    def __init__(self, links):
+        # The links, in the order they are run. Each link gets its index
+        # into this list
+        self.links = list(links)
+        for index, link in enumerate(self.links):
+            link.index = index
+
+        # The next time each link has something to do, infinity if idle
+        self.due_times = np.full(len(self.links), float("inf"))
+
+        # While the links are running, the indices of the links that were
+        # woken up, so that the ones later in the order can be run as well
+        self.running = False
+        self.woken = []
+
+        for link in self.links:
+            self.due_times[link.index] = link.next_wakeup_time()
+
+    def wake(self, link):
+        '''
+        Called when packets were added to the buffer of link
+        '''
+        self.due_times[link.index] = link.next_wakeup_time()
+        if self.running:
+            self.woken.append(link.index)
+
+    def run(self, curr_time):
+        '''
+        Run every link that is due at curr_time. Returns the number of
+        links that ran
+        '''
+        due_times = self.due_times
+        # Sorted, so it is already a heap
+        pending = np.flatnonzero(due_times <= curr_time).tolist()
+        if not pending:
+            return 0
+        queued = set(pending)
+        links = self.links
+        woken = self.woken
+        num_run = 0
+        self.running = True
+        while pending:
+            index = heappop(pending)
+            link = links[index]
+            link.run(curr_time)
+            due_times[index] = link.next_wakeup_time()
+            num_run += 1
+            if woken:
+                for other in woken:
+                    if other > index and other not in queued and \
+                            due_times[other] <= curr_time:
+                        heappush(pending, other)
+                        queued.add(other)
+                del woken[:]
+        self.running = False
+        return num_run
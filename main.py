@@ -1,10 +1,16 @@
 import sys
 import json
+import argparse
+import sim_logging
 from network import Network
-from host import Host
+from profiler import Profiler
+from checkpoint import load_checkpoint
+from packet_trace import PacketTrace, split_list
 import graphing_functions as graph
+from topology import load_topology
+from metrics import Series
 from utils import (
-    DEBUG, MB, KB, Mb, RENO, MESSAGE_SIZE
+    DEBUG, RENO, MESSAGE_SIZE
 )
 
 # This will find the minimum time step for each iteration based on the 
@@ -24,89 +30,55 @@ def find_time_step(lst_link_delay, lst_prop):
             minimum_time = current_time    
     return minimum_time
 
-def convert_to_bits(num, units):
-    if units == MB:
-        return num * 8e6
-    if units == KB:
-        return num * 8e3
-    if units == Mb:
-        return num * 1e6
-
-# Converts a number in ms to s
-def convert_to_seconds(ms):
-    return ms * 0.001
+def run_simulation(filename, event_driven=False, event_log=None,
+                   metrics_out=None, make_graphs=True, profiler=None,
+                   checkpoints=None, trace=None):
+    '''
+    Run the scenario in filename, graph the results unless make_graphs is
+    False, and return the network
+    '''
+    with open(filename) as f:
+        net_data = json.load(f)
+    return run_config(net_data, filename, event_driven, event_log,
+                      metrics_out, make_graphs, profiler, checkpoints, trace)
 
 
-def run_simulation(filename):
+def run_config(net_data, filename, event_driven=False, event_log=None,
+               metrics_out=None, make_graphs=True, profiler=None,
+               checkpoints=None, trace=None):
+    '''
+    Run a scenario that was already loaded from JSON. filename is only used
+    to name the graphs. If a profiler is given, it is attached to the
+    network and can be controlled with signals while the network runs.
+    checkpoints is a list of (time, filename) checkpoints to save. trace
+    holds the arguments of a PacketTrace to record, e.g. {"filename": ...}.
+    '''
     network = Network()
+    network.event_driven = event_driven
 
-    with open(filename) as f:
-        net_data = json.load(f)
+    # The sampling intervals of the graphing logs, in seconds, can be set
+    # in an optional "metrics" section
+    metrics_config = net_data.get("metrics", {})
+    if "link_interval" in metrics_config:
+        network.metrics.link_interval = float(metrics_config["link_interval"])
+    if "window_interval" in metrics_config:
+        network.metrics.window_interval = float(metrics_config["window_interval"])
+    if "flow_rate_interval" in metrics_config:
+        network.metrics.flow_rate_interval = \
+            float(metrics_config["flow_rate_interval"])
 
-    for host in net_data["hosts"]:
-        # Note: we will add the links to the host when we initialize links
-        network.create_host(host["ip"], int(host["id"]))
-
-    for router in net_data["routers"]:
-        # Note: we will add the links to the router when we initialize links
-        network.create_router(router["ip"], int(router["id"]))
-
-    for flow in net_data["flows"]:
-        src = network.hosts[int(flow["source"])]
-        dest = network.hosts[int(flow["dest"])]
-        new_flow = network.create_flow(
-            convert_to_bits(float(flow["data_amount"]), MB),
-            src, dest,
-            float(flow["start_time"]),
-            float(flow["window"]),
-            flow["protocol"],
-            int(flow["id"]))
-        src.flows.append(new_flow)
-
-    # Keep track of this so we can add links going the opposite direction
-    highest_link_id = max([int(link["id"]) for link in net_data["links"]])
-    for link in net_data["links"]:
-
-        if link["source"][0] == "H":
-            src = network.hosts[int(link["source"][1])]
-            if  net_data["routers"] != []:
-                src.router = network.routers[int(link["sink"][1])]
-        else:
-            src = network.routers[int(link["source"][1])]
+    # Routing tables are built by flooding messages unless the scenario
+    # asks for "routing": "oracle"
+    network.routing = net_data.get("routing", network.routing)
+    # The routing epochs, in seconds. By default they are a fixed number of
+    # timesteps long
+    if "routing_period" in net_data:
+        network.routing_period = float(net_data["routing_period"])
+    if "routing_settle" in net_data:
+        network.routing_settle = float(net_data["routing_settle"])
 
-        if link["sink"][0] == "H":
-            sink = network.hosts[int(link["sink"][1])]
-            if  net_data["routers"] != []:
-                sink.router = network.routers[int(link["source"][1])]
-        else:
-            sink = network.routers[int(link["sink"][1])]
-
-        new_link_1 = network.create_link(src, sink, \
-            convert_to_bits(float(link["buff_size"]), KB), \
-            convert_to_bits(float(link["link_rate"]), Mb), \
-            convert_to_seconds(float(link["prop_delay"])), int(link["id"]))
-        new_link_2 = network.create_link(sink, src, \
-            convert_to_bits(float(link["buff_size"]), KB), \
-            convert_to_bits(float(link["link_rate"]), Mb), \
-            convert_to_seconds(float(link["prop_delay"])), highest_link_id + 1)
-        network.correspond_links[new_link_1] = new_link_2
-        network.correspond_links[new_link_2] = new_link_1
-        highest_link_id += 1
-
-        if isinstance(src, Host):
-            src.outgoing_link = new_link_1
-            src.incoming_link = new_link_2
-        else:
-            src.outgoing_links.append(new_link_1)
-            src.incoming_links.append(new_link_2) 
-            src.neighbors.append(sink)
-        if isinstance(sink, Host):
-            sink.outgoing_link = new_link_2
-            sink.incoming_link = new_link_1
-        else:
-            sink.outgoing_links.append(new_link_2)
-            sink.incoming_links.append(new_link_1) 
-            sink.neighbors.append(src)
+    # Check the hosts, routers, links and flows and wire them together
+    load_topology(net_data).build(network)
 
     # In Debug mode, we want to print out all the fields we set at initialization
     if DEBUG:
@@ -174,6 +146,25 @@ def run_simulation(filename):
             print("    Window Size: " + str(flow[1].window))
             print("    Protocol: " + str(flow[1].protocol))
 
+    set_time_step(network)
+    return simulate(network, filename, event_log, metrics_out, make_graphs,
+                    profiler, checkpoints, trace)
+
+
+def resume_simulation(checkpoint_file, filename, event_log=None,
+                      metrics_out=None, make_graphs=True, profiler=None,
+                      checkpoints=None, trace=None):
+    '''
+    Continue a network saved with a checkpoint until all flows are
+    finished. filename is the scenario it was loaded from, which names
+    the graphs.
+    '''
+    network = load_checkpoint(checkpoint_file)
+    return simulate(network, filename, event_log, metrics_out, make_graphs,
+                    profiler, checkpoints, trace)
+
+
+def set_time_step(network):
     # This will find the minimum time step for each iteration 
     lst_link_prop = []
     lst_link_rate = []
@@ -182,42 +173,65 @@ def run_simulation(filename):
         lst_link_rate.append(links[1].capacity)
         lst_link_prop.append(links[1].prop_time)    
     timestep = find_time_step(lst_link_rate, lst_link_prop)
-    network.timestep = timestep
+    network.set_timestep(timestep)
+
+
+def simulate(network, filename, event_log=None, metrics_out=None,
+             make_graphs=True, profiler=None, checkpoints=None, trace=None):
+    '''
+    Run a network that was built or restored, then save its metrics and
+    graph the results
+    '''
+    if profiler is not None:
+        network.profiler = profiler
+        profiler.install_signal_handlers(network)
+    for time, checkpoint_file in checkpoints or []:
+        network.add_checkpoint(time, checkpoint_file)
+
+    if trace is not None:
+        network.tracer = PacketTrace(network, **trace)
 
     # Start the network!
-    network.run_network()
+    if event_log is not None:
+        sim_logging.start_event_log(event_log, lambda: network.curr_time)
+    try:
+        network.run_network()
+    finally:
+        sim_logging.stop_event_log()
+        if network.tracer is not None:
+            network.tracer.close()
+            network.tracer = None
 
-    # Get the values for the calculations each link keeps track of
-    # Convert to a list so that we can index each item 
+    if metrics_out is not None:
+        network.metrics.save(metrics_out, graph_metadata(network, filename))
+
+    if make_graphs:
+        graph_results(network, filename)
+    return network
+
+
+def graph_metadata(network, filename):
+    '''
+    Returns what the graphs need besides the time series: the name of each
+    link and flow series, the test case and protocol that name the files,
+    and the end time. This is saved with the metrics so that the graphs can
+    be rendered later from the saved file.
+    '''
+    # Name each link by its direction. The links created for the reverse
+    # direction have the ids after the highest id in the scenario
     links_list = list(network.links.items())
     size = len(links_list) / 2
-    packet_loss_dicts = []
-    buffer_occ_dicts = []
-    link_rate_dicts = []
     link_order = []
-
     start_index = 0 not in network.links
     for element in links_list:
         if element[0] < size + start_index:
             name = 'L' + str(element[0]) + '_right'
         else:
             name = 'L' + str(int(element[0] % size) + start_index) + '_left'
-        link_order.append(name)
-        packet_loss_dicts.append(element[1].packet_loss)
-        buffer_occ_dicts.append(element[1].buffer_occupancy)
-        link_rate_dicts.append(element[1].link_rates)
+        link_order.append([element[0], name])
 
-    # Get the values for the calculations each flow keeps track of 
     flow_list = list(network.flows.items())
-    wind_size_dicts = []
-    flow_rate_dicts = []
-    packet_delay_dicts = []
-    flow_order = []
-    for element in flow_list:
-        flow_order.append("F" + str(element[0]))
-        wind_size_dicts.append(element[1].window_sizes)
-        flow_rate_dicts.append(element[1].flow_rates)
-        packet_delay_dicts.append(element[1].packet_delays)
+    flow_order = [[element[0], "F" + str(element[0])] for element in flow_list]
 
     # For tests 3 and 4, different flows have different protocols. In other cases,
     # we want to label the graphs with the protocols they follow
@@ -225,12 +239,136 @@ def run_simulation(filename):
     if filename.split('.')[0] != 'test3' and filename.split('.')[0] != 'test4':
         protocol = flow_list[0][1].protocol
 
-    # Send the plots to the graphing function 
-    graph.create_graphs(buffer_occ_dicts, packet_loss_dicts, network.curr_time, \
+    return {
+        "test_case": filename.split('.')[0],
+        "protocol": protocol,
+        "end_time": network.curr_time,
+        "links": link_order,
+        "flows": flow_order
+    }
+
+
+def graph_series(series, metadata, workers=1):
+    '''
+    Graph the time series described by metadata. series is a dict of
+    Series keyed by (group, owner id, name), like MetricsRecorder.series
+    '''
+    def get(group, owner_id, name):
+        # Series loaded from a file have string owner ids
+        for key in ((group, owner_id, name), (group, str(owner_id), name)):
+            if key in series:
+                return series[key]
+        return Series(name)
+
+    # Get the values for the calculations each link keeps track of
+    packet_loss_dicts = []
+    buffer_occ_dicts = []
+    link_rate_dicts = []
+    link_order = []
+    for link_id, name in metadata["links"]:
+        link_order.append(name)
+        packet_loss_dicts.append(get("link", link_id, "packet_loss"))
+        buffer_occ_dicts.append(get("link", link_id, "buffer_occupancy"))
+        link_rate_dicts.append(get("link", link_id, "link_rates"))
+
+    # Get the values for the calculations each flow keeps track of
+    wind_size_dicts = []
+    flow_rate_dicts = []
+    packet_delay_dicts = []
+    flow_order = []
+    for flow_id, name in metadata["flows"]:
+        flow_order.append(name)
+        wind_size_dicts.append(get("flow", flow_id, "window_sizes"))
+        flow_rate_dicts.append(get("flow", flow_id, "flow_rates"))
+        packet_delay_dicts.append(get("flow", flow_id, "packet_delays"))
+
+    # Send the plots to the graphing function
+    end_time = metadata["end_time"]
+    return graph.create_graphs(buffer_occ_dicts, packet_loss_dicts, end_time, \
         link_rate_dicts, wind_size_dicts, flow_rate_dicts, packet_delay_dicts, \
-        link_order, flow_order, filename.split('.')[0], protocol, network.curr_time + 1)
+        link_order, flow_order, metadata["test_case"], metadata["protocol"], \
+        end_time + 1, workers)
+
+
+def graph_results(network, filename, workers=1):
+    graph_series(network.metrics.series, graph_metadata(network, filename),
+                 workers)
 
 
 if __name__ == '__main__':
-    filename = sys.argv[1]
-    run_simulation(filename)
+    parser = argparse.ArgumentParser(description="Run a network simulation")
+    parser.add_argument("filename", help="scenario JSON file")
+    parser.add_argument("--events", action="store_true",
+                        help="use the event driven engine")
+    parser.add_argument("--log",
+                        help='log levels, e.g. "DEBUG" or "flow=DEBUG,router=INFO"')
+    parser.add_argument("--event-log",
+                        help="also write the log records to this file as NDJSON")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print warnings and errors to stdout")
+    parser.add_argument("--metrics-out",
+                        help="save the time series to this .npz or .parquet file")
+    parser.add_argument("--no-graphs", action="store_true",
+                        help="don't render the graphs, e.g. to render them "
+                             "later from --metrics-out with render.py")
+    parser.add_argument("--profile", type=int, nargs="?", const=100,
+                        metavar="N",
+                        help="sample every N steps or events (default 100, "
+                             "1 profiles every one) and log the report at "
+                             "the end. SIGUSR2 switches profiling on and off "
+                             "and SIGUSR1 logs the report so far")
+    parser.add_argument("--profile-paused", action="store_true",
+                        help="set up profiling but only start it on SIGUSR2")
+    parser.add_argument("--profile-out",
+                        help="also write the profile report to this JSON file")
+    parser.add_argument("--checkpoint", action="append", default=[],
+                        metavar="TIME:FILE",
+                        help="save a checkpoint to FILE once the simulation "
+                             "reaches TIME seconds, can be given more than once")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record packet events to this binary trace, "
+                             "see packet_trace.py for reading it")
+    parser.add_argument("--trace-flows",
+                        help="only trace these flows, comma separated ids")
+    parser.add_argument("--trace-links",
+                        help="only trace these links, comma separated ids")
+    parser.add_argument("--trace-types",
+                        help='only trace these packet types, e.g. "packet,ack"')
+    parser.add_argument("--resume", metavar="FILE",
+                        help="continue from a checkpoint of this scenario "
+                             "instead of starting from the beginning")
+    args = parser.parse_args()
+
+    if args.log:
+        sim_logging.parse_levels(args.log)
+    if args.quiet:
+        sim_logging.set_stdout_level("WARNING")
+    profiler = None
+    if args.profile or args.profile_paused or args.profile_out:
+        profiler = Profiler(args.profile or 100)
+        profiler.report_at_end = True
+        profiler.report_file = args.profile_out
+        if not args.profile_paused:
+            profiler.enable()
+    checkpoints = []
+    for checkpoint in args.checkpoint:
+        time, _, checkpoint_file = checkpoint.partition(":")
+        if not checkpoint_file:
+            parser.error("--checkpoint must be TIME:FILE")
+        checkpoints.append((float(time), checkpoint_file))
+    trace = None
+    if args.trace:
+        trace = {
+            "filename": args.trace,
+            "flows": split_list(args.trace_flows),
+            "links": split_list(args.trace_links),
+            "packet_types": split_list(args.trace_types)
+        }
+    if args.resume:
+        resume_simulation(args.resume, args.filename, args.event_log,
+                          args.metrics_out, not args.no_graphs, profiler,
+                          checkpoints, trace)
+    else:
+        run_simulation(args.filename, args.events, args.event_log,
+                       args.metrics_out, not args.no_graphs, profiler,
+                       checkpoints, trace)
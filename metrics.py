@@ -0,0 +1,228 @@
+import json
+from array import array
+import numpy as np
+from utils import (
+    LINK_SAMPLE_INTERVAL, WINDOW_SAMPLE_INTERVAL, FLOW_RATE_SAMPLE_INTERVAL
+)
+
+
+class Series:
+    '''
+    A time series stored as two columns of doubles. The columns are arrays
+    rather than lists of lists, so appending a point does not create any
+    Python objects, and the columns convert to NumPy arrays in one step.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.times = array('d')
+        self.values = array('d')
+
+    def append(self, time, value):
+        self.times.append(time)
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        '''
+        Iterate over the points as (time, value) tuples
+        '''
+        return zip(self.times, self.values)
+
+    def to_numpy(self):
+        '''
+        Returns the (times, values) columns as NumPy arrays. These are
+        copies, since an array can't grow while NumPy holds on to its memory.
+        '''
+        return (np.array(self.times, dtype=np.float64),
+                np.array(self.values, dtype=np.float64))
+
+
+class MetricsRecorder:
+    '''
+    Owns every time series of a simulation and decides when the links and
+    flows are sampled. The sampling intervals are in simulated seconds, so
+    they don't depend on the timestep or on which engine is used.
+    '''
+
+    def __init__(self, link_interval=LINK_SAMPLE_INTERVAL,
+                 window_interval=WINDOW_SAMPLE_INTERVAL,
+                 flow_rate_interval=FLOW_RATE_SAMPLE_INTERVAL):
+        # Seconds between samples of the buffer occupancy, packet loss and
+        # link rate of every link
+        self.link_interval = link_interval
+        # Seconds between samples of the window size of every flow
+        self.window_interval = window_interval
+        # Seconds between samples of the flow rate of every flow
+        self.flow_rate_interval = flow_rate_interval
+
+        # The next time at which each kind of sample is due
+        self.next_link_sample = 0.0
+        self.next_window_sample = 0.0
+        self.next_flow_rate_sample = 0.0
+
+        # The time of the previous sample, or None before the first one.
+        # Rates are averaged over the time since the previous sample
+        self.last_link_sample = None
+        self.last_flow_rate_sample = None
+
+        # Every series, keyed by (group, owner id, series name), e.g.
+        # ("link", 3, "buffer_occupancy")
+        self.series = {}
+
+    def create_series(self, group, owner_id, name):
+        series = Series(name)
+        self.series[(group, owner_id, name)] = series
+        return series
+
+    def next_sample_time(self):
+        return min(self.next_link_sample, self.next_window_sample,
+                   self.next_flow_rate_sample)
+
+    def sample(self, network, curr_time):
+        '''
+        Take every sample that is due at curr_time
+        '''
+        if curr_time >= self.next_link_sample:
+            for _, link in network.links.items():
+                link.record_metrics(curr_time, self.last_link_sample)
+            self.last_link_sample = curr_time
+            self.next_link_sample = self.advance(self.next_link_sample,
+                                                 self.link_interval, curr_time)
+
+        sample_windows = curr_time >= self.next_window_sample
+        sample_rates = curr_time >= self.next_flow_rate_sample
+        if sample_windows or sample_rates:
+            for _, flow in network.flows.items():
+                if flow.spawned and not flow.finished:
+                    if sample_windows:
+                        flow.record_window_size(curr_time)
+                    if sample_rates:
+                        flow.record_flow_rate(curr_time,
+                                              self.last_flow_rate_sample)
+            if sample_windows:
+                self.next_window_sample = self.advance(
+                    self.next_window_sample, self.window_interval, curr_time)
+            if sample_rates:
+                self.last_flow_rate_sample = curr_time
+                self.next_flow_rate_sample = self.advance(
+                    self.next_flow_rate_sample, self.flow_rate_interval,
+                    curr_time)
+
+    def advance(self, sample_time, interval, curr_time):
+        '''
+        Returns the first sample time on the grid of interval that is
+        after curr_time
+        '''
+        while sample_time <= curr_time:
+            sample_time += interval
+        return sample_time
+
+    def save_npz(self, filename, metadata=None):
+        '''
+        Save every series to a NumPy .npz file. Each series is stored as
+        two arrays named "<group>/<owner id>/<name>/times" and ".../values".
+        metadata is stored as a JSON string named "metadata".
+        '''
+        columns = {}
+        if metadata is not None:
+            columns["metadata"] = np.array(json.dumps(metadata))
+        for (group, owner_id, name), series in self.series.items():
+            times, values = series.to_numpy()
+            key = group + "/" + str(owner_id) + "/" + name
+            columns[key + "/times"] = times
+            columns[key + "/values"] = values
+        np.savez_compressed(filename, **columns)
+
+    def save_parquet(self, filename, metadata=None):
+        '''
+        Save every series to a Parquet file in long format, with one row
+        per point. metadata is stored as JSON in the file's key value
+        metadata. Needs pyarrow.
+        '''
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is needed to save metrics as Parquet")
+
+        groups, owners, names, times, values = [], [], [], [], []
+        for (group, owner_id, name), series in self.series.items():
+            series_times, series_values = series.to_numpy()
+            groups.append(np.full(len(series), group, dtype=object))
+            owners.append(np.full(len(series), str(owner_id), dtype=object))
+            names.append(np.full(len(series), name, dtype=object))
+            times.append(series_times)
+            values.append(series_values)
+        table = pa.table({
+            "group": np.concatenate(groups),
+            "owner": np.concatenate(owners),
+            "series": np.concatenate(names),
+            "time": np.concatenate(times),
+            "value": np.concatenate(values)
+        })
+        if metadata is not None:
+            table = table.replace_schema_metadata(
+                {"metadata": json.dumps(metadata)})
+        pq.write_table(table, filename)
+
+    def save(self, filename, metadata=None):
+        '''
+        Save to Parquet if filename ends with .parquet, otherwise to .npz
+        '''
+        if filename.endswith(".parquet"):
+            self.save_parquet(filename, metadata)
+        else:
+            self.save_npz(filename, metadata)
+
+
+def series_from_numpy(name, times, values):
+    series = Series(name)
+    series.times.frombytes(np.asarray(times, dtype=np.float64).tobytes())
+    series.values.frombytes(np.asarray(values, dtype=np.float64).tobytes())
+    return series
+
+
+def load_metrics(filename):
+    '''
+    Load the series saved by MetricsRecorder.save. Returns a dict of Series
+    keyed by (group, owner id, name), with the owner id as a string, and
+    the metadata that was saved with them or None.
+    '''
+    series = {}
+    metadata = None
+    if filename.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is needed to load metrics from Parquet")
+        table = pq.read_table(filename)
+        schema_metadata = table.schema.metadata or {}
+        if b"metadata" in schema_metadata:
+            metadata = json.loads(schema_metadata[b"metadata"])
+        columns = table.to_pydict()
+        groups, owners, names = columns["group"], columns["owner"], columns["series"]
+        times = np.asarray(columns["time"], dtype=np.float64)
+        values = np.asarray(columns["value"], dtype=np.float64)
+        # The rows of a series are contiguous, see save_parquet
+        start = 0
+        for i in range(1, len(groups) + 1):
+            if i == len(groups) or (groups[i], owners[i], names[i]) != \
+                    (groups[start], owners[start], names[start]):
+                series[(groups[start], owners[start], names[start])] = \
+                    series_from_numpy(names[start], times[start:i],
+                                      values[start:i])
+                start = i
+        return series, metadata
+
+    with np.load(filename) as columns:
+        for key in columns.files:
+            if key == "metadata":
+                metadata = json.loads(str(columns[key]))
+            elif key.endswith("/times"):
+                group, owner_id, name = key[:-len("/times")].split("/")
+                series[(group, owner_id, name)] = series_from_numpy(
+                    name, columns[key], columns[key[:-len("times")] + "values"])
+    return series, metadata
@@ -3,10 +3,30 @@ from host import Host
 from link import Link
 from router import Router
 from packet import Packet
+from event_queue import EventQueue, StepQueue, TIME
+from link_layer import VectorLinkLayer
+from profiler import Profiler
+from checkpoint import save_checkpoint
+from metrics import MetricsRecorder
+from routing import OracleRouting, DISTANCE_VECTOR, ORACLE, ROUTING_MODES
+from sim_logging import get_logger
 from utils import (
     DEBUG, RENO,
-    PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE
+    PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE,
+    ROUTING_PERIOD, ROUTING_SETTLE, MAX_PACKET_POOL_SIZE, MIN_VECTORIZED_LINKS
 )
+import logging
+from time import perf_counter
+
+log = get_logger("network")
+
+# The parts of a step, in the order that the stepped engine runs them. The
+# event driven engine runs the events of a step in the same order
+NETWORK_PHASE = 0
+ROUTER_PHASE = 1
+LINK_PHASE = 2
+FLOW_PHASE = 3
+SAMPLE_PHASE = 4
 
 class Network:
 
@@ -22,61 +42,183 @@ class Network:
         self.timestep = 0
         self.counter = 0
 
-        # Each link will have mapping to its corresponding link 
-        self.correspond_links = {}
+        # The checked and numbered topology the network was built from, see
+        # topology.py
+        self.topology = None
+
+        # How the routing tables are built. DISTANCE_VECTOR floods routing
+        # messages through the links, ORACLE computes the tables centrally
+        # without sending any packets
+        self.routing = DISTANCE_VECTOR
+
+        # The central routing computation, only used in ORACLE mode
+        self.oracle = None
+
+        # Seconds between routing floods, and from a flood to the rebuild
+        # of the routing tables. If the scenario doesn't set them, the
+        # epochs are ROUTING_PERIOD and ROUTING_SETTLE timesteps long
+        self.routing_period = None
+        self.routing_settle = None
+
+        # True if the last rebuild of the routing tables changed no route
+        self.routing_converged = False
+
+        # Holds the time series of every link and flow and samples them
+        self.metrics = MetricsRecorder()
+
+        # If True, run_network uses the event driven engine instead of
+        # stepping every component forward by timestep
+        self.event_driven = False
+
+        # The queue of pending events. The event driven engine keeps every
+        # event in it, the stepped engine only the network level ones, like
+        # the routing epochs
+        self.events = None
+
+        # Maps a component (link, router or flow) to its pending wakeup
+        # event in the event queue
+        self.wakeups = {}
+
+        # The phase, order, offset and callback of the wakeups of each
+        # component in the event driven engine, see start_event_driven
+        self.wakeup_keys = {}
+
+        # The time of the step before the current one, when the stepped
+        # engine last ran its flow phase. Flows only run when they have
+        # something to do, so a flow that receives a packet has its clock
+        # set to this, as if it ran at every timestep
+        self.flow_time = 0
+
+        # Whether the stepped engine only runs the links that are due, see
+        # VectorLinkLayer, instead of every link at every timestep. None
+        # decides by the number of links
+        self.vectorized_links = None
+        self.link_layer = None
+
+        # The stepped engine only visits the components that have work to
+        # do. Routers with packets waiting to be forwarded, used as an
+        # ordered set, and the position of every router in self.routers
+        self.active_routers = {}
+        self.router_order = {}
+
+        # Timers of the flows for the stepped engine: a flow is only run at
+        # a timestep when its timer is due, i.e. when it spawns, has room in
+        # its window, may time out or has a window update scheduled. Flows
+        # arm and re-arm their timer through schedule_wakeup, with the entry
+        # kept in self.wakeups. The event driven engine keeps these timers
+        # in self.events
+        self.flow_timers = EventQueue()
+        # The position of every flow in self.flows
+        self.flow_order = {}
+
+        # Number of flows that have finished, so that the end of the
+        # simulation can be detected without looking at every flow
+        self.num_finished_flows = 0
+
+        # Whether the engine has set up the network and started running it.
+        # A network restored from a checkpoint continues where it was saved
+        self.started = False
+
+        # Whether the first routing tables were built. Packets are only
+        # forwarded once they are, so this is checked until it is set
+        self.init_routing_tables = False
+
+        # Checkpoints to save once the network runs, as (time, filename)
+        # pairs. See add_checkpoint
+        self.checkpoints = []
+
+        # Packets that were released and can be handed out again by
+        # create_packet instead of allocating new ones
+        self.packet_pool = []
+
+        # Number of packets (data, ACK and routing messages) created over
+        # the whole simulation
+        self.packets_created = 0
+
+        # Optional instrumentation of the engine loop. Disabled by default
+        self.profiler = Profiler()
+
+        # Records packet events to a trace file if set, see PacketTrace
+        self.tracer = None
 
     def create_flow(self, size, source, destination, spawn_time, window, protocol, flow_id):
         flow = Flow(size, source, destination, spawn_time, window, protocol,
                     flow_id, self)
         self.flows[flow_id] = flow
-        if DEBUG:
-            print("Flow successfully created, id:", flow_id)
+        log.debug("Flow successfully created, id: %s", flow_id)
         return flow
 
     def create_host(self, ip_address, host_id, link_connected=None):
         host = Host(ip_address, link_connected, host_id, self)
         self.hosts[host_id] = host
-        if DEBUG:
-            print("Host successfully created, id:", host_id)
+        log.debug("Host successfully created, id: %s", host_id)
         return host
 
-    def create_link(self, connection1, connection2, buffer_size, capcity, static_cost, link_id):
+    def create_link(self, connection1, connection2, buffer_size, capcity, static_cost, link_id,
+                    queue_discipline=None):
         link = Link(connection1, connection2, buffer_size, capcity, static_cost,
-                    link_id, self)
+                    link_id, self, queue_discipline)
         self.links[link_id] = link
-        if DEBUG:
-            print("Link successfully created, id:", link_id)
+        log.debug("Link successfully created, id: %s", link_id)
         return link
 
+    def set_timestep(self, timestep):
+        '''
+        Change the timestep, also while the network is running, e.g. after
+        the links of a network restored from a checkpoint were changed. The
+        steps up to the current one keep their times
+        '''
+        self.timestep = timestep
+        if self.events is not None:
+            self.events.set_timestep(timestep)
+        for component, (phase, order, offset, callback) in \
+                self.wakeup_keys.items():
+            if phase == FLOW_PHASE:
+                self.wakeup_keys[component] = (phase, order, timestep / 2,
+                                               callback)
+
     def create_router(self, ip_address, router_id):
         router = Router(ip_address, router_id, self)
         self.routers[router_id] = router
-        if DEBUG:
-            print("Router successfully created, id:", router_id)
+        log.debug("Router successfully created, id: %s", router_id)
         return router
     
     def create_packet(self, num_bits, packet_type, source,
                       destination, time_spawn, in_transit, curr_pos,
-                      flow=None, packet_info=None,
-                      packet_no=None, last_packet=False,
+                      flow=None, packet_no=None, last_packet=False,
                       expecting_packet=None):
-        packet = Packet(num_bits, packet_type, source, destination,
-                        time_spawn, in_transit, curr_pos,
-                        self, flow, 
-                        packet_info, packet_no, last_packet, expecting_packet)
+        self.packets_created += 1
+        # Reuse a packet that was released if we have one
+        if self.packet_pool:
+            packet = self.packet_pool.pop()
+            packet.__init__(num_bits, packet_type, source, destination,
+                            time_spawn, in_transit, curr_pos,
+                            flow, packet_no, last_packet, expecting_packet)
+        else:
+            packet = Packet(num_bits, packet_type, source, destination,
+                            time_spawn, in_transit, curr_pos,
+                            flow, packet_no, last_packet, expecting_packet)
         return packet
 
+    def release_packet(self, packet):
+        '''
+        Called when a packet is dropped or has reached the end of its
+        journey. Nothing may hold on to the packet after this, since it
+        will be handed out again by create_packet.
+        '''
+        if len(self.packet_pool) < MAX_PACKET_POOL_SIZE:
+            packet.flow = None
+            packet.source = None
+            packet.destination = None
+            packet.curr_pos = None
+            packet.prev_link = None
+            self.packet_pool.append(packet)
+
     def generate_messages(self):
-        # Create a dictionary in the router data field neighbors with a key link
-        # and the value being a host or router variable
-        for router in self.routers.items():
-            dic = {}
-            router_obj = router[1]
-            for link in router_obj.outgoing_links:
-                dic[link] = link.connection2
-            for link in router_obj.incoming_links:
-                dic[link] = link.connection1                
-            router_obj.neighbors = dic
+        # In oracle mode the routing tables are computed without messages
+        if self.routing == ORACLE:
+            return
+
         for router in self.routers.items():
             router_obj = router[1]        
             router_obj.send_messages()
@@ -84,85 +226,509 @@ class Network:
         # Have hosts send messages too. This is necessary since packets know which 
         # host is their destination but don't know which router to take to get there
             
+    def schedule_wakeup(self, component, wakeup_time=None):
+        '''
+        Called when the state of a link, router or flow changes so that the
+        event driven engine can wake the component up at the next time it
+        has something to do, or at wakeup_time if it is given. In the
+        stepped engine this keeps track of the routers with packets to
+        forward, of the links that are due when they are vectorized, and
+        arms the timers of the flows.
+        '''
+        if not self.event_driven:
+            if type(component) is Router:
+                self.active_routers[component] = True
+            elif type(component) is Link:
+                if self.link_layer is not None:
+                    self.link_layer.wake(component)
+            else:
+                self.arm_flow_timer(component)
+            return
+        if wakeup_time is None:
+            wakeup_time = component.next_wakeup_time()
+            if wakeup_time == float("inf"):
+                return
+            if wakeup_time < self.curr_time:
+                wakeup_time = self.curr_time
+        entry = self.wakeups.get(component)
+        if entry is not None:
+            if entry[TIME] <= wakeup_time:
+                # The component will already be woken up early enough
+                return
+            self.events.cancel(entry)
+        phase, order, offset, callback = self.wakeup_keys[component]
+        self.wakeups[component] = self.events.schedule(
+            wakeup_time, phase, order, callback, component, offset=offset)
+
+    def arm_flow_timer(self, flow):
+        '''
+        Arm the timer of a flow in the stepped engine for the next time it
+        has something to do. Re-arming is lazy: a timer that is armed
+        earlier is kept, and if it turns out to be too early the flow does
+        nothing when it runs and is armed again then.
+        '''
+        wakeup_time = flow.next_wakeup_time()
+        if wakeup_time == float("inf"):
+            return
+        entry = self.wakeups.get(flow)
+        if entry is not None:
+            if entry[0] <= wakeup_time:
+                return
+            self.flow_timers.cancel(entry)
+        self.wakeups[flow] = self.flow_timers.schedule(wakeup_time,
+                                                       self.wake_flow, flow)
+
+    def flow_finished(self, flow):
+        '''
+        Called by a flow when its last packet has been acknowledged
+        '''
+        self.num_finished_flows += 1
+
+    def wake_component(self, component):
+        '''
+        Event callback that runs a single router
+        '''
+        del self.wakeups[component]
+        component.run(self.curr_time)
+        self.schedule_wakeup(component)
+
+    def wake_link(self, link):
+        '''
+        Event callback that runs a single link
+        '''
+        del self.wakeups[link]
+        link.run(self.curr_time)
+        self.schedule_wakeup(link)
+
+    def wake_flow(self, flow):
+        '''
+        Event callback that runs a single flow. A flow that finished earlier
+        in the step is not run, as in the stepped engine.
+        '''
+        del self.wakeups[flow]
+        if flow.finished:
+            return
+        flow.run(self.curr_time)
+        self.schedule_wakeup(flow)
+
+    def start_routing(self):
+        '''
+        Set up the routing mode before the network starts. In oracle mode
+        the first routing tables are computed right away.
+        '''
+        if self.routing not in ROUTING_MODES:
+            raise ValueError("Unknown routing mode: " + str(self.routing))
+        # If only one of the epoch lengths is given in seconds, the other
+        # one is the default number of timesteps in seconds
+        if self.routing_period is not None or self.routing_settle is not None:
+            if self.routing_period is None:
+                self.routing_period = ROUTING_PERIOD * self.timestep
+            if self.routing_settle is None:
+                self.routing_settle = ROUTING_SETTLE * self.timestep
+            if not 0 <= self.routing_settle < self.routing_period:
+                raise ValueError("routing_settle must be between 0 and "
+                                 "routing_period")
+        if self.routing == ORACLE:
+            self.oracle = OracleRouting(self)
+            self.oracle.update()
+
+    def routing_tables_ready(self):
+        '''
+        Returns True once every router has heard from every other router
+        '''
+        if self.routing == ORACLE:
+            return True
+        for _, router in self.routers.items():
+            if len(router.next_routing_table) != len(self.routers) - 1:
+                return False
+        return True
+
+    def update_routing_tables(self):
+        '''
+        Rebuild the routing table of every router from the messages that
+        were received since the last update, or from the link costs in
+        oracle mode
+        '''
+        if self.routing == ORACLE:
+            num_changed = self.oracle.update()
+        else:
+            num_changed = 0
+            for _, router in self.routers.items():
+                if router.update_routing_table(self.hosts.values()):
+                    num_changed += 1
+        for _, link in self.links.items():
+            link.routing_pkts = 0              
+        self.routing_converged = num_changed == 0
+        log.debug("Routing tables rebuilt, %d routers changed", num_changed)
+
+    def schedule(self, time, callback, *args):
+        '''
+        Schedule a network level event, like a routing epoch, at the first
+        step at or after time. It runs before the components of that step,
+        in either engine.
+        '''
+        return self.events.schedule(time, NETWORK_PHASE, 0, callback, *args)
+
+    def run_network_events(self):
+        '''
+        Run the network level events that are due. Used by the stepped
+        engine, which checks for them at every timestep
+        '''
+        events = self.events
+        while True:
+            step = events.peek_step()
+            if step is None or step > self.counter:
+                return
+            _, callback, args = events.pop()
+            callback(*args)
+
+    def add_checkpoint(self, time, filename):
+        '''
+        Save a checkpoint of the network to filename once it has run up to
+        time, in simulated seconds. See checkpoint.save_checkpoint
+        '''
+        self.checkpoints.append((time, filename))
+
+    def schedule_checkpoints(self):
+        '''
+        Schedule the checkpoints added since the network last started
+        running. They are saved at the start of the first step at or after
+        their time, before anything else runs in that step, in either engine
+        '''
+        for time, filename in self.checkpoints:
+            self.events.schedule(time, NETWORK_PHASE, -1,
+                                 self.save_checkpoint, filename)
+        self.checkpoints = []
+
+    def save_checkpoint(self, filename):
+        '''
+        Event callback that saves a checkpoint. The event was already taken
+        off the queue, so the saved network continues with the next one
+        '''
+        save_checkpoint(self, filename)
+        log.info("Saved checkpoint %s at t=%s", filename, self.curr_time)
+
     def run_network(self):
         '''
         Call and run all components of the network
         '''
+        if self.event_driven:
+            self.run_event_driven()
+        else:
+            self.run_stepped()
+        if self.profiler.report_at_end:
+            self.profiler.dump(self)
 
-        # The initial routing table will be created before the 
-        # non-message packets are sent. we will use this flag to
-        # make sure that it is set initially
-        init_routing_tables = False
+    def run_stepped(self):
+        '''
+        Run every component at every timestep until all flows are finished
+        '''
 
-        self.generate_messages()
+        if not self.started:
+            vectorized_links = self.vectorized_links
+            if vectorized_links is None:
+                vectorized_links = len(self.links) >= MIN_VECTORIZED_LINKS
+            if vectorized_links:
+                self.link_layer = VectorLinkLayer(self.links.values())
+            self.start_active_sets()
+
+            self.events = StepQueue(self.curr_time, self.timestep)
+            self.start_routing()
+            self.generate_messages()
+            self.flood_routing_messages(0)
+            self.started = True
+        self.schedule_checkpoints()
+
+        next_sample_time = self.metrics.next_sample_time()
+        profiler = self.profiler
+        link_layer = self.link_layer
         self.is_running = True
         while self.is_running:
 
             # We use this block to make sure that there is an 
             # initial routing table before the flows start
-            if not init_routing_tables:
-                init_routing_tables = True
-                for _, router in self.routers.items():
-                    if len(router.next_routing_table) != len(self.routers) - 1:
-                        init_routing_tables = False
-                        break
+            if not self.init_routing_tables:
+                self.init_routing_tables = self.routing_tables_ready()
                 # Update the routing tables and start the next iteration of 
                 # message passing! 
-                if init_routing_tables:
+                if self.init_routing_tables:
                     for _, router in self.routers.items():
                         router.update_routing_table(self.hosts.values())
+
+            if profiler.enabled and profiler.sample():
+                self.run_step_profiled(profiler)
+                next_sample_time = self.metrics.next_sample_time()
+            else:
+                # Routing floods and rebuilds of the routing tables
+                self.run_network_events()
+
+                #if DEBUG:
+                #   print("current time:", self.curr_time)
+                # Hosts put packets on their links as soon as their flows
+                # send them, so they have nothing to do at a timestep
+                self.run_routers(self.curr_time)
+                if link_layer is not None:
+                    link_layer.run(self.curr_time)
+                else:
+                    for _, link in self.links.items():
+                        link.run(self.curr_time)
             
-            if self.counter % 220000 == 0 and self.counter != 0:
-                self.generate_messages()
-        
-            # This should be approximately every 5 seconds. Update the routing
-            # table for each router and start sending packets
-            if self.counter % 220000 == 30000 and self.counter != 0:
-                # print("updating routing table")
-                # print("time" + str(self.curr_time))
-                for _, link in self.links.items():
-                    link.routing_pkts = 0              
-                for _, router in self.routers.items():
-                    router.update_routing_table(self.hosts.values())
-                
-
-
-            #if DEBUG:
-            #   print("current time:", self.curr_time)
-            for _, host in self.hosts.items():
-                host.run(self.curr_time)
-            for _, router in self.routers.items():
-                router.run(self.curr_time)
-            for _, link in self.links.items():
-                link.run(self.curr_time)
-            
-            # Check if all flows are finished
-            all_finished = True
-            for _, flow in self.flows.items():
-                if flow.finished is False:
-                    all_finished = False
-                    flow.run(self.curr_time)
-            if all_finished:
-                print("All flows finished!")
+                self.run_flows(self.curr_time)
+
+                # use this so that we dont get every point
+                if self.curr_time >= next_sample_time:
+                    self.metrics.sample(self, self.curr_time)
+                    next_sample_time = self.metrics.next_sample_time()
+            if self.num_finished_flows == len(self.flows):
+                log.info("All flows finished!")
                 self.is_running = False
             
             self.curr_time += self.timestep
             self.counter += 1
 
-        for router in self.routers.items():
-            router_obj = router[1]
-            lst= router_obj.routing_table.items()
-            if DEBUG:
-                print(" -----Table for router " + str(router_obj.id))
-                for item in lst:
-                    if isinstance(item[0], Host):
-                        print("Host = " + str(item[0].id) + " via link " + 
-                              str((item[1])[0].id) + " with a cost of " + str(item[1][1]))
-                    else:
-                    
-                        print("Router = " + str(item[0].id) + " via link " + 
-                                str((item[1])[0].id) + " with a cost of " + str(item[1][1]))                    
-                print('')
-        print(self.curr_time)
+        self.events = None
+        self.print_routing_tables()
 
-    
+    def start_active_sets(self):
+        '''
+        Set up the routers and flows that the stepped engine visits
+        '''
+        self.active_routers = {}
+        self.router_order = dict((router, index) for index, (_, router)
+                                 in enumerate(self.routers.items()))
+        self.flow_order = dict((flow, index) for index, (_, flow)
+                               in enumerate(self.flows.items()))
+        self.flow_timers = EventQueue()
+        self.wakeups = {}
+        for _, flow in self.flows.items():
+            self.schedule_wakeup(flow)
+
+    def run_routers(self, curr_time):
+        '''
+        Run the routers that have packets to forward, in the order of
+        self.routers. Returns the number of routers that ran
+        '''
+        active_routers = self.active_routers
+        if not active_routers:
+            return 0
+        self.active_routers = {}
+        routers = list(active_routers)
+        if len(routers) > 1:
+            routers.sort(key=self.router_order.__getitem__)
+        for router in routers:
+            router.run(curr_time)
+        return len(routers)
+
+    def run_flows(self, curr_time):
+        '''
+        Run the flows whose timer is due, in the order of self.flows, and
+        arm their timers again. Returns the number of flows that ran
+        '''
+        flow_timers = self.flow_timers
+        # A timer is due at the timestep nearest to it. Running a flow a
+        # little early does no harm, it only arms its timer again, while
+        # running it late would change what it does. This also covers a
+        # timer time that rounds to just past the timestep
+        horizon = curr_time + self.timestep / 2
+        num_run = 0
+        if flow_timers.peek_time() <= horizon:
+            flows = []
+            while flow_timers.peek_time() <= horizon:
+                _, _, (flow,) = flow_timers.pop()
+                del self.wakeups[flow]
+                if not flow.finished:
+                    flows.append(flow)
+            if len(flows) > 1:
+                flows.sort(key=self.flow_order.__getitem__)
+            for flow in flows:
+                flow.run(curr_time)
+                self.arm_flow_timer(flow)
+            num_run = len(flows)
+        self.flow_time = curr_time
+        return num_run
+
+    def run_step_profiled(self, profiler):
+        '''
+        One timestep of the stepped engine, the same as in run_stepped but
+        with each part of it timed
+        '''
+        curr_time = self.curr_time
+        start = perf_counter()
+        self.run_network_events()
+        now = perf_counter()
+        profiler.add("routing", now - start)
+
+        start = now
+        num_routers = self.run_routers(curr_time)
+        now = perf_counter()
+        profiler.add("router", now - start, num_routers)
+
+        start = now
+        if self.link_layer is not None:
+            num_links = self.link_layer.run(curr_time)
+        else:
+            for _, link in self.links.items():
+                link.run(curr_time)
+            num_links = len(self.links)
+        now = perf_counter()
+        profiler.add("link", now - start, num_links)
+
+        start = now
+        num_flows = self.run_flows(curr_time)
+        now = perf_counter()
+        profiler.add("flow", now - start, num_flows)
+
+        if curr_time >= self.metrics.next_sample_time():
+            start = now
+            self.metrics.sample(self, curr_time)
+            profiler.add("metrics", perf_counter() - start)
+
+        profiler.record_queues(self)
+
+    def sample_metrics(self):
+        '''
+        Event callback used by the event driven engine to sample the
+        graphing logs. It runs after the flows, at the first step at or
+        after the next sample time, as in the stepped engine.
+        '''
+        self.metrics.sample(self, self.curr_time)
+        self.events.schedule(self.metrics.next_sample_time(), SAMPLE_PHASE,
+                             0, self.sample_metrics)
+
+    def flood_routing_messages(self, epoch):
+        '''
+        Event callback that starts a routing epoch. The messages of epoch 0
+        are sent before the network starts. The routing tables are rebuilt
+        routing_settle seconds after the flood, or ROUTING_SETTLE timesteps
+        after it if the epochs are counted in timesteps.
+        '''
+        if epoch != 0:
+            self.generate_messages()
+        if self.routing_period is None:
+            step = epoch * ROUTING_PERIOD
+            self.events.schedule_step(step + ROUTING_SETTLE, NETWORK_PHASE, 0,
+                                      self.update_routing_tables)
+            self.events.schedule_step(step + ROUTING_PERIOD, NETWORK_PHASE, 0,
+                                      self.flood_routing_messages, epoch + 1)
+        else:
+            start = epoch * self.routing_period
+            self.schedule(start + self.routing_settle,
+                          self.update_routing_tables)
+            self.schedule(start + self.routing_period,
+                          self.flood_routing_messages, epoch + 1)
+
+    def run_event_driven(self):
+        '''
+        Run the network as a discrete event simulation. Instead of running
+        every component at every timestep, each link, router and flow is
+        only run when it has something to do: a transmission finishing, a
+        packet arriving, a packet to forward, a flow spawning, a
+        retransmission timeout or a FAST window update. Routing epochs and
+        the sampling of the graphing logs are events too.
+
+        Events run at the times of the steps of the stepped engine and in
+        the same order within a step (see StepQueue), so the results are
+        the same as those of run_stepped. Steps where nothing happens are
+        skipped.
+        '''
+        if not self.started:
+            self.start_event_driven()
+        self.schedule_checkpoints()
+        events = self.events
+
+        # The component type that the time of each kind of event is
+        # counted for when profiling
+        profiler = self.profiler
+        event_kinds = {
+            self.wake_component: "router",
+            self.wake_link: "link",
+            self.wake_flow: "flow",
+            self.flood_routing_messages: "routing",
+            self.update_routing_tables: "routing",
+            self.sample_metrics: "metrics"
+        }
+
+        step = None
+        self.is_running = True
+        while self.is_running:
+            event = events.pop()
+            if event is None or event[0] != step:
+                # Every event of the current step has run
+                if step is not None and \
+                        self.num_finished_flows == len(self.flows):
+                    log.info("All flows finished!")
+                    self.is_running = False
+                    self.curr_time += self.timestep
+                    self.counter = step + 1
+                    break
+                if event is None:
+                    break
+
+                step = event[0]
+                self.counter = step
+                self.curr_time = events.time_of(step)
+                # The time at which the stepped engine last ran the flows
+                if step > 0:
+                    self.flow_time = events.time_of(step - 1)
+                else:
+                    self.flow_time = self.curr_time
+
+                # We use this block to make sure that there is an 
+                # initial routing table before the flows start
+                if not self.init_routing_tables and \
+                        self.routing_tables_ready():
+                    self.init_routing_tables = True
+                    for _, router in self.routers.items():
+                        router.update_routing_table(self.hosts.values())
+
+            _, callback, args = event
+            if profiler.enabled and profiler.sample():
+                kind = event_kinds.get(callback, callback.__name__)
+                profiler.time_call(kind, callback, args)
+                profiler.record_queues(self)
+            else:
+                callback(*args)
+
+        self.events = None
+        self.wakeups = {}
+        self.print_routing_tables()
+
+    def start_event_driven(self):
+        '''
+        Set up the event queue of the event driven engine, send the first
+        routing messages and schedule the first events
+        '''
+        events = self.events = StepQueue(self.curr_time, self.timestep)
+        self.wakeups = {}
+
+        # The phase, order, offset and callback of the wakeups of each
+        # component. Flows compare their timers to the current time
+        # themselves, so they are woken up half a timestep early in case
+        # the sums round differently
+        self.wakeup_keys = {}
+        for order, (_, router) in enumerate(self.routers.items()):
+            self.wakeup_keys[router] = (ROUTER_PHASE, order, 0,
+                                        self.wake_component)
+        for order, (_, link) in enumerate(self.links.items()):
+            self.wakeup_keys[link] = (LINK_PHASE, order, 0, self.wake_link)
+        for order, (_, flow) in enumerate(self.flows.items()):
+            self.wakeup_keys[flow] = (FLOW_PHASE, order, self.timestep / 2,
+                                      self.wake_flow)
+
+        self.start_routing()
+        self.generate_messages()
+        self.flood_routing_messages(0)
+        events.schedule(self.metrics.next_sample_time(), SAMPLE_PHASE, 0,
+                        self.sample_metrics)
+        for _, flow in self.flows.items():
+            self.schedule_wakeup(flow)
+        self.started = True
+
+    def print_routing_tables(self):
+        '''
+        Log the final routing tables in debug mode and the end time
+        '''
+        if log.isEnabledFor(logging.DEBUG):
+            for _, router in self.routers.items():
+                log.debug(router.format_routing_table())
+        log.info("%s", self.curr_time)
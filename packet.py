@@ -5,15 +5,21 @@ from utils import (
 
 class Packet:
 
-    def __init__(self, num_bits, packet_type, source, destination, 
-        time_spawn, in_transit, curr_pos, network,
-        flow, packet_info, packet_no, last_packet, 
+    # Packets are the most common objects in the simulation, so they don't
+    # get a per-instance __dict__. Packets are recycled by the network, see
+    # Network.create_packet and Network.release_packet
+    __slots__ = (
+        "num_bits", "packet_type", "source", "destination", "time_spawn",
+        "in_transit", "curr_pos", "flow", "expecting_packet", "packet_no",
+        "last_packet", "time_enqueued", "current_cost", "prev_link"
+    )
+
+    def __init__(self, num_bits, packet_type, source, destination,
+        time_spawn, in_transit, curr_pos,
+        flow, packet_no, last_packet,
         expecting_packet):
 
-        # Reference to the network object
-        self.network = network
-
-        # number of bits in the packet. should be Packet.PACKET_SIZE, 
+        # number of bits in the packet. should be Packet.PACKET_SIZE,
         # Packet.MESSAGE_SIZE, or Packet.ACK_SIZE
         self.num_bits = num_bits
 
@@ -33,24 +39,19 @@ class Packet:
         # 0 if the packet is at a host or router. 1 if the packet is in a link
         self.in_transit = in_transit
 
-        # Reference to the object (link, host, or router) that the packet 
+        # Reference to the object (link, host, or router) that the packet
         # is currently in
         self.curr_pos = curr_pos
 
         # This should be a reference to the flow object or None. For the cases
-        # where routers are passing messages to determine shortest path, the 
-        # packets won't have a flow id 
+        # where routers are passing messages to determine shortest path, the
+        # packets won't have a flow id
         self.flow = flow
 
         # If self is ack, the next packet the receiver is expecting
         self.expecting_packet = expecting_packet
 
-        # For message passing, this will be the information used for the 
-        # shortest path algorithm represented as an array. For other packet 
-        # types, this is None
-        self.packet_info = packet_info
-
-        # The packet number relative to the start of the flow. This will be 
+        # The packet number relative to the start of the flow. This will be
         # none if the packet doesn't have a flow id
         self.packet_no = packet_no
 
@@ -58,17 +59,11 @@ class Packet:
         # should be none if the packet doesn't have a flow id
         self.last_packet = last_packet
 
-        # This should be the time that the last curr_pos object started sending
-        # the packet
-        self.time_sent = None
-
-        # The next time at which we should do something with the packet. This should 
-        # be calculated outside of the packet class 
-        self.time_next_move = None
-        
-        # Time in received packets queue
-        self.time_in_queue = None
+        # The time at which the packet was put in its current link buffer.
+        # Used by queue disciplines that look at how long packets wait
+        self.time_enqueued = None
 
+        # For message passing, the cost of the path the message took so far
         self.current_cost = 0.0
-        
-        self.prev_link = None
\ No newline at end of file
+
+        self.prev_link = None
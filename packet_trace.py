@@ -0,0 +1,293 @@
+import json
+import queue
+import struct
+import argparse
+import threading
+import numpy as np
+from utils import PACKET, ACK, MESSAGE
+
+# A trace file starts with MAGIC, the length of a JSON header as a 4 byte
+# little endian integer and the header itself, padded with spaces to a
+# multiple of 8 bytes. The rest of the file is fixed width records, one per
+# traced packet event, laid out as RECORD (and RECORD_DTYPE for NumPy):
+#
+#     time           simulation time in seconds
+#     event          one of EVENTS
+#     packet_type    PACKET, ACK or MESSAGE
+#     link           id of the link, or of the link the packet arrived on
+#     flow           index of the flow in the header's "flows", -1 if none
+#     packet_no      number of the packet in its flow, -1 if none
+#     expecting      for an ACK, the next packet the receiver expects
+#     size           size of the packet in bits
+#     queue_bits     bits in the link buffer after the event
+#     queue_packets  packets in the link buffer after the event
+MAGIC = b"NETTRACE"
+VERSION = 1
+
+ENQUEUE = 0
+DROP = 1
+TRANSMIT = 2
+ARRIVE = 3
+RECEIVE = 4
+# Names of the events, by number. ENQUEUE: put in a link buffer. DROP:
+# dropped by a link, on the way in or out of its buffer. TRANSMIT: done
+# transmitting onto the link. ARRIVE: delivered at the other end of the
+# link. RECEIVE: handled by its flow at a host
+EVENTS = ("enqueue", "drop", "transmit", "arrive", "receive")
+
+PACKET_TYPES = {"packet": PACKET, "ack": ACK, "message": MESSAGE}
+
+RECORD = struct.Struct("<dBBxxiiiiIII")
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"), ("event", "u1"), ("packet_type", "u1"), ("pad", "<u2"),
+    ("link", "<i4"), ("flow", "<i4"), ("packet_no", "<i4"),
+    ("expecting", "<i4"), ("size", "<u4"), ("queue_bits", "<u4"),
+    ("queue_packets", "<u4")
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# Records are packed into buffers of this many records, which are handed to
+# the writer thread when full
+BUFFER_RECORDS = 65536
+
+# Number of full buffers that may wait for the writer thread. When the disk
+# can't keep up, the simulation waits instead of using more memory
+MAX_PENDING_BUFFERS = 8
+
+UINT32_MAX = 2 ** 32 - 1
+
+
+class TraceWriter:
+    '''
+    Writes buffers to a file on a background thread
+    '''
+
+    def __init__(self, filename, header):
+        self.file = open(filename, "wb")
+        header = json.dumps(header).encode()
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.queue = queue.Queue(MAX_PENDING_BUFFERS)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            self.file.write(data)
+        self.file.close()
+
+    def write(self, data):
+        self.queue.put(data)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class PacketTrace:
+    '''
+    Records packet events of a network to a binary trace file. Links and
+    flows call record while the network runs, if network.tracer is set.
+    Only the packets of the given flows (ids), links (ids) and packet types
+    (names from PACKET_TYPES) are recorded, or all of them if a filter is
+    None. Routing messages have no flow, so a flow filter leaves them out.
+    '''
+
+    def __init__(self, network, filename, flows=None, links=None,
+                 packet_types=None, buffer_records=BUFFER_RECORDS):
+        # Reference to the network object
+        self.network = network
+
+        # The index of each flow in the trace, by flow object
+        self.flow_index = dict((flow, index) for index, (_, flow)
+                               in enumerate(network.flows.items()))
+
+        # The filters, as sets of flow objects, link ids and packet types
+        self.flows = None
+        if flows is not None:
+            flows = set(str(flow_id) for flow_id in flows)
+            self.flows = set(flow for flow in self.flow_index
+                             if str(flow.id) in flows)
+        self.links = None
+        if links is not None:
+            self.links = set(int(link_id) for link_id in links)
+        self.packet_types = None
+        if packet_types is not None:
+            self.packet_types = set(PACKET_TYPES[name.lower()]
+                                    for name in packet_types)
+
+        # The buffer that records are packed into, and the number of
+        # records in it
+        self.buffer_records = buffer_records
+        self.buffer = bytearray(buffer_records * RECORD.size)
+        self.num_buffered = 0
+
+        # Number of records written over the whole trace
+        self.num_records = 0
+
+        self.writer = TraceWriter(filename, {
+            "version": VERSION,
+            "record_size": RECORD.size,
+            "events": EVENTS,
+            "packet_types": PACKET_TYPES,
+            "flows": [flow.id for flow in self.flow_index],
+            "filters": {
+                "flows": sorted(flows) if flows is not None else None,
+                "links": sorted(self.links) if links is not None else None,
+                "packet_types": list(packet_types)
+                                if packet_types is not None else None
+            }
+        })
+
+    def record(self, event, link, packet):
+        '''
+        Record an event of packet at link
+        '''
+        flow = packet.flow
+        if self.flows is not None and flow not in self.flows:
+            return
+        if self.links is not None and link.id not in self.links:
+            return
+        if self.packet_types is not None and \
+                packet.packet_type not in self.packet_types:
+            return
+
+        packet_no = packet.packet_no
+        expecting = packet.expecting_packet
+        RECORD.pack_into(
+            self.buffer, self.num_buffered * RECORD.size,
+            self.network.curr_time, event, packet.packet_type, link.id,
+            self.flow_index[flow] if flow is not None else -1,
+            packet_no if packet_no is not None else -1,
+            expecting if expecting is not None else -1,
+            packet.num_bits, min(link.buffer_bits, UINT32_MAX),
+            len(link.buffer))
+        self.num_buffered += 1
+        if self.num_buffered == self.buffer_records:
+            self.flush()
+
+    def flush(self):
+        if self.num_buffered == 0:
+            return
+        if self.num_buffered == self.buffer_records:
+            self.writer.write(self.buffer)
+        else:
+            self.writer.write(bytes(self.buffer[:self.num_buffered *
+                                                RECORD.size]))
+        self.num_records += self.num_buffered
+        # The writer thread owns the old buffer now
+        self.buffer = bytearray(self.buffer_records * RECORD.size)
+        self.num_buffered = 0
+
+    def close(self):
+        '''
+        Write out the remaining records and wait for the writer thread
+        '''
+        self.flush()
+        self.writer.close()
+
+
+class TraceReader:
+    '''
+    Reads a trace file. The records are memory mapped as a NumPy record
+    array, so traces larger than memory can be analysed, and selections
+    are done with vectorized comparisons.
+    '''
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(filename + " is not a packet trace")
+            length, = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(length).decode())
+        if self.header["version"] != VERSION:
+            raise ValueError(filename + " has trace version " +
+                             str(self.header["version"]))
+        offset = len(MAGIC) + 4 + length
+        self.records = np.memmap(filename, dtype=RECORD_DTYPE, mode="r",
+                                 offset=offset)
+        # The ids of the flows, by their index in the records
+        self.flow_ids = self.header["flows"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, events=None, flows=None, links=None, packet_types=None,
+               start=None, end=None):
+        '''
+        Returns the records that match every given filter: event names,
+        flow ids, link ids, packet type names and a time range
+        '''
+        records = self.records
+        mask = np.ones(len(records), dtype=bool)
+        if events is not None:
+            mask &= np.isin(records["event"],
+                            [EVENTS.index(name) for name in events])
+        if flows is not None:
+            flows = set(str(flow_id) for flow_id in flows)
+            mask &= np.isin(records["flow"],
+                            [index for index, flow_id in
+                             enumerate(self.flow_ids) if str(flow_id) in flows])
+        if links is not None:
+            mask &= np.isin(records["link"], [int(link) for link in links])
+        if packet_types is not None:
+            mask &= np.isin(records["packet_type"],
+                            [PACKET_TYPES[name] for name in packet_types])
+        if start is not None:
+            mask &= records["time"] >= start
+        if end is not None:
+            mask &= records["time"] < end
+        return records[mask]
+
+    def counts(self, records=None):
+        '''
+        Returns the number of records of each event
+        '''
+        if records is None:
+            records = self.records
+        counts = np.bincount(records["event"], minlength=len(EVENTS))
+        return dict(zip(EVENTS, counts.tolist()))
+
+    def format_record(self, record):
+        flow = record["flow"]
+        packet_type = [name for name, value in PACKET_TYPES.items()
+                       if value == record["packet_type"]][0]
+        return "%.6f %-8s %-7s link %-4d flow %-4s no %-6d exp %-6d %6d bits " \
+               "queue %d/%d bits" % (
+                   record["time"], EVENTS[record["event"]], packet_type,
+                   record["link"],
+                   self.flow_ids[flow] if flow >= 0 else "-",
+                   record["packet_no"], record["expecting"], record["size"],
+                   record["queue_packets"], record["queue_bits"])
+
+
+def split_list(value):
+    return value.split(",") if value else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect a packet trace")
+    parser.add_argument("filename", help="trace file written with --trace")
+    parser.add_argument("--events", help='comma separated, e.g. "drop,enqueue"')
+    parser.add_argument("--flows", help="comma separated flow ids")
+    parser.add_argument("--links", help="comma separated link ids")
+    parser.add_argument("--types", help='comma separated, e.g. "packet,ack"')
+    parser.add_argument("--start", type=float, help="start time in seconds")
+    parser.add_argument("--end", type=float, help="end time in seconds")
+    parser.add_argument("--head", type=int, default=20,
+                        help="number of records to print, default 20")
+    args = parser.parse_args()
+
+    reader = TraceReader(args.filename)
+    records = reader.select(split_list(args.events), split_list(args.flows),
+                            split_list(args.links), split_list(args.types),
+                            args.start, args.end)
+    print("%d of %d records" % (len(records), len(reader)))
+    for name, count in reader.counts(records).items():
+        print("    %-8s %d" % (name, count))
+    for record in records[:args.head]:
+        print(reader.format_record(record))
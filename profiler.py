@@ -0,0 +1,176 @@
+import json
+import signal
+from time import perf_counter
+from sim_logging import get_logger
+
+log = get_logger("network")
+
+
+class Profiler:
+    '''
+    Lightweight instrumentation of the engine loop. When enabled, one step
+    (or one event, in the event driven engine) out of every sample_interval
+    is timed per component type, and the queue lengths of the links and
+    routers are added to histograms. Times and call counts are scaled back
+    up by sample_interval in the report, so they estimate the whole run.
+    With sample_interval=1 every step is timed exactly.
+
+    The profiler can be switched on and off while the network runs, from
+    code or with SIGUSR2, and SIGUSR1 logs the report so far.
+    '''
+
+    def __init__(self, sample_interval=100):
+        # Whether the engine loop calls into the profiler at all
+        self.enabled = False
+
+        # Profile one step or event out of every sample_interval
+        self.sample_interval = sample_interval
+
+        # Steps or events left until the next one that is profiled
+        self.countdown = 1
+
+        # Measured seconds and calls per component type, only counting the
+        # profiled steps and events
+        self.times = {}
+        self.calls = {}
+
+        # Number of profiled steps or events
+        self.num_samples = 0
+
+        # Histograms of queue lengths, in packets. Bucket b counts queues
+        # of length 2^(b-1) to 2^b - 1, and bucket 0 counts empty queues
+        self.link_queue_histogram = []
+        self.router_queue_histogram = []
+
+        # If set, the report is written to this file as JSON at the end of
+        # run_network, and logged
+        self.report_file = None
+        self.report_at_end = False
+
+    def enable(self, sample_interval=None):
+        if sample_interval is not None:
+            self.sample_interval = sample_interval
+        self.countdown = 1
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def sample(self):
+        '''
+        Returns True if this step or event should be profiled
+        '''
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        self.countdown = self.sample_interval
+        self.num_samples += 1
+        return True
+
+    def add(self, kind, seconds, calls=1):
+        self.times[kind] = self.times.get(kind, 0.0) + seconds
+        self.calls[kind] = self.calls.get(kind, 0) + calls
+
+    def time_call(self, kind, callback, args):
+        '''
+        Run callback(*args) and add its time to kind
+        '''
+        start = perf_counter()
+        callback(*args)
+        self.add(kind, perf_counter() - start)
+
+    def record_queues(self, network):
+        for _, link in network.links.items():
+            add_to_histogram(self.link_queue_histogram, len(link.buffer))
+        for _, router in network.routers.items():
+            add_to_histogram(self.router_queue_histogram,
+                             len(router.outgoing_packets))
+
+    def report(self, network):
+        '''
+        Returns the report as a dict
+        '''
+        scale = self.sample_interval
+        total = sum(self.times.values()) or 1.0
+        components = {}
+        for kind in sorted(self.times, key=self.times.get, reverse=True):
+            components[kind] = {
+                "estimated_seconds": self.times[kind] * scale,
+                "estimated_calls": self.calls[kind] * scale,
+                "share": self.times[kind] / total
+            }
+        return {
+            "sim_time": network.curr_time,
+            "sample_interval": self.sample_interval,
+            "samples": self.num_samples,
+            "packets_created": network.packets_created,
+            "components": components,
+            "link_queue_histogram":
+                histogram_buckets(self.link_queue_histogram),
+            "router_queue_histogram":
+                histogram_buckets(self.router_queue_histogram)
+        }
+
+    def format_report(self, network):
+        report = self.report(network)
+        lines = ["Profile at t=%.3f, 1 in %d sampled, %d samples, "
+                 "%d packets created" % (report["sim_time"],
+                                         report["sample_interval"],
+                                         report["samples"],
+                                         report["packets_created"])]
+        for kind, entry in report["components"].items():
+            lines.append("    %-24s %9.3fs %12d calls %5.1f%%" % (
+                kind, entry["estimated_seconds"], entry["estimated_calls"],
+                100 * entry["share"]))
+        for name in ("link_queue_histogram", "router_queue_histogram"):
+            buckets = report[name]
+            if buckets:
+                lines.append("    " + name.replace("_", " ") + ": " +
+                             " ".join("%s:%d" % bucket for bucket in buckets))
+        return "\n".join(lines)
+
+    def dump(self, network):
+        '''
+        Log the report, and write it to report_file if there is one
+        '''
+        log.info(self.format_report(network))
+        if self.report_file is not None:
+            with open(self.report_file, "w") as f:
+                json.dump(self.report(network), f, indent=2)
+
+    def install_signal_handlers(self, network):
+        '''
+        SIGUSR1 logs the report so far and SIGUSR2 switches profiling on
+        or off. Only works on platforms that have these signals.
+        '''
+        if not hasattr(signal, "SIGUSR1"):
+            return
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump(network))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle())
+
+
+def add_to_histogram(histogram, length):
+    bucket = length.bit_length()
+    while len(histogram) <= bucket:
+        histogram.append(0)
+    histogram[bucket] += 1
+
+
+def histogram_buckets(histogram):
+    '''
+    Returns the histogram as a list of ("low-high", count) pairs
+    '''
+    buckets = []
+    for bucket, count in enumerate(histogram):
+        if bucket == 0:
+            label = "0"
+        else:
+            label = "%d-%d" % (1 << (bucket - 1), (1 << bucket) - 1)
+        buckets.append((label, count))
+    return buckets
@@ -0,0 +1,159 @@
+import random
+from math import sqrt
+from utils import PACKET_SIZE
+
+
+class QueueDiscipline:
+    '''
+    Decides which packets a link keeps in its buffer. The link keeps a
+    running count of the bits in its buffer (link.buffer_bits), so a
+    discipline never has to scan the buffer to make a decision.
+    '''
+
+    def drop_on_enqueue(self, link, packet, curr_time):
+        '''
+        Called before a packet is put in the link buffer. Returns True if
+        the packet should be dropped instead.
+        '''
+        return False
+
+    def drop_on_dequeue(self, link, packet, curr_time):
+        '''
+        Called after a packet is taken off of the link buffer and before it
+        is transmitted. Returns True if the packet should be dropped instead.
+        '''
+        return False
+
+
+class DropTail(QueueDiscipline):
+    '''
+    Drops packets that arrive when the buffer is full
+    '''
+
+    def drop_on_enqueue(self, link, packet, curr_time):
+        return link.buffer_bits + packet.num_bits >= link.queue_capacity
+
+
+class RED(QueueDiscipline):
+    '''
+    Random Early Detection. Keeps an exponentially weighted average of the
+    buffer occupancy and drops arriving packets with a probability that
+    grows linearly between the min and max thresholds. The thresholds are
+    fractions of the link's queue capacity.
+    '''
+
+    def __init__(self, min_threshold=0.25, max_threshold=0.75, max_prob=0.1,
+                 weight=0.002):
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.max_prob = max_prob
+        self.weight = weight
+
+        # Average buffer occupancy in bits
+        self.avg = 0.0
+
+        # Number of packets admitted since the last early drop. Used to
+        # spread the drops out evenly
+        self.count = 0
+
+    def drop_on_enqueue(self, link, packet, curr_time):
+        # The buffer is physically full
+        if link.buffer_bits + packet.num_bits >= link.queue_capacity:
+            self.count = 0
+            return True
+
+        self.avg += self.weight * (link.buffer_bits - self.avg)
+        min_bits = self.min_threshold * link.queue_capacity
+        max_bits = self.max_threshold * link.queue_capacity
+        if self.avg < min_bits:
+            self.count = 0
+            return False
+        if self.avg >= max_bits:
+            self.count = 0
+            return True
+
+        prob = self.max_prob * (self.avg - min_bits) / (max_bits - min_bits)
+        if self.count * prob < 1:
+            prob = prob / (1 - self.count * prob)
+        else:
+            prob = 1
+        if random.random() < prob:
+            self.count = 0
+            return True
+        self.count += 1
+        return False
+
+
+class CoDel(QueueDiscipline):
+    '''
+    Controlled Delay. Looks at how long each packet sat in the buffer and
+    starts dropping once that has been above target for a whole interval.
+    While dropping, the time between drops shrinks with the square root of
+    the number of drops. Times are in seconds.
+    '''
+
+    def __init__(self, target=0.005, interval=0.1):
+        self.target = target
+        self.interval = interval
+
+        # The time at which the sojourn time will have been above target
+        # for a whole interval, or 0 if it is below target
+        self.first_above_time = 0
+
+        # True while we are in the dropping state
+        self.dropping = False
+
+        # The next time to drop a packet while in the dropping state
+        self.drop_next = 0
+
+        # Number of drops since we entered the dropping state
+        self.count = 0
+
+    def control_law(self, curr_time):
+        return curr_time + self.interval / sqrt(self.count)
+
+    def drop_on_enqueue(self, link, packet, curr_time):
+        # CoDel only drops at dequeue, but the buffer still has a size
+        return link.buffer_bits + packet.num_bits >= link.queue_capacity
+
+    def drop_on_dequeue(self, link, packet, curr_time):
+        sojourn_time = curr_time - packet.time_enqueued
+        above_target = False
+        if sojourn_time < self.target or link.buffer_bits <= PACKET_SIZE:
+            self.first_above_time = 0
+        elif self.first_above_time == 0:
+            self.first_above_time = curr_time + self.interval
+        elif curr_time >= self.first_above_time:
+            above_target = True
+
+        if self.dropping:
+            if not above_target:
+                self.dropping = False
+                return False
+            if curr_time >= self.drop_next:
+                self.count += 1
+                self.drop_next = self.control_law(self.drop_next)
+                return True
+            return False
+
+        if above_target:
+            self.dropping = True
+            self.count = 1
+            self.drop_next = self.control_law(curr_time)
+            return True
+        return False
+
+
+# Queue disciplines that can be named in the "queue" field of a link
+QUEUE_DISCIPLINES = {
+    "DROPTAIL": DropTail,
+    "RED": RED,
+    "CODEL": CoDel
+}
+
+
+def create_queue_discipline(name):
+    '''
+    Create a new queue discipline from its name, ignoring case
+    '''
+    return QUEUE_DISCIPLINES[name.upper()]()
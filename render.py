@@ -0,0 +1,29 @@
+import os
+import argparse
+from metrics import load_metrics
+from main import graph_series
+
+
+def render(filename, workers=None):
+    '''
+    Render the graphs of a metrics file saved with --metrics-out. Returns
+    the number of figures that had to be rendered.
+    '''
+    series, metadata = load_metrics(filename)
+    if metadata is None:
+        raise ValueError(filename + " has no graph metadata")
+    return graph_series(series, metadata, workers or os.cpu_count())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Render the graphs of saved simulation metrics")
+    parser.add_argument("metrics", nargs="+",
+                        help=".npz or .parquet files saved with --metrics-out")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, default one per core")
+    args = parser.parse_args()
+
+    for filename in args.metrics:
+        num_rendered = render(filename, args.workers)
+        print("%s: rendered %d figures" % (filename, num_rendered))
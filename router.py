@@ -1,9 +1,13 @@
 from collections import deque
 from host import Host
+from sim_logging import get_logger
 from utils import (
     DEBUG, RENO,
     PACKET_SIZE, ACK_SIZE, MESSAGE_SIZE, PACKET, ACK, MESSAGE
 )
+import logging
+
+log = get_logger("router")
 
 
 class Router:
@@ -34,6 +38,10 @@ class Router:
         
         self.next_routing_table = {}
 
+        # Maps each destination straight to the link to send on. This is
+        # rebuilt from the routing table whenever the routing table changes
+        self.forwarding_table = {}
+
         # Initialize a list of links that the router is connected to
         self.outgoing_links = []
         self.incoming_links = []
@@ -60,6 +68,7 @@ class Router:
         shortest distance from this router to all the other hosts and routers 
         in the network. It will use message passing between routers and the 
         Bellman Ford algorithm to figure out what the routing table will be.
+        Returns True if a route changed.
         '''
         # Get each host to generate a packet
         #self.network.generate_messages()
@@ -71,6 +80,20 @@ class Router:
         for item in prev_routing_list:
             if item[0] not in self.next_routing_table:
                 self.next_routing_table[item[0]] = item[1]
+
+        # If every destination is still reached through the same link, the
+        # network has converged and there is nothing to rebuild. Only the
+        # costs are brought up to date. They are floats that move a little
+        # with the load at every flood, so they are not compared.
+        routing_table = self.routing_table
+        if routing_table and all(
+                destination in routing_table and
+                routing_table[destination][0] is entry[0]
+                for destination, entry in self.next_routing_table.items()):
+            for destination, entry in self.next_routing_table.items():
+                routing_table[destination][1] = entry[1]
+            self.next_routing_table = {}
+            return False
         self.routing_table = self.next_routing_table
 
         # The hosts should be routed to the same link as the router they're 
@@ -81,57 +104,75 @@ class Router:
             else: 
                 self.routing_table[host] = [host.incoming_link, 0]
         self.next_routing_table = {}
+        self.update_forwarding_table()
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(self.format_routing_table())
+        return True
 
-        print(" -----Table for router " + str(self.id))
-        lst = self.routing_table.items()
-        for item in lst:
+
+    def format_routing_table(self):
+        '''
+        Returns the routing table as a printable string
+        '''
+        lines = [" -----Table for router " + str(self.id)]
+        for item in self.routing_table.items():
             if isinstance(item[0], Host):
-                print("Host = " + str(item[0].id) + " via link " + 
-                      str((item[1])[0].id) + " with a cost of " + str(item[1][1]))
+                lines.append("Host = " + str(item[0].id) + " via link " + 
+                             str((item[1])[0].id) + " with a cost of " + str(item[1][1]))
             else:
-            
-                print("Router = " + str(item[0].id) + " via link " + 
-                        str((item[1])[0].id) + " with a cost of " + str(item[1][1]))                    
-        print('')         
+                lines.append("Router = " + str(item[0].id) + " via link " + 
+                             str((item[1])[0].id) + " with a cost of " + str(item[1][1]))
+        lines.append('')
+        return "\n".join(lines)
 
     
+    def update_forwarding_table(self):
+        '''
+        Rebuild the destination to link lookup used by send_packet from the
+        routing table
+        '''
+        self.forwarding_table = {}
+        for destination, entry in self.routing_table.items():
+            self.forwarding_table[destination] = entry[0]
+
+
     def send_packet(self):
         '''
         At every iteration this function will be invoked to see if a packet(s) can
         be sent from the router. 
         '''
-    
         # For each packet about to be sent the router should look up which link 
-        # to place them on by looking up their destinations in the routing table	
-        for packet in list(self.outgoing_packets):
+        # to place them on by looking up their destinations in the forwarding
+        # table
+        outgoing_packets = self.outgoing_packets
+        forwarding_table = self.forwarding_table
+        while outgoing_packets:
+            packet = outgoing_packets.popleft()
             if packet.packet_type == MESSAGE:
+                # Routing messages already know which link they go out on
                 packet.prev_link.add_packets([packet])
-                # Delete the packet from the outgoing queue
-                self.outgoing_packets.remove(packet)
-                if DEBUG:
+                if log.isEnabledFor(logging.DEBUG):
                     if isinstance(packet.destination, Host):
-                        print("Sent message destined for Host " +
-                              str(packet.destination.id) + 
-                              " and sent it from router " + str(self.id) +
-                              " with original starting point being Router" + str(packet.source.id) +
-                              " via link " + str(packet.prev_link.id)) 
+                        log.debug("Sent message destined for Host " +
+                                  str(packet.destination.id) + 
+                                  " and sent it from router " + str(self.id) +
+                                  " with original starting point being Router" + str(packet.source.id) +
+                                  " via link " + str(packet.prev_link.id)) 
                     else:
-                        print("Sent message destined for Router " + str(packet.destination.id) +  " with original starting point being Router" + 
-                              str(packet.source.id) + \
-                              " and sent it from router " + str(self.id) + \
-                              " via link " + str(packet.prev_link.id))
-                
-            else:
-                # Delete the packet from the outgoing queue
-                self.outgoing_packets.remove(packet)                
-                # Find the link to use to send the packet
-                chosen_link = self.routing_table[packet.destination][0]
-                
-                # We want to send the packet by adding it to the link's buffer
-                chosen_link.add_packets([packet])
-                    
-                # Update the current position to be the link
-                packet.curr_pos = chosen_link
+                        log.debug("Sent message destined for Router " + str(packet.destination.id) +  " with original starting point being Router" + 
+                                  str(packet.source.id) + \
+                                  " and sent it from router " + str(self.id) + \
+                                  " via link " + str(packet.prev_link.id))
+                continue
+
+            chosen_link = forwarding_table[packet.destination]
+
+            # Update the current position to be the link
+            packet.curr_pos = chosen_link
+
+            # We want to send the packet by adding it to the link's buffer
+            chosen_link.add_packets([packet])
                 
         
     def send_messages(self):
@@ -139,18 +180,19 @@ class Router:
         # router is connected to
         for link in self.outgoing_links: 
             message = self.network.create_packet(MESSAGE_SIZE, MESSAGE,
-                                                self, self.neighbors[link], self.curr_time,
+                                                self, link.connection2, self.curr_time,
                                                 False, self)  
             message.prev_link = link
             self.outgoing_packets.append(message)
-            if DEBUG:
-                if isinstance(self.neighbors[link], Host):
-                    print("Created message destined for Host " + str(self.neighbors[link].id) + " and sent it from router " + str(self.id) + " via link " + str(link.id)) 
+            self.network.schedule_wakeup(self)
+            if log.isEnabledFor(logging.DEBUG):
+                if isinstance(link.connection2, Host):
+                    log.debug("Created message destined for Host " + str(link.connection2.id) + " and sent it from router " + str(self.id) + " via link " + str(link.id)) 
                 else:
-                    print("Created message destined for Router " +
-                          str(self.neighbors[link].id) + 
-                          " and sent it from router " + str(self.id) + 
-                          " via link " + str(link.id))                     
+                    log.debug("Created message destined for Router " +
+                              str(link.connection2.id) + 
+                              " and sent it from router " + str(self.id) + 
+                              " via link " + str(link.id))                     
             
         
     def receive_packet(self, pkt):
@@ -167,43 +209,34 @@ class Router:
             # get node that message as originated from
             orgin = pkt.source
             
-            if DEBUG:
-                    print("Received message destined for Router " +
-                          str(pkt.destination.id) + 
-                          " which was sent originally from Router " + str(pkt.source.id) + 
-                          " and sent from Router " + str(self.neighbors[pkt.prev_link].id) +
-                          " via link " + str(pkt.prev_link.id) + " with a cost of "
-                          + str(pkt.current_cost)) 
+            if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Received message destined for Router " +
+                              str(pkt.destination.id) + 
+                              " which was sent originally from Router " + str(pkt.source.id) + 
+                              " and sent from Router " + str(pkt.prev_link.connection1.id) +
+                              " via link " + str(pkt.prev_link.id) + " with a cost of "
+                              + str(pkt.current_cost)) 
             
             # if the host does not exist in the routing table or the distance to 
             # this distination is shorter 
             if (orgin not in self.next_routing_table or (self.next_routing_table[orgin])[1] > pkt.current_cost) and \
             self != orgin:
-                self.next_routing_table[orgin] = [self.network.correspond_links[pkt.prev_link], pkt.current_cost]    
+                self.next_routing_table[orgin] = [pkt.prev_link.reverse, pkt.current_cost]    
             
             else:
                 # we didn't update the routing table so we don't want to forward
                 # this info
+                self.network.release_packet(pkt)
                 return
             
-            if DEBUG:
-                print(" -----Table for router " + str(self.id))
-                lst = self.routing_table.items()
-                for item in lst:
-                    if isinstance(item[0], Host):
-                        print("Host = " + str(item[0].id) + " via link " + 
-                              str((item[1])[0].id) + " with a cost of " + str(item[1][1]))
-                    else:
-                    
-                        print("Router = " + str(item[0].id) + " via link " + 
-                                str((item[1])[0].id) + " with a cost of " + str(item[1][1]))                    
-                print('')            
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(self.format_routing_table())
             
             
             for link in self.outgoing_links:
-                if link != self.network.correspond_links[pkt.prev_link]:
+                if link != pkt.prev_link.reverse:
                     message = self.network.create_packet(MESSAGE_SIZE, MESSAGE,
-                                                         pkt.source, self.neighbors[link], self.curr_time,
+                                                         pkt.source, link.connection2, self.curr_time,
                                                          False, self)  
                     message.current_cost = pkt.current_cost
                     # Update the current postion of the packet to the current router
@@ -214,14 +247,17 @@ class Router:
                     
                     # then it will place the packet in its outgoing packets queue
                     self.outgoing_packets.append(message)  
-                    if DEBUG:
-                        print("Transmitted message destined for Router " +
-                              str(message.destination.id) + 
-                              " which was sent originally from Router " + str(message.source.id) + 
-                              " and sent from Router " + str(self.id) +
-                              " via link " + str(link.id) + " with a cost of " +
-                              str(message.current_cost)) 
-                
+                    self.network.schedule_wakeup(self)
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("Transmitted message destined for Router " +
+                                  str(message.destination.id) + 
+                                  " which was sent originally from Router " + str(message.source.id) + 
+                                  " and sent from Router " + str(self.id) +
+                                  " via link " + str(link.id) + " with a cost of " +
+                                  str(message.current_cost)) 
+
+            # The message was copied onto every other link
+            self.network.release_packet(pkt)
         
         else:
             # Update the current postion of the packet to the current router
@@ -230,6 +266,7 @@ class Router:
             
             # then it will place the packet in its outgoing packets queue
             self.outgoing_packets.append(pkt)
+            self.network.schedule_wakeup(self)
         
     
     def run(self, curr_time):
@@ -242,3 +279,14 @@ class Router:
         
         self.send_packet()
         #self.update_routing_table()
+
+
+    def next_wakeup_time(self):
+        '''
+        Returns the earliest time at which the router has something to do.
+        The router forwards everything in its queue as soon as it runs, so
+        this is either now or never.
+        '''
+        if len(self.outgoing_packets) > 0:
+            return self.network.curr_time
+        return float("inf")
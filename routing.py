@@ -0,0 +1,163 @@
+import heapq
+from topology import ROUTER
+from sim_logging import get_logger
+
+log = get_logger("router")
+
+# Routing modes that can be named in the "routing" field of a scenario
+DISTANCE_VECTOR = "distance_vector"
+ORACLE = "oracle"
+ROUTING_MODES = (DISTANCE_VECTOR, ORACLE)
+
+INFINITY = float("inf")
+
+
+class OracleRouting:
+    '''
+    Computes the routing tables of every router centrally instead of by
+    flooding messages through the network. The tables are the ones the
+    distance vector messages would converge to: for every destination
+    router, a shortest path tree is grown out of it with Dijkstra along the
+    direction the messages travel, using Link.calculate_dynamic_cost as the
+    cost of each link. Each router then sends towards the destination on
+    the reverse of the link its tree path arrives on.
+
+    The trees are kept between updates. When link costs change, only the
+    trees that could be affected are recomputed: the ones that use a
+    changed link, and the ones that a cheaper link could now shorten.
+
+    Everything is done on the node and link indices of network.topology.
+    '''
+
+    def __init__(self, network):
+        # Reference to the network object
+        self.network = network
+        topology = network.topology
+
+        # The node index of every router
+        kinds = topology.node_kinds.tolist()
+        self.router_nodes = [node for node in range(topology.num_nodes)
+                             if kinds[node] == ROUTER]
+
+        # The links between two routers, out of each node, as lists of
+        # (link index, destination node) pairs
+        offsets = topology.out_offsets.tolist()
+        out_links = topology.out_links.tolist()
+        src = topology.link_src.tolist()
+        dst = topology.link_dst.tolist()
+        self.adjacency = [[] for _ in range(topology.num_nodes)]
+        self.router_links = []
+        for node in self.router_nodes:
+            for i in range(offsets[node], offsets[node + 1]):
+                link = out_links[i]
+                if kinds[dst[link]] == ROUTER:
+                    self.adjacency[node].append((link, dst[link]))
+                    self.router_links.append(link)
+
+        # The source and destination node of every link
+        self.link_src = src
+        self.link_dst = dst
+
+        # The cost of every link at the last update, by link index. Only
+        # the links between two routers are filled in
+        self.costs = [None] * topology.num_links
+
+        # For every destination router, the distance of each node from it
+        # and the link through which each node is reached in its tree, or
+        # -1 if it is not reached
+        self.distances = {}
+        self.parent_links = {}
+
+        # Number of trees recomputed over the whole simulation
+        self.num_recomputed = 0
+
+    def shortest_path_tree(self, root):
+        '''
+        Dijkstra from root. Returns the distance of every node and the
+        link that each one is reached through.
+        '''
+        costs = self.costs
+        adjacency = self.adjacency
+        num_nodes = len(adjacency)
+        distances = [INFINITY] * num_nodes
+        parent_links = [-1] * num_nodes
+        done = bytearray(num_nodes)
+        distances[root] = 0.0
+        heap = [(0.0, root)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if done[node]:
+                continue
+            done[node] = 1
+            for link, neighbor in adjacency[node]:
+                new_distance = distance + costs[link]
+                if new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    parent_links[neighbor] = link
+                    heapq.heappush(heap, (new_distance, neighbor))
+        return distances, parent_links
+
+    def is_affected(self, root, changed):
+        '''
+        Returns True if the tree of root may change with the new link costs
+        in changed, which maps each changed link to its old cost
+        '''
+        distances = self.distances[root]
+        parent_links = self.parent_links[root]
+        for link, old_cost in changed.items():
+            src = self.link_src[link]
+            dst = self.link_dst[link]
+            # A link of the tree changes the distance of everything below it
+            if parent_links[dst] == link:
+                return True
+            # A link outside of the tree only matters if it got cheap enough
+            # to give a shorter path
+            if self.costs[link] < old_cost and \
+                    distances[src] + self.costs[link] < distances[dst]:
+                return True
+        return False
+
+    def update(self):
+        '''
+        Recompute the trees affected by the current link costs and install
+        the routing tables in every router. Returns the number of routers
+        whose routes changed.
+        '''
+        links = self.network.topology.links
+        costs = self.costs
+        changed = {}
+        for link in self.router_links:
+            cost = links[link].calculate_dynamic_cost()
+            if costs[link] != cost:
+                changed[link] = costs[link] if costs[link] is not None else cost
+                costs[link] = cost
+
+        num_recomputed = 0
+        for root in self.router_nodes:
+            if root not in self.distances or self.is_affected(root, changed):
+                self.distances[root], self.parent_links[root] = \
+                    self.shortest_path_tree(root)
+                num_recomputed += 1
+        self.num_recomputed += num_recomputed
+        log.debug("Oracle routing: %d links changed, %d trees recomputed",
+                  len(changed), num_recomputed)
+
+        # The trees are the same as at the last update, so are the tables
+        if num_recomputed == 0:
+            return 0
+
+        nodes = self.network.topology.nodes
+        for root in self.router_nodes:
+            destination = nodes[root]
+            distances = self.distances[root]
+            parent_links = self.parent_links[root]
+            for node in self.router_nodes:
+                if parent_links[node] >= 0:
+                    nodes[node].next_routing_table[destination] = \
+                        [links[parent_links[node]].reverse, distances[node]]
+        hosts = self.network.hosts.values()
+        num_changed = 0
+        for node in self.router_nodes:
+            if nodes[node].update_routing_table(hosts):
+                num_changed += 1
+        return num_changed
@@ -0,0 +1,164 @@
+import sys
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from utils import DEBUG
+
+# All the loggers of the simulator live under this name, one per component
+# type, e.g. "sim.flow" or "sim.router"
+ROOT_LOGGER = "sim"
+
+# Component types that have their own logger
+COMPONENTS = ("network", "host", "router", "link", "flow")
+
+
+class StdoutHandler(logging.Handler):
+    '''
+    Writes each message on its own line to whatever sys.stdout currently is,
+    the same way the print() calls this replaces did
+    '''
+
+    def emit(self, record):
+        try:
+            sys.stdout.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+class NDJSONFormatter(logging.Formatter):
+    '''
+    Formats a record as one JSON object per line
+    '''
+
+    def format(self, record):
+        event = {
+            "component": record.name.split(".")[-1],
+            "level": record.levelname,
+            "msg": record.getMessage()
+        }
+        if hasattr(record, "sim_time"):
+            event["time"] = record.sim_time
+        return json.dumps(event)
+
+
+class DeferredQueueHandler(QueueHandler):
+    '''
+    Puts records on the queue without formatting them, so that the message
+    is only built on the writer thread. Only use this with arguments that
+    are not changed after the call, like numbers and strings.
+    '''
+
+    def prepare(self, record):
+        return record
+
+
+class SimTimeFilter(logging.Filter):
+    '''
+    Stamps each record with the simulation time given by clock()
+    '''
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def filter(self, record):
+        record.sim_time = self.clock()
+        return True
+
+
+def get_logger(component):
+    '''
+    Returns the logger for a component type. Messages that are built on the
+    hot path should be guarded with logger.isEnabledFor so that nothing is
+    formatted when the level is off.
+    '''
+    return logging.getLogger(ROOT_LOGGER + "." + component)
+
+
+def set_level(component, level):
+    '''
+    Set the level of one component's logger, or of every logger if
+    component is None. level can be a name like "DEBUG" or a number.
+    '''
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    if component is None:
+        for name in COMPONENTS:
+            get_logger(name).setLevel(level)
+    else:
+        get_logger(component).setLevel(level)
+
+
+def parse_levels(spec):
+    '''
+    Parse a string of the form "flow=DEBUG,router=WARNING" or "DEBUG" and
+    set the levels it names
+    '''
+    for item in spec.split(","):
+        if "=" in item:
+            component, level = item.split("=")
+            set_level(component.strip(), level.strip())
+        else:
+            set_level(None, item.strip())
+
+
+def set_stdout_level(level):
+    '''
+    Only echo records of at least this level to stdout. Useful with the
+    event log, to keep a detailed trace on disk but a quiet console.
+    '''
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    _stdout_handler.setLevel(level)
+
+
+# The writer thread of the event log, if there is one
+_event_listener = None
+
+
+def start_event_log(filename, clock=None):
+    '''
+    Write every log record that passes the component levels to filename as
+    newline delimited JSON. The file is written by a background thread so
+    the simulation only pays for putting the record on a queue. If clock is
+    given, each record gets the simulation time at which it was logged.
+    '''
+    global _event_listener
+    stop_event_log()
+
+    file_handler = logging.FileHandler(filename, mode="w")
+    file_handler.setFormatter(NDJSONFormatter())
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    if clock is not None:
+        queue_handler.addFilter(SimTimeFilter(clock))
+    logging.getLogger(ROOT_LOGGER).addHandler(queue_handler)
+
+    _event_listener = QueueListener(records, file_handler)
+    _event_listener.queue_handler = queue_handler
+    _event_listener.start()
+
+
+def stop_event_log():
+    '''
+    Flush and close the event log started by start_event_log
+    '''
+    global _event_listener
+    if _event_listener is None:
+        return
+    logging.getLogger(ROOT_LOGGER).removeHandler(_event_listener.queue_handler)
+    _event_listener.stop()
+    for handler in _event_listener.handlers:
+        handler.close()
+    _event_listener = None
+
+
+# Echo the messages to stdout, the way they were printed before
+_stdout_handler = StdoutHandler()
+_stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.getLogger(ROOT_LOGGER).addHandler(_stdout_handler)
+logging.getLogger(ROOT_LOGGER).propagate = False
+
+# In debug mode we want every message
+set_level(None, logging.DEBUG if DEBUG else logging.INFO)
@@ -0,0 +1,107 @@
+from collections import deque
+
+
+class SenderWindow:
+    '''
+    The packets that a flow has sent but that have not been acknowledged.
+    A flow always sends its packets in order, so the packets in the window
+    are consecutive and only the number of the first one is stored, along
+    with the send time of every packet.
+    '''
+
+    def __init__(self):
+        # The number of the oldest unacknowledged packet
+        self.first = 1
+
+        # The send times of the unacknowledged packets, oldest first
+        self.send_times = deque()
+
+    def __len__(self):
+        return len(self.send_times)
+
+    def append(self, packet_no, send_time):
+        '''
+        Add a packet that was just sent. packet_no must come right after
+        the last packet in the window, unless the window is empty.
+        '''
+        if not self.send_times:
+            self.first = packet_no
+        self.send_times.append(send_time)
+
+    def first_packet(self):
+        '''
+        Returns the number of the oldest unacknowledged packet
+        '''
+        return self.first
+
+    def first_send_time(self):
+        '''
+        Returns the time at which the oldest unacknowledged packet was sent
+        '''
+        return self.send_times[0]
+
+    def acknowledge(self, expecting_packet):
+        '''
+        Remove every packet before expecting_packet from the window. Returns
+        the number of packets that were removed.
+        '''
+        send_times = self.send_times
+        num_acked = min(expecting_packet - self.first, len(send_times))
+        if num_acked <= 0:
+            return 0
+        for _ in range(num_acked):
+            send_times.popleft()
+        self.first += num_acked
+        return num_acked
+
+    def clear(self):
+        '''
+        Forget all the unacknowledged packets, e.g. after a timeout
+        '''
+        self.send_times.clear()
+
+
+class ReceiverWindow:
+    '''
+    The packets that a flow's receiver has received. Everything before
+    next_missing has been received, so only a bitmap of the packets from
+    next_missing onwards is kept. The bitmap only ever covers the packets
+    that arrived out of order, and is released as next_missing advances.
+    '''
+
+    def __init__(self):
+        # The smallest packet that has not been received
+        self.next_missing = 1
+
+        # One byte per packet starting at next_missing. 1 if the packet has
+        # been received. The first byte is always 0
+        self.received = bytearray()
+
+    def __contains__(self, packet_no):
+        offset = packet_no - self.next_missing
+        if offset < 0:
+            return True
+        return offset < len(self.received) and self.received[offset] == 1
+
+    def receive(self, packet_no):
+        '''
+        Mark a packet as received and returns the new next_missing
+        '''
+        received = self.received
+        offset = packet_no - self.next_missing
+        if offset < 0:
+            # Duplicate of a packet that we already have
+            return self.next_missing
+        if offset >= len(received):
+            received.extend(bytes(offset + 1 - len(received)))
+        received[offset] = 1
+
+        if offset == 0:
+            # Slide the window past every packet received in a row.
+            # Deleting from the front of a bytearray does not copy
+            num_received = received.find(0)
+            if num_received < 0:
+                num_received = len(received)
+            del received[:num_received]
+            self.next_missing += num_received
+        return self.next_missing
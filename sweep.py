@@ -0,0 +1,324 @@
+import os
+# Worker processes have no display, so render figures off screen. This has
+# to be set before main imports matplotlib
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import sys
+import copy
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import sim_logging
+import main
+from batch_runner import summarize
+from checkpoint import load_checkpoint, apply_parameters
+
+# Parameters that are set on every link (or the links named in "links")
+LINK_PARAMETERS = ("link_rate", "buff_size", "prop_delay")
+
+# Parameters that are set on every flow (or the flows named in "flows")
+FLOW_PARAMETERS = ("window", "protocol", "alpha", "gamma", "th")
+
+
+# A sweep is described by a JSON file of the form
+#
+#     {
+#         "base": "test1.json",
+#         "mode": "grid",
+#         "parameters": {
+#             "protocol": ["FAST", "RENO"],
+#             "buff_size": [32, 64, 128],
+#             "alpha": {"min": 5, "max": 50}
+#         },
+#         "links": ["1"],
+#         "samples": 20,
+#         "seed": 1
+#     }
+#
+# In grid mode every parameter must be a list of values and every
+# combination is run. In random mode "samples" points are drawn, a list is
+# sampled uniformly and {"min", "max"} is a uniform range ("integer": true
+# rounds it). "links" and "flows" restrict which links and flows of the
+# base scenario are changed, by default all of them are.
+#
+# With "checkpoint": "warm.ckpt", a checkpoint saved from a run of the base
+# scenario (main.py --checkpoint), every point continues from that
+# checkpoint with its values set on the running network instead of starting
+# from the beginning, so the warm up is only simulated once. The engine is
+# the one the checkpoint was saved from.
+
+
+def grid_points(parameters):
+    '''
+    Yield every combination of the parameter values, one dict at a time
+    '''
+    names = sorted(parameters)
+    for values in itertools.product(*(parameters[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_points(parameters, samples, seed=None):
+    '''
+    Yield samples points drawn from the parameter space
+    '''
+    rng = random.Random(seed)
+    names = sorted(parameters)
+    for _ in range(samples):
+        point = {}
+        for name in names:
+            space = parameters[name]
+            if isinstance(space, list):
+                point[name] = rng.choice(space)
+            elif space.get("integer"):
+                point[name] = rng.randint(space["min"], space["max"])
+            else:
+                point[name] = rng.uniform(space["min"], space["max"])
+        yield point
+
+
+def sweep_points(spec):
+    '''
+    Returns an iterator over the points of a sweep, expanded lazily
+    '''
+    parameters = spec["parameters"]
+    for name in parameters:
+        if name not in LINK_PARAMETERS and name not in FLOW_PARAMETERS:
+            raise ValueError("Unknown sweep parameter: " + name)
+    if spec.get("mode", "grid") == "grid":
+        for name, values in parameters.items():
+            if not isinstance(values, list):
+                raise ValueError("Grid sweep parameter " + name +
+                                 " must be a list of values, not " +
+                                 json.dumps(values))
+        return grid_points(parameters)
+    return random_points(parameters, spec["samples"], spec.get("seed"))
+
+
+def apply_point(base, point, link_ids=None, flow_ids=None):
+    '''
+    Returns a copy of the base scenario with the values of point set on its
+    links and flows. The ids may be given as numbers or strings.
+    '''
+    if link_ids is not None:
+        link_ids = set(str(link_id) for link_id in link_ids)
+    if flow_ids is not None:
+        flow_ids = set(str(flow_id) for flow_id in flow_ids)
+    config = copy.deepcopy(base)
+    for link in config["links"]:
+        if link_ids is None or str(link["id"]) in link_ids:
+            for name in LINK_PARAMETERS:
+                if name in point:
+                    link[name] = point[name]
+    for flow in config["flows"]:
+        if flow_ids is None or str(flow["id"]) in flow_ids:
+            for name in FLOW_PARAMETERS:
+                if name in point:
+                    flow[name] = point[name]
+    return config
+
+
+def config_hash(config, event_driven=False):
+    '''
+    A content hash of the effective scenario. Two points that produce the
+    same scenario share a hash, whatever the sweep that produced them.
+    '''
+    canonical = json.dumps({"config": config, "events": event_driven},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def file_hash(filename):
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fork_hash(checkpoint_hash, point, link_ids=None, flow_ids=None):
+    '''
+    A content hash of a point that continues from the checkpoint whose
+    file_hash is checkpoint_hash
+    '''
+    canonical = json.dumps({"checkpoint": checkpoint_hash, "point": point,
+                            "links": link_ids, "flows": flow_ids},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def fork_point(checkpoint_file, point, name, link_ids=None, flow_ids=None):
+    '''
+    Load the checkpoint, set the values of point on it and run it to the end
+    '''
+    network = load_checkpoint(checkpoint_file)
+    apply_parameters(network, point, link_ids, flow_ids)
+    # The timestep depends on the link rates and delays
+    if any(parameter in point for parameter in LINK_PARAMETERS):
+        main.set_time_step(network)
+    return main.simulate(network, name, make_graphs=False)
+
+
+def run_point(config, name, event_driven=False, quiet=True, fork=None):
+    '''
+    Run one point of the sweep and return a result dict. Exceptions are
+    caught and recorded in the result. To continue from a checkpoint, fork
+    is the (checkpoint file, point, link ids, flow ids) to pass to
+    fork_point, and config is not used.
+    '''
+    if quiet:
+        sim_logging.set_stdout_level("WARNING")
+    result = {}
+    start = time.perf_counter()
+    try:
+        if fork is not None:
+            network = fork_point(fork[0], fork[1], name, fork[2], fork[3])
+        else:
+            network = main.run_config(config, name, event_driven,
+                                      make_graphs=False)
+        result["ok"] = True
+        result["summary"] = summarize(network)
+    except Exception:
+        result["ok"] = False
+        result["error"] = traceback.format_exc()
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+class ResultCache:
+    '''
+    Finished points, stored as one JSON file per config hash
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        # Write to a temporary file first, so that an interrupted sweep
+        # never leaves a truncated result behind
+        tmp = self.path(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, self.path(key))
+
+
+def run_sweep(spec, workers=None, event_driven=False, cache_dir=".sweep_cache",
+              quiet=True):
+    '''
+    Run every point of a sweep in a pool of worker processes, skipping the
+    points that are already in the cache. Returns the results in the order
+    of the points.
+    '''
+    with open(spec["base"]) as f:
+        base = json.load(f)
+    name = spec["base"]
+    link_ids = spec.get("links")
+    flow_ids = spec.get("flows")
+    checkpoint_file = spec.get("checkpoint")
+    if checkpoint_file is not None:
+        checkpoint_hash = file_hash(checkpoint_file)
+    cache = ResultCache(cache_dir)
+    workers = workers or os.cpu_count()
+
+    results = []
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for point in sweep_points(spec):
+            if checkpoint_file is not None:
+                config = None
+                fork = (checkpoint_file, point, link_ids, flow_ids)
+                key = fork_hash(checkpoint_hash, point, link_ids, flow_ids)
+            else:
+                config = apply_point(base, point, link_ids, flow_ids)
+                fork = None
+                key = config_hash(config, event_driven)
+            result = cache.get(key)
+            if result is not None:
+                result["point"] = point
+                result["cached"] = True
+                results.append(result)
+                print_result(result)
+                continue
+
+            result = {"point": point, "hash": key, "cached": False}
+            results.append(result)
+            future = executor.submit(run_point, config, name, event_driven,
+                                     quiet, fork)
+            pending[future] = result
+            # Only keep a couple of points per worker in flight, so that a
+            # large sweep is never expanded in memory all at once
+            if len(pending) >= 2 * workers:
+                finish(wait(pending, return_when=FIRST_COMPLETED).done,
+                       pending, cache)
+        finish(wait(pending).done, pending, cache)
+    return results
+
+
+def finish(done, pending, cache):
+    for future in done:
+        result = pending.pop(future)
+        try:
+            result.update(future.result())
+        except Exception:
+            # The worker itself died, e.g. it ran out of memory
+            result.update({"ok": False, "error": traceback.format_exc(),
+                           "wall_time": None})
+        if result["ok"]:
+            cache.put(result["hash"], result)
+        print_result(result)
+
+
+def print_result(result):
+    point = " ".join("%s=%s" % item for item in sorted(result["point"].items()))
+    if not result["ok"]:
+        print("FAILED  " + point)
+        print(result["error"])
+        return
+    summary = result["summary"]
+    print("%-7s %-50s sim %8.3fs  dropped %d" % (
+        "cached" if result["cached"] else "ok", point, summary["end_time"],
+        sum(link["dropped"] for link in summary["links"].values())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run a parameter sweep over a scenario")
+    parser.add_argument("spec", help="sweep JSON file")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, default one per core")
+    parser.add_argument("--events", action="store_true",
+                        help="use the event driven engine")
+    parser.add_argument("--cache-dir", default=".sweep_cache",
+                        help="directory of cached results")
+    parser.add_argument("--verbose", action="store_true",
+                        help="let the workers print their log messages")
+    parser.add_argument("--summary-out",
+                        help="write the results of every point to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    start = time.perf_counter()
+    results = run_sweep(spec, args.workers, args.events, args.cache_dir,
+                        not args.verbose)
+    num_failed = sum(1 for result in results if not result["ok"])
+    num_cached = sum(1 for result in results if result["cached"])
+    print("%d points, %d cached, %d failed, %.2fs" % (
+        len(results), num_cached, num_failed, time.perf_counter() - start))
+
+    if args.summary_out:
+        with open(args.summary_out, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if num_failed else 0)
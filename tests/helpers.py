@@ -0,0 +1,41 @@
+import io
+import os
+import contextlib
+from unittest import mock
+import main
+from network import Network
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_scenario(name, event_driven=False, checkpoints=None, trace=None):
+    '''
+    Run a bundled scenario without graphs or output and return the network
+    '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        return main.run_simulation(os.path.join(ROOT, name), event_driven,
+                                   make_graphs=False, checkpoints=checkpoints,
+                                   trace=trace)
+
+
+def build_scenario(name):
+    '''
+    Build the network of a bundled scenario without running it
+    '''
+    with mock.patch.object(Network, "run_network"):
+        return run_scenario(name)
+
+
+def series_values(network):
+    '''
+    The graphing logs of every link and flow, to compare two runs
+    '''
+    values = []
+    for _, link in network.links.items():
+        for series in (link.buffer_occupancy, link.packet_loss,
+                       link.link_rates):
+            values.append((list(series.times), list(series.values)))
+    for _, flow in network.flows.items():
+        for series in (flow.window_sizes, flow.flow_rates, flow.packet_delays):
+            values.append((list(series.times), list(series.values)))
+    return values
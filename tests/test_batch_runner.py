@@ -0,0 +1,41 @@
+import os
+import pytest
+from batch_runner import expand_patterns, run_one, run_batch, summarize
+from helpers import ROOT, run_scenario
+
+
+def test_expand_patterns_sorts_and_keeps_unmatched(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    filenames = expand_patterns(["test1*.json", "test1.json", "nothing*.json"])
+    assert filenames == ["test1.json", "test1_FAST.json", "test1_RENO.json",
+                         "nothing*.json"]
+
+
+def test_summarize_finished_flows():
+    network = run_scenario("test0.json")
+    summary = summarize(network)
+    assert summary["end_time"] == network.curr_time
+    flow = network.flows[1]
+    stats = summary["flows"][1]
+    assert stats["finished"]
+    assert stats["time_finished"] == flow.time_finished
+    assert stats["throughput"] == pytest.approx(
+        flow.size / (flow.time_finished - flow.time_spawn))
+    assert stats["mean_packet_delay"] > 0
+    assert set(summary["links"]) == set(network.links)
+
+
+def test_failed_runs_are_reported_not_raised():
+    result = run_one(os.path.join(ROOT, "missing.json"))
+    assert not result["ok"]
+    assert "FileNotFoundError" in result["error"]
+    assert result["wall_time"] >= 0
+
+
+def test_run_batch_keeps_the_order_of_the_scenarios():
+    filenames = [os.path.join(ROOT, "missing.json"),
+                 os.path.join(ROOT, "test0.json")]
+    results = run_batch(filenames, workers=1)
+    assert [result["filename"] for result in results] == filenames
+    assert [result["ok"] for result in results] == [False, True]
+    assert results[1]["summary"]["flows"][1]["finished"]
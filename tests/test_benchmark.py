@@ -0,0 +1,61 @@
+import time
+import pytest
+import benchmark
+from host import Host
+
+
+def entry(label, revision, sim_per_wall, peak_rss_mb):
+    return {"label": label, "revision": revision, "results": {
+        "test0.json": {"sim_per_wall": sim_per_wall,
+                       "packets_per_sec": 1000.0,
+                       "peak_rss_mb": peak_rss_mb}}}
+
+
+def test_find_entry_by_label_revision_or_index():
+    history = [entry("before", "abc123", 1.0, 50.0),
+               entry(None, "def456", 1.0, 50.0),
+               entry("before", "789abc", 1.0, 50.0)]
+    assert benchmark.find_entry(history, "before") is history[2]
+    assert benchmark.find_entry(history, "def456") is history[1]
+    assert benchmark.find_entry(history, "-3") is history[0]
+    with pytest.raises(IndexError):
+        benchmark.find_entry(history, "7")
+
+
+def test_compare_flags_only_what_got_worse():
+    base = entry("base", None, 2.0, 50.0)
+    # Slower but within the threshold, and smaller
+    assert benchmark.compare(base, entry("new", None, 1.9, 40.0), 0.1) == []
+    regressions = benchmark.compare(base, entry("new", None, 1.5, 60.0), 0.1)
+    assert regressions == ["test0.json sim_per_wall -25.0%",
+                           "test0.json peak_rss_mb +20.0%"]
+    # Cases that are only in one of the runs are skipped
+    other = {"results": {"test9.json": base["results"]["test0.json"]}}
+    assert benchmark.compare(base, other, 0.1) == []
+
+
+def test_component_times_are_exclusive():
+    timer = benchmark.ComponentTimer()
+    flow = timer.wrap("flow", lambda: time.sleep(0.02))
+
+    def receive():
+        time.sleep(0.01)
+        flow()
+    host = timer.wrap("host", receive)
+    link = timer.wrap("link", host)
+    link()
+    assert timer.calls == {"host": 1, "router": 0, "link": 1, "flow": 1}
+    assert timer.times["link"] < 0.005
+    assert 0.01 <= timer.times["host"] < 0.02
+    assert timer.times["flow"] >= 0.02
+
+
+def test_hosts_are_timed_when_they_receive_packets():
+    receive_packet = Host.receive_packet
+    timer = benchmark.ComponentTimer()
+    timer.install()
+    try:
+        assert Host.receive_packet is not receive_packet
+    finally:
+        timer.uninstall()
+    assert Host.receive_packet is receive_packet
@@ -0,0 +1,59 @@
+import io
+import contextlib
+import pytest
+import main
+from checkpoint import (
+    load_checkpoint, apply_parameters, CheckpointError, HEADER, MAGIC
+)
+from sweep import fork_point
+from helpers import run_scenario, build_scenario, series_values
+
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, event_driven):
+    filename = str(tmp_path / "warm.ckpt")
+    network = run_scenario("test0.json", event_driven, [(2.0, filename)])
+    resumed = load_checkpoint(filename)
+    assert 2.0 <= resumed.curr_time < 2.0 + 2 * resumed.timestep
+    assert resumed.event_driven == event_driven
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.simulate(resumed, "test0.json", make_graphs=False)
+
+    assert resumed.curr_time == network.curr_time
+    assert resumed.counter == network.counter
+    assert resumed.num_finished_flows == len(resumed.flows)
+    assert series_values(resumed) == series_values(network)
+
+
+def test_forks_match_in_both_engines(tmp_path):
+    point = {"link_rate": 5, "window": 20}
+    forks = []
+    for event_driven in (False, True):
+        filename = str(tmp_path / ("warm%d.ckpt" % event_driven))
+        run_scenario("test0.json", event_driven, [(2.0, filename)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            forks.append(fork_point(filename, point, "test0.json"))
+    assert forks[0].timestep == forks[1].timestep
+    assert forks[0].curr_time == forks[1].curr_time
+    assert series_values(forks[0]) == series_values(forks[1])
+
+
+def test_apply_parameters_sets_both_directions():
+    network = build_scenario("test1.json")
+    apply_parameters(network, {"link_rate": 5, "window": 10}, link_ids=[1],
+                     flow_ids=["1"])
+    changed = [link for link in network.topology.links
+               if link.capacity == 5e6]
+    assert len(changed) == 2
+    assert changed[0].reverse is changed[1]
+    assert all(flow.window == 10 for _, flow in network.flows.items())
+
+
+def test_bad_files_are_rejected(tmp_path):
+    filename = tmp_path / "bad.ckpt"
+    filename.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(CheckpointError):
+        load_checkpoint(str(filename))
+    filename.write_bytes(HEADER.pack(MAGIC, 99))
+    with pytest.raises(CheckpointError, match="version 99"):
+        load_checkpoint(str(filename))
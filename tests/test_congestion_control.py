@@ -0,0 +1,124 @@
+import copy
+import json
+import os
+import pytest
+from congestion_control import (
+    CongestionControl, Reno, Fast, create_congestion_control
+)
+from topology import load_topology, TopologyError
+from helpers import ROOT, build_scenario
+
+
+class FakeFlow:
+    def __init__(self, window=1, ssthresh=float("inf")):
+        self.window = window
+        self.ssthresh = ssthresh
+        self.tcp_phase = "SS"
+        self.curr_time = 0
+        self.rto = 3
+        self.rto_timer = 0
+        self.repeated_ack_count = 0
+        self.expecting_packet = 5
+        self.avg_rtt = 0.1
+        self.rtt = 0.1
+        self.min_rtt = 0.05
+        self.alpha = 10
+        self.gamma = 0.8
+        self.th = 10
+        self.n_window_inc = 5
+        self.id = 1
+        self.resent = []
+
+    def send_single_packet(self, packet_no):
+        self.resent.append(packet_no)
+
+
+def test_names_ignore_case():
+    flow = FakeFlow()
+    assert type(create_congestion_control("reno", flow)) is Reno
+    assert type(create_congestion_control("FAST", flow)) is Fast
+    assert type(create_congestion_control("", flow)) is CongestionControl
+
+
+def test_unknown_protocol_is_rejected():
+    with open(os.path.join(ROOT, "test0.json")) as f:
+        net_data = json.load(f)
+    net_data = copy.deepcopy(net_data)
+    net_data["flows"][0]["protocol"] = "CUBIC"
+    with pytest.raises(TopologyError, match="unknown protocol CUBIC"):
+        load_topology(net_data)
+
+
+def test_reno_slow_start_then_congestion_avoidance():
+    flow = FakeFlow(window=1, ssthresh=3)
+    reno = Reno(flow)
+    reno.on_ack()
+    reno.on_ack()
+    assert flow.window == 3 and flow.tcp_phase == "SS"
+    reno.on_ack()
+    assert flow.tcp_phase == "CA" and flow.window == 3
+    reno.on_ack()
+    assert flow.window == pytest.approx(3 + 1 / 3)
+
+
+def test_reno_fast_retransmit_and_recovery():
+    flow = FakeFlow(window=10)
+    flow.tcp_phase = "CA"
+    reno = Reno(flow)
+    for count in (1, 2, 3):
+        flow.repeated_ack_count = count
+        reno.on_dup_ack()
+    assert flow.tcp_phase == "FR"
+    assert flow.ssthresh == 5 and flow.window == 8
+    assert flow.resent == [5]
+
+    # Further duplicates inflate the window, a new ACK ends the recovery
+    flow.repeated_ack_count = 4
+    reno.on_dup_ack()
+    assert flow.window == 9
+    flow.repeated_ack_count = 0
+    reno.on_ack()
+    assert flow.tcp_phase == "CA" and flow.window == pytest.approx(5.2)
+
+
+def test_timeout_restarts_slow_start():
+    flow = FakeFlow(window=12)
+    flow.tcp_phase = "CA"
+    Reno(flow).on_timeout()
+    assert (flow.window, flow.ssthresh, flow.tcp_phase) == (1, 6, "SS")
+
+
+def test_fast_spreads_window_updates_over_a_round_trip():
+    flow = FakeFlow(window=20)
+    flow.min_rtt = 0.08
+    fast = Fast(flow)
+    assert fast.next_timer() == float("inf")
+    fast.on_first_rtt()
+    flow.tcp_phase = "CA"
+    assert fast.next_timer() == pytest.approx(0.1)
+
+    # Every other round trip the window moves towards its target
+    flow.curr_time = 0.1
+    fast.on_tick()
+    assert len(fast.next_update_times) == 0
+    flow.curr_time = 0.2
+    fast.on_tick()
+    assert len(fast.next_update_times) == flow.n_window_inc
+    # (1 - gamma) W + gamma (min_rtt / rtt W + alpha) - W
+    change = 0.2 * 20 + 0.8 * (0.8 * 20 + 10) - 20
+    assert change > 0
+    assert fast.window_increment == pytest.approx(change / 5)
+    assert fast.next_timer() == pytest.approx(0.22)
+
+    flow.curr_time = 0.22
+    fast.on_tick()
+    assert flow.window == pytest.approx(20 + change / 5)
+
+
+def test_set_protocol_keeps_the_window():
+    network = build_scenario("test1.json")
+    flow = network.flows[1]
+    flow.window = 7
+    flow.set_protocol("RENO")
+    assert type(flow.congestion_control) is Reno
+    assert flow.protocol == "RENO" and flow.window == 7
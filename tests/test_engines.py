@@ -0,0 +1,32 @@
+import pytest
+from helpers import run_scenario, series_values
+
+SCENARIOS = ["test0.json", "test1.json", "test2.json", "test3.json",
+             "test4.json", "test5.json"]
+
+
+@pytest.mark.parametrize("name", SCENARIOS)
+def test_event_driven_matches_stepped(name):
+    '''
+    The event driven engine only skips steps with nothing to do, so every
+    flow and every graphing log must come out exactly the same
+    '''
+    stepped = run_scenario(name)
+    events = run_scenario(name, event_driven=True)
+
+    assert all(flow.finished for _, flow in stepped.flows.items())
+    assert all(flow.finished for _, flow in events.flows.items())
+    assert events.curr_time == stepped.curr_time
+    assert events.counter == stepped.counter
+    assert [flow.time_finished for _, flow in events.flows.items()] == \
+        [flow.time_finished for _, flow in stepped.flows.items()]
+    assert [link.total_dropped for _, link in events.links.items()] == \
+        [link.total_dropped for _, link in stepped.links.items()]
+    assert series_values(events) == series_values(stepped)
+
+
+def test_reno_matches_stepped():
+    stepped = run_scenario("test1_RENO.json")
+    events = run_scenario("test1_RENO.json", event_driven=True)
+    assert events.curr_time == stepped.curr_time
+    assert series_values(events) == series_values(stepped)
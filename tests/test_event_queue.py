@@ -0,0 +1,88 @@
+from event_queue import EventQueue, StepQueue
+
+
+def test_events_run_in_time_then_schedule_order():
+    events = EventQueue()
+    events.schedule(2.0, "c")
+    events.schedule(1.0, "a")
+    events.schedule(1.0, "b")
+    assert [events.pop()[1] for _ in range(3)] == ["a", "b", "c"]
+    assert events.pop() is None
+
+
+def test_cancelled_events_are_skipped():
+    events = EventQueue()
+    first = events.schedule(1.0, "a")
+    events.schedule(2.0, "b", 1, 2)
+    events.cancel(first)
+    assert events.peek_time() == 2.0
+    assert events.pop() == (2.0, "b", (1, 2))
+    assert events.peek_time() == float("inf")
+
+
+def test_step_times_are_summed_like_the_stepped_engine():
+    timestep = 1e-5
+    events = StepQueue(0.0, timestep)
+    time = 0.0
+    for step in range(40000):
+        assert events.time_of(step) == time
+        time += timestep
+
+
+def test_events_snap_to_steps_and_run_by_phase_then_order():
+    events = StepQueue(0.0, 0.5)
+    events.schedule(1.2, 2, 0, "late phase")
+    events.schedule(1.5, 1, 1, "second")
+    events.schedule(1.4, 1, 0, "first")
+    events.schedule(0.9, 0, 0, "previous step")
+    assert [events.pop() for _ in range(4)] == [
+        (2, "previous step", ()), (3, "first", ()), (3, "second", ()),
+        (3, "late phase", ())]
+    assert events.pop() is None
+
+
+def test_offset_wakes_up_early():
+    events = StepQueue(0.0, 0.5)
+    events.schedule(1.2, 0, 0, "a", offset=0.25)
+    assert events.pop() == (2, "a", ())
+
+
+def test_events_for_a_phase_that_ran_go_to_the_next_step():
+    events = StepQueue(0.0, 0.5)
+    events.schedule(1.0, 1, 0, "a")
+    assert events.pop() == (2, "a", ())
+    events.schedule(0.0, 1, 0, "same phase and order")
+    events.schedule(0.0, 1, 1, "later order")
+    events.schedule(0.0, 0, 5, "earlier phase")
+    assert [events.pop() for _ in range(3)] == [
+        (2, "later order", ()), (3, "earlier phase", ()),
+        (3, "same phase and order", ())]
+
+
+def test_far_events_and_cancelled_events():
+    events = StepQueue(0.0, 1.0)
+    far = events.schedule(1e6, 0, 0, "far")
+    events.schedule(2e6, 0, 0, "farther")
+    events.schedule_step(5, 0, 0, "step", 1)
+    events.cancel(far)
+    assert len(events) == 3
+    assert events.pop() == (5, "step", (1,))
+    assert events.pop() == (2000000, "farther", ())
+    assert events.time_of(2000000) == 2e6
+    assert events.peek_step() is None
+
+
+def test_set_timestep_moves_timed_events():
+    events = StepQueue(0.0, 0.5)
+    events.schedule(0.5, 0, 0, "now")
+    events.schedule(2.0, 0, 0, "timed")
+    events.schedule_step(3, 0, 1, "by step")
+    events.schedule(1000.0, 0, 0, "far")
+    assert events.pop() == (1, "now", ())
+    events.set_timestep(0.25)
+    assert events.time_of(2) == 0.75
+    assert events.pop() == (3, "by step", ())
+    assert events.pop() == (7, "timed", ())
+    step, callback, _ = events.pop()
+    assert callback == "far" and events.time_of(step) >= 1000.0
+    assert events.time_of(step - 1) < 1000.0
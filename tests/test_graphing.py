@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import graphing_functions as graph
+
+
+def test_downsample_keeps_the_ends_and_the_peak():
+    x_axis = np.arange(10000, dtype=np.float64)
+    y_axis = np.zeros(10000)
+    y_axis[4321] = 100.0
+    x_small, y_small = graph.downsample(x_axis, y_axis, 100)
+    assert len(x_small) == 100
+    assert x_small[0] == 0 and x_small[-1] == 9999
+    assert 4321 in x_small
+    assert y_small.max() == 100.0
+
+
+def test_short_series_are_not_downsampled():
+    x_axis = np.arange(10, dtype=np.float64)
+    assert graph.downsample(x_axis, x_axis, 100)[0] is x_axis
+
+
+def test_unchanged_figures_are_not_rendered_again(tmp_path, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(graph, "plot_graphs",
+                        lambda *figure: rendered.append(figure[3]) or
+                        open(figure[3], "w").close())
+    x_axis = np.array([0.0, 1.0])
+    plot_name = str(tmp_path / "plot.png")
+
+    def figure(y_axis):
+        points = {"Buffer": [(x_axis, np.array(y_axis), "L1")]}
+        return (points, 1.0, 1, plot_name, 1, 0, 0, 2.0)
+
+    assert graph.render_figures([figure([1.0, 2.0])], str(tmp_path)) == 1
+    assert graph.render_figures([figure([1.0, 2.0])], str(tmp_path)) == 0
+    assert graph.render_figures([figure([1.0, 3.0])], str(tmp_path)) == 1
+    os.remove(plot_name)
+    assert graph.render_figures([figure([1.0, 3.0])], str(tmp_path)) == 1
+    assert rendered == [plot_name] * 3
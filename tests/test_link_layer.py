@@ -0,0 +1,47 @@
+import io
+import json
+import contextlib
+import main
+import topology_generator
+from network import Network
+from helpers import series_values
+
+
+def generated_grid():
+    f = io.StringIO()
+    topology_generator.write_scenario(
+        f, topology_generator.grid(3, 3), num_flows=4, data="0.2",
+        start="uniform:1:1.5", seed=5, extra={"routing": "oracle"})
+    return json.loads(f.getvalue())
+
+
+def run_grid(vectorized_links=None, event_driven=False):
+    run_network = Network.run_network
+
+    def run(network):
+        network.vectorized_links = vectorized_links
+        run_network(network)
+    Network.run_network = run
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return main.run_config(generated_grid(), "grid", event_driven,
+                                   make_graphs=False)
+    finally:
+        Network.run_network = run_network
+
+
+def test_only_due_links_run_with_the_same_results():
+    plain = run_grid(vectorized_links=False)
+    vectorized = run_grid(vectorized_links=True)
+    events = run_grid(event_driven=True)
+    assert plain.link_layer is None
+    assert vectorized.link_layer is not None
+    assert all(flow.finished for _, flow in plain.flows.items())
+    assert vectorized.curr_time == plain.curr_time
+    assert series_values(vectorized) == series_values(plain)
+    assert series_values(events) == series_values(plain)
+
+
+def test_large_networks_are_vectorized_by_default():
+    # 9 routers, 9 hosts and 21 links in each direction
+    assert run_grid().link_layer is not None
@@ -0,0 +1,109 @@
+import sys
+import numpy as np
+import pytest
+from metrics import MetricsRecorder, load_metrics
+
+
+class FakeLink:
+    def __init__(self):
+        self.samples = []
+
+    def record_metrics(self, curr_time, prev_time):
+        self.samples.append((curr_time, prev_time))
+
+
+class FakeFlow:
+    def __init__(self, spawned=True, finished=False):
+        self.spawned = spawned
+        self.finished = finished
+        self.windows = []
+        self.rates = []
+
+    def record_window_size(self, curr_time):
+        self.windows.append(curr_time)
+
+    def record_flow_rate(self, curr_time, prev_time):
+        self.rates.append((curr_time, prev_time))
+
+
+class FakeNetwork:
+    def __init__(self):
+        self.links = {1: FakeLink()}
+        self.flows = {1: FakeFlow(), 2: FakeFlow(spawned=False)}
+
+
+def test_samples_follow_their_intervals():
+    metrics = MetricsRecorder(link_interval=1.0, window_interval=0.25,
+                              flow_rate_interval=0.5)
+    network = FakeNetwork()
+    time = 0.0
+    while time < 2.0:
+        if time >= metrics.next_sample_time():
+            metrics.sample(network, time)
+        time += 0.125
+    assert network.links[1].samples == [(0.0, None), (1.0, 0.0)]
+    assert network.flows[1].windows == [0.0, 0.25, 0.5, 0.75, 1.0, 1.25,
+                                        1.5, 1.75]
+    assert network.flows[1].rates == [(0.0, None), (0.5, 0.0), (1.0, 0.5),
+                                      (1.5, 1.0)]
+    # Flows are only sampled while they run
+    assert network.flows[2].windows == []
+
+
+def test_save_npz_round_trip(tmp_path):
+    metrics = MetricsRecorder()
+    series = metrics.create_series("link", 3, "buffer_occupancy")
+    series.append(0.0, 1)
+    series.append(0.2, 4)
+    metrics.create_series("flow", 1, "window_sizes")
+
+    filename = str(tmp_path / "metrics.npz")
+    metrics.save(filename)
+    with np.load(filename) as columns:
+        assert list(columns["link/3/buffer_occupancy/times"]) == [0.0, 0.2]
+        assert list(columns["link/3/buffer_occupancy/values"]) == [1, 4]
+        assert len(columns["flow/1/window_sizes/times"]) == 0
+
+
+def test_save_parquet_long_format(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    metrics = MetricsRecorder()
+    series = metrics.create_series("flow", 2, "flow_rates")
+    series.append(0.0, 1.5)
+    series.append(0.1, 2.5)
+
+    filename = str(tmp_path / "metrics.parquet")
+    metrics.save(filename)
+    table = pq.read_table(filename).to_pydict()
+    assert table["group"] == ["flow", "flow"]
+    assert table["owner"] == ["2", "2"]
+    assert table["series"] == ["flow_rates", "flow_rates"]
+    assert table["time"] == [0.0, 0.1]
+    assert table["value"] == [1.5, 2.5]
+
+
+def test_save_parquet_needs_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    metrics = MetricsRecorder()
+    with pytest.raises(ImportError):
+        metrics.save(str(tmp_path / "metrics.parquet"))
+
+
+@pytest.mark.parametrize("suffix", [".npz", ".parquet"])
+def test_load_metrics_round_trip(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    metrics = MetricsRecorder()
+    series = metrics.create_series("link", 3, "link_rates")
+    series.append(0.0, 1.0)
+    series.append(0.5, 2.0)
+    series = metrics.create_series("flow", 1, "window_sizes")
+    series.append(0.25, 10.0)
+
+    filename = str(tmp_path / ("metrics" + suffix))
+    metrics.save(filename, {"test_case": "test0"})
+    series, metadata = load_metrics(filename)
+    assert metadata == {"test_case": "test0"}
+    assert list(series[("link", "3", "link_rates")].times) == [0.0, 0.5]
+    assert list(series[("link", "3", "link_rates")].values) == [1.0, 2.0]
+    assert list(series[("flow", "1", "window_sizes")].values) == [10.0]
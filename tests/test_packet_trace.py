@@ -0,0 +1,56 @@
+from math import ceil
+from packet_trace import PacketTrace, TraceReader, ARRIVE
+from helpers import run_scenario, build_scenario, series_values
+from utils import PACKET, ACK, MESSAGE, PACKET_SIZE, ACK_SIZE
+
+
+def test_trace_of_a_run(tmp_path):
+    filename = str(tmp_path / "test1.trace")
+    traced = run_scenario("test1.json", trace={"filename": filename})
+    assert traced.tracer is None
+    assert series_values(traced) == series_values(run_scenario("test1.json"))
+
+    reader = TraceReader(filename)
+    counts = reader.counts()
+    assert counts["drop"] == sum(link.total_dropped
+                                 for _, link in traced.links.items())
+    assert counts["arrive"] <= counts["transmit"] <= counts["enqueue"]
+
+    flow = traced.flows[1]
+    received = reader.select(events=["receive"], flows=[1],
+                             packet_types=["packet"])
+    assert len(received) >= ceil(flow.size / PACKET_SIZE)
+    assert set(received["link"].tolist()) == \
+        set([flow.destination.incoming_link.id])
+    messages = reader.select(packet_types=["message"])
+    assert len(messages) > 0 and (messages["flow"] == -1).all()
+    times = reader.records["time"]
+    assert (times[1:] >= times[:-1]).all()
+
+
+def test_filters(tmp_path):
+    network = build_scenario("test1.json")
+    filename = str(tmp_path / "filtered.trace")
+    tracer = PacketTrace(network, filename, flows=["1"], links=[1],
+                         packet_types=["ack"], buffer_records=2)
+    flow = network.flows[1]
+    link = network.links[1]
+    other_link = network.links[2]
+    ack = network.create_packet(ACK_SIZE, ACK, flow.destination, flow.source,
+                                0, False, None, flow, 3, False, 4)
+    packet = network.create_packet(PACKET_SIZE, PACKET, flow.source,
+                                   flow.destination, 0, False, None, flow, 3)
+    message = network.create_packet(PACKET_SIZE, MESSAGE, None, None, 0,
+                                    False, None)
+    for _ in range(3):
+        tracer.record(ARRIVE, link, ack)
+    tracer.record(ARRIVE, other_link, ack)
+    tracer.record(ARRIVE, link, packet)
+    tracer.record(ARRIVE, link, message)
+    tracer.close()
+
+    reader = TraceReader(filename)
+    assert len(reader) == 3
+    assert reader.records["packet_no"].tolist() == [3, 3, 3]
+    assert reader.records["expecting"].tolist() == [4, 4, 4]
+    assert reader.flow_ids[reader.records["flow"][0]] == 1
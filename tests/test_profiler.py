@@ -0,0 +1,67 @@
+import os
+import json
+import signal
+import pytest
+from profiler import Profiler, add_to_histogram, histogram_buckets
+from helpers import build_scenario, run_scenario, series_values
+
+
+def test_one_in_every_interval_is_sampled():
+    profiler = Profiler(sample_interval=3)
+    profiler.enable()
+    samples = [profiler.sample() for _ in range(7)]
+    assert samples == [True, False, False, True, False, False, True]
+    assert profiler.num_samples == 3
+
+
+def test_queue_histogram_buckets():
+    histogram = []
+    for length in (0, 1, 2, 3, 4, 9):
+        add_to_histogram(histogram, length)
+    assert histogram_buckets(histogram) == [("0", 1), ("1-1", 1), ("2-3", 2),
+                                            ("4-7", 1), ("8-15", 1)]
+
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test_profiling_leaves_the_results_alone(event_driven, tmp_path):
+    network = build_scenario("test0.json")
+    network.event_driven = event_driven
+    profiler = network.profiler
+    profiler.enable(10)
+    profiler.report_at_end = True
+    profiler.report_file = str(tmp_path / "profile.json")
+    network.run_network()
+
+    assert series_values(network) == \
+        series_values(run_scenario("test0.json", event_driven))
+    with open(profiler.report_file) as f:
+        report = json.load(f)
+    assert report["sample_interval"] == 10
+    assert report["samples"] > 0
+    assert report["packets_created"] == network.packets_created
+    components = report["components"]
+    assert {"link", "flow"} <= set(components)
+    if not event_driven:
+        assert {"router", "routing"} <= set(components)
+    assert sum(entry["share"] for entry in components.values()) == \
+        pytest.approx(1)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR2"), reason="needs SIGUSR2")
+def test_signals_toggle_and_report(caplog):
+    network = build_scenario("test0.json")
+    profiler = Profiler()
+    handlers = (signal.getsignal(signal.SIGUSR1),
+                signal.getsignal(signal.SIGUSR2))
+    try:
+        profiler.install_signal_handlers(network)
+        os.kill(os.getpid(), signal.SIGUSR2)
+        assert profiler.enabled
+        os.kill(os.getpid(), signal.SIGUSR2)
+        assert not profiler.enabled
+        with caplog.at_level("INFO"):
+            os.kill(os.getpid(), signal.SIGUSR1)
+        assert "Profile at t=0.000" in caplog.text
+    finally:
+        signal.signal(signal.SIGUSR1, handlers[0])
+        signal.signal(signal.SIGUSR2, handlers[1])
@@ -0,0 +1,61 @@
+import random
+import pytest
+from queue_discipline import (
+    DropTail, RED, CoDel, create_queue_discipline, QUEUE_DISCIPLINES
+)
+from utils import PACKET_SIZE
+
+
+class FakeLink:
+    def __init__(self, queue_capacity, buffer_bits=0):
+        self.queue_capacity = queue_capacity
+        self.buffer_bits = buffer_bits
+
+
+class FakePacket:
+    def __init__(self, num_bits=PACKET_SIZE, time_enqueued=0):
+        self.num_bits = num_bits
+        self.time_enqueued = time_enqueued
+
+
+def test_drop_tail_drops_when_full():
+    discipline = DropTail()
+    link = FakeLink(4 * PACKET_SIZE, buffer_bits=2 * PACKET_SIZE)
+    assert not discipline.drop_on_enqueue(link, FakePacket(), 0)
+    link.buffer_bits = 3 * PACKET_SIZE
+    assert discipline.drop_on_enqueue(link, FakePacket(), 0)
+
+
+def test_red_drops_early_between_thresholds():
+    random.seed(1)
+    discipline = RED(weight=1.0)
+    link = FakeLink(100 * PACKET_SIZE)
+    link.buffer_bits = 10 * PACKET_SIZE
+    assert not any(discipline.drop_on_enqueue(link, FakePacket(), 0)
+                   for _ in range(100))
+    link.buffer_bits = 60 * PACKET_SIZE
+    drops = sum(discipline.drop_on_enqueue(link, FakePacket(), 0)
+                for _ in range(1000))
+    assert 0 < drops < 1000
+    link.buffer_bits = 100 * PACKET_SIZE
+    assert discipline.drop_on_enqueue(link, FakePacket(), 0)
+
+
+def test_codel_drops_after_an_interval_above_target():
+    discipline = CoDel(target=0.005, interval=0.1)
+    link = FakeLink(100 * PACKET_SIZE, buffer_bits=10 * PACKET_SIZE)
+    # A short sojourn time is fine
+    assert not discipline.drop_on_dequeue(link, FakePacket(time_enqueued=0.999), 1.0)
+    # Above target, but not for a whole interval yet
+    assert not discipline.drop_on_dequeue(link, FakePacket(time_enqueued=0.9), 1.0)
+    assert not discipline.drop_on_dequeue(link, FakePacket(time_enqueued=0.9), 1.05)
+    assert discipline.drop_on_dequeue(link, FakePacket(time_enqueued=0.9), 1.11)
+    assert discipline.dropping
+
+
+def test_create_queue_discipline_ignores_case():
+    assert isinstance(create_queue_discipline("droptail"), DropTail)
+    assert isinstance(create_queue_discipline("CoDel"), CoDel)
+    with pytest.raises(KeyError):
+        create_queue_discipline("fifo")
+    assert set(QUEUE_DISCIPLINES) == {"DROPTAIL", "RED", "CODEL"}
@@ -0,0 +1,149 @@
+import pytest
+from router import Router
+from routing import OracleRouting, ORACLE
+from utils import ROUTING_SETTLE
+from helpers import build_scenario, run_scenario
+
+
+def router_links(network):
+    return [link for _, link in network.links.items()
+            if isinstance(link.connection1, Router) and
+            isinstance(link.connection2, Router)]
+
+
+def bellman_ford(network, root):
+    '''
+    Distances from root along the links, the direction the messages go
+    '''
+    links = router_links(network)
+    distances = {root: 0.0}
+    for _ in network.routers:
+        for link in links:
+            if link.connection1 in distances:
+                distance = distances[link.connection1] + \
+                    link.calculate_dynamic_cost()
+                if distance < distances.get(link.connection2, float("inf")):
+                    distances[link.connection2] = distance
+    return distances
+
+
+def check_shortest_paths(network):
+    for _, root in network.routers.items():
+        distances = bellman_ford(network, root)
+        for _, router in network.routers.items():
+            if router is root:
+                continue
+            out_link, cost = router.routing_table[root]
+            assert cost == pytest.approx(distances[router])
+            # The message came in on the reverse of the link we send on
+            link = out_link.reverse
+            assert link.connection2 is router
+            assert distances[link.connection1] + \
+                link.calculate_dynamic_cost() == pytest.approx(cost)
+
+
+def test_oracle_tables_are_shortest_paths():
+    network = build_scenario("test2.json")
+    OracleRouting(network).update()
+    check_shortest_paths(network)
+    # Hosts are routed like the router they hang off
+    for _, router in network.routers.items():
+        for _, host in network.hosts.items():
+            if host.router is not router:
+                assert router.routing_table[host] == \
+                    router.routing_table[host.router]
+
+
+def test_only_affected_trees_are_recomputed():
+    network = build_scenario("test2.json")
+    oracle = OracleRouting(network)
+    oracle.update()
+    assert oracle.num_recomputed == len(network.routers)
+
+    # Nothing changed, nothing to recompute
+    oracle.update()
+    assert oracle.num_recomputed == len(network.routers)
+
+    # Load one link heavily so that the traffic goes around it
+    link = router_links(network)[0]
+    link.routing_pkts = 1e9
+    oracle.update()
+    assert len(network.routers) < oracle.num_recomputed
+    check_shortest_paths(network)
+
+    # The kept trees give the same tables as starting from scratch
+    tables = dict((router, dict(router.routing_table))
+                  for _, router in network.routers.items())
+    OracleRouting(network).update()
+    for _, router in network.routers.items():
+        assert router.routing_table == tables[router]
+
+
+def test_oracle_routing_runs_without_messages():
+    network = build_scenario("test1.json")
+    network.routing = ORACLE
+    network.run_network()
+    assert all(flow.finished for _, flow in network.flows.items())
+
+
+def test_unknown_routing_mode():
+    network = build_scenario("test0.json")
+    network.routing = "link_state"
+    with pytest.raises(ValueError, match="link_state"):
+        network.run_network()
+
+
+def record_rebuilds(network):
+    times = []
+    update_routing_tables = network.update_routing_tables
+
+    def record():
+        times.append(network.curr_time)
+        update_routing_tables()
+    network.update_routing_tables = record
+    return times
+
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test_routing_epochs_in_seconds(event_driven):
+    network = build_scenario("test1.json")
+    network.event_driven = event_driven
+    network.routing_period = 4.0
+    network.routing_settle = 0.5
+    times = record_rebuilds(network)
+    network.run_network()
+    assert len(times) == int(network.curr_time / 4.0) + 1
+    for epoch, time in enumerate(times):
+        assert epoch * 4.0 + 0.5 <= time < epoch * 4.0 + 0.5 + network.timestep
+
+
+def test_default_routing_epochs_are_in_timesteps():
+    network = build_scenario("test1.json")
+    times = record_rebuilds(network)
+    network.run_network()
+    assert times[0] == pytest.approx(ROUTING_SETTLE * network.timestep)
+
+
+def test_settle_must_be_within_the_period():
+    network = build_scenario("test1.json")
+    network.routing_period = 1.0
+    network.routing_settle = 1.0
+    with pytest.raises(ValueError, match="routing_settle"):
+        network.run_network()
+
+
+def test_converged_router_keeps_its_routes():
+    network = build_scenario("test2.json")
+    OracleRouting(network).update()
+    router = network.routers[1]
+    forwarding_table = router.forwarding_table
+    # The same next hops at slightly different costs
+    costs = {}
+    for destination, (link, cost) in list(router.routing_table.items()):
+        if isinstance(destination, Router):
+            costs[destination] = cost + 1e-9
+            router.next_routing_table[destination] = [link, cost + 1e-9]
+    assert not router.update_routing_table(network.hosts.values())
+    assert router.forwarding_table is forwarding_table
+    for destination, cost in costs.items():
+        assert router.routing_table[destination][1] == cost
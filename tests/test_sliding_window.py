@@ -0,0 +1,39 @@
+from sliding_window import SenderWindow, ReceiverWindow
+
+
+def test_sender_window_acknowledges_in_order():
+    window = SenderWindow()
+    for packet_no in range(1, 6):
+        window.append(packet_no, packet_no * 0.1)
+    assert len(window) == 5
+    assert window.acknowledge(3) == 2
+    assert window.first_packet() == 3
+    assert window.first_send_time() == 0.30000000000000004
+    # Old and duplicate ACKs remove nothing
+    assert window.acknowledge(2) == 0
+    assert window.acknowledge(10) == 3
+    assert len(window) == 0
+
+
+def test_sender_window_restarts_after_clear():
+    window = SenderWindow()
+    window.append(1, 0.0)
+    window.append(2, 0.1)
+    window.clear()
+    window.append(2, 0.5)
+    assert window.first_packet() == 2
+    assert window.first_send_time() == 0.5
+
+
+def test_receiver_window_fills_gaps():
+    window = ReceiverWindow()
+    assert window.receive(1) == 2
+    assert window.receive(3) == 2
+    assert window.receive(4) == 2
+    assert 3 in window and 2 not in window
+    assert window.receive(2) == 5
+    assert 1 in window and 4 in window and 5 not in window
+    # The bitmap is released once everything arrived in order
+    assert len(window.received) == 0
+    # Duplicates change nothing
+    assert window.receive(3) == 5
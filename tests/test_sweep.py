@@ -0,0 +1,72 @@
+import os
+import json
+import pytest
+from sweep import sweep_points, apply_point, config_hash, run_sweep
+from helpers import ROOT
+
+
+def load(name):
+    with open(os.path.join(ROOT, name)) as f:
+        return json.load(f)
+
+
+def test_grid_runs_every_combination():
+    spec = {"parameters": {"protocol": ["FAST", "RENO"],
+                           "buff_size": [32, 64, 128]}}
+    points = list(sweep_points(spec))
+    assert len(points) == 6
+    assert {"buff_size": 128, "protocol": "RENO"} in points
+
+
+def test_grid_needs_lists():
+    spec = {"mode": "grid", "parameters": {"alpha": {"min": 5, "max": 50}}}
+    with pytest.raises(ValueError, match="alpha"):
+        sweep_points(spec)
+
+
+def test_random_points_are_seeded_and_in_range():
+    spec = {"mode": "random", "samples": 5, "seed": 3,
+            "parameters": {"alpha": {"min": 5, "max": 50},
+                           "buff_size": {"min": 1, "max": 4, "integer": True},
+                           "protocol": ["FAST", "RENO"]}}
+    points = list(sweep_points(spec))
+    assert points == list(sweep_points(spec))
+    for point in points:
+        assert 5 <= point["alpha"] <= 50
+        assert point["buff_size"] in (1, 2, 3, 4)
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError, match="colour"):
+        sweep_points({"parameters": {"colour": ["red"]}})
+
+
+def test_apply_point_matches_ids_as_numbers_or_strings():
+    base = load("test1.json")
+    for link_ids in (["1"], [1]):
+        config = apply_point(base, {"buff_size": 1}, link_ids)
+        changed = [link["id"] for link in config["links"]
+                   if link["buff_size"] == 1]
+        assert [str(link_id) for link_id in changed] == ["1"]
+    # The base scenario is left alone
+    assert base == load("test1.json")
+
+
+def test_equal_configs_share_a_hash():
+    base = load("test0.json")
+    first = apply_point(base, {"window": 10})
+    second = dict(reversed(list(apply_point(base, {"window": 10}).items())))
+    assert config_hash(first) == config_hash(second)
+    assert config_hash(first) != config_hash(apply_point(base, {"window": 5}))
+    assert config_hash(first) != config_hash(first, event_driven=True)
+
+
+def test_results_are_cached(tmp_path):
+    spec = {"base": os.path.join(ROOT, "test0.json"),
+            "parameters": {"window": [10]}}
+    cache_dir = str(tmp_path / "cache")
+    first = run_sweep(spec, workers=1, cache_dir=cache_dir)
+    second = run_sweep(spec, workers=1, cache_dir=cache_dir)
+    assert first[0]["ok"] and not first[0]["cached"]
+    assert second[0]["cached"]
+    assert second[0]["summary"]["end_time"] == first[0]["summary"]["end_time"]
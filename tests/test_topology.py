@@ -0,0 +1,93 @@
+import copy
+import pytest
+from network import Network
+from topology import load_topology, TopologyError, HOST, ROUTER
+
+
+def link(link_id, source, sink, **fields):
+    spec = {"id": str(link_id), "link_rate": "10", "prop_delay": "10",
+            "buff_size": "64", "source": source, "sink": sink}
+    spec.update(fields)
+    return spec
+
+
+def scenario():
+    '''
+    Two hosts on either side of a line of three routers, with ids past 9
+    '''
+    return {
+        "hosts": [{"id": "1", "ip": "H1"}, {"id": "12", "ip": "H12"}],
+        "routers": [{"id": "10", "ip": "R10"}, {"id": "11", "ip": "R11"},
+                    {"id": "2", "ip": "10.0.0.2"}],
+        "links": [link(0, "H1", "R10"), link(1, "R10", "R11"),
+                  link(2, "R11", "10.0.0.2"), link(3, "R2", "H12")],
+        "flows": [{"id": "1", "source": "1", "dest": "12",
+                   "data_amount": "1", "start_time": "1", "window": "1",
+                   "protocol": "FAST"}]
+    }
+
+
+def test_links_are_numbered_in_both_directions():
+    topology = load_topology(scenario())
+    assert topology.num_nodes == 5
+    assert topology.node_kinds.tolist() == [HOST, HOST, ROUTER, ROUTER,
+                                            ROUTER]
+    assert topology.link_ids == [0, 4, 1, 5, 2, 6, 3, 7]
+    assert topology.link_src.tolist() == [0, 2, 2, 3, 3, 4, 4, 1]
+    assert topology.link_dst.tolist() == [2, 0, 3, 2, 4, 3, 1, 4]
+    assert topology.link_reverse.tolist() == [1, 0, 3, 2, 5, 4, 7, 6]
+    # The links out of router R11, in compressed sparse row form
+    offsets = topology.out_offsets.tolist()
+    assert topology.out_links.tolist()[offsets[3]:offsets[4]] == [3, 4]
+
+
+def test_build_wires_the_network():
+    network = Network()
+    load_topology(scenario()).build(network)
+    assert sorted(network.routers) == [2, 10, 11]
+    host = network.hosts[12]
+    assert host.router is network.routers[2]
+    assert host.outgoing_link.connection2 is network.routers[2]
+    assert host.incoming_link is host.outgoing_link.reverse
+    for _, each in network.links.items():
+        assert each.reverse.reverse is each
+        assert each.reverse.connection1 is each.connection2
+    assert network.flows[1].destination is host
+
+
+def check_rejected(change, message):
+    net_data = scenario()
+    change(net_data)
+    with pytest.raises(TopologyError, match=message):
+        load_topology(net_data)
+
+
+def test_duplicate_nodes_links_and_flows():
+    check_rejected(lambda d: d["routers"].append({"id": "10", "ip": "x"}),
+                   "Duplicate node id: R10")
+    check_rejected(lambda d: d["routers"].append({"id": "3", "ip": "R11"}),
+                   "Duplicate node ip")
+    check_rejected(lambda d: d["links"].append(link(1, "R10", "10.0.0.2")),
+                   "Duplicate link ids")
+    check_rejected(lambda d: d["links"].append(link(9, "R11", "R10")),
+                   "Duplicate link between")
+    check_rejected(lambda d: d["flows"].append(copy.deepcopy(d["flows"][0])),
+                   "Duplicate flow id")
+
+
+def test_bad_links():
+    check_rejected(lambda d: d["links"].append(link(9, "R10", "R10")),
+                   "is a loop")
+    check_rejected(lambda d: d["links"].append(link(9, "H1", "R11")),
+                   "more than one link")
+    check_rejected(lambda d: d["links"].append(link(9, "R10", "R7")),
+                   "unknown node R7")
+    check_rejected(lambda d: d["links"][1].update(queue="fifo"),
+                   "unknown queue discipline fifo")
+
+
+def test_dangling_flows_and_disconnected_nodes():
+    check_rejected(lambda d: d["flows"][0].update(dest="3"),
+                   "unknown host 3")
+    check_rejected(lambda d: d["routers"].append({"id": "4", "ip": "R4"}),
+                   "R4 is not connected")
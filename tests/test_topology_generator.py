@@ -0,0 +1,78 @@
+import io
+import json
+import random
+import pytest
+import topology_generator as generator
+from topology import load_topology
+
+
+def generate(topology, **options):
+    f = io.StringIO()
+    generator.write_scenario(f, topology, **options)
+    return json.loads(f.getvalue())
+
+
+@pytest.mark.parametrize("topology, num_hosts, num_routers, num_links", [
+    (lambda: generator.dumbbell(3), 6, 2, 7),
+    (lambda: generator.ring(5, 2), 10, 5, 15),
+    (lambda: generator.grid(3, 4), 12, 12, 29),
+    # 16 core to aggregation, 16 aggregation to edge and 16 host links
+    (lambda: generator.fat_tree(4), 16, 20, 48),
+])
+def test_regular_topologies(topology, num_hosts, num_routers, num_links):
+    net_data = generate(topology(), num_flows=4, seed=1)
+    assert len(net_data["hosts"]) == num_hosts
+    assert len(net_data["routers"]) == num_routers
+    assert len(net_data["links"]) == num_links
+    assert len(net_data["flows"]) == 4
+    # Every generated scenario is a valid, connected network
+    load_topology(net_data)
+
+
+def test_random_topologies_are_connected_and_seeded():
+    for make in (lambda rng: generator.waxman(40, rng=rng),
+                 lambda rng: generator.barabasi_albert(40, m=2, rng=rng)):
+        first = generate(make(random.Random(7)), num_flows=5, seed=7)
+        second = generate(make(random.Random(7)), num_flows=5, seed=7)
+        assert first == second
+        topology = load_topology(first)
+        assert topology.num_nodes == 80
+
+
+def test_barabasi_albert_degrees():
+    _, _, links = generator.barabasi_albert(50, m=3, hosts_per_router=0,
+                                            rng=random.Random(2))
+    links = list(links)
+    # A clique of m + 1 routers, then m links for every other router
+    assert len(links) == 6 + 3 * 46
+    assert len(set(tuple(sorted(pair)) for pair in links)) == len(links)
+
+
+def test_distributions():
+    rng = random.Random(3)
+    assert generator.parse_distribution("2.5")(rng) == 2.5
+    assert 1 <= generator.parse_distribution("uniform:1:2")(rng) <= 2
+    assert generator.parse_distribution("choice:4,8")(rng) in (4, 8)
+    assert generator.parse_distribution("exponential:3")(rng) > 0
+    with pytest.raises(ValueError, match="normal"):
+        generator.parse_distribution("normal:1:2")
+
+
+def test_fields_and_extra():
+    net_data = generate(generator.dumbbell(2), num_flows=3, rate="12.5",
+                        protocols=("RENO",), seed=4,
+                        extra={"routing": "oracle"})
+    assert net_data["routing"] == "oracle"
+    assert all(link["link_rate"] == "12.5" for link in net_data["links"])
+    for flow in net_data["flows"]:
+        assert flow["protocol"] == "RENO"
+        assert flow["source"] != flow["dest"]
+
+
+def test_bad_parameters():
+    with pytest.raises(ValueError):
+        generator.fat_tree(3)
+    with pytest.raises(ValueError):
+        generator.ring(2)
+    with pytest.raises(ValueError):
+        generator.barabasi_albert(2, m=2)
@@ -0,0 +1,312 @@
+from collections import deque
+import numpy as np
+from queue_discipline import create_queue_discipline, QUEUE_DISCIPLINES
+from congestion_control import CONGESTION_CONTROLS
+from utils import MB, KB, Mb
+
+# Node kinds in Topology.node_kinds
+HOST = 0
+ROUTER = 1
+
+
+class TopologyError(ValueError):
+    '''
+    Raised when a scenario does not describe a valid network
+    '''
+    pass
+
+
+def convert_to_bits(num, units):
+    if units == MB:
+        return num * 8e6
+    if units == KB:
+        return num * 8e3
+    if units == Mb:
+        return num * 1e6
+
+# Converts a number in ms to s
+def convert_to_seconds(ms):
+    return ms * 0.001
+
+def parse_id(value):
+    '''
+    Ids are kept as integers when they look like integers, so that the ids
+    of the bundled scenarios stay the same, and as strings otherwise
+    '''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class Topology:
+    '''
+    The hosts, routers and links of a scenario, checked and numbered. Every
+    node (hosts first, then routers) and every directed link gets an
+    integer index, and the links out of each node are stored as compact
+    arrays in compressed sparse row form:
+
+        the links out of node n are out_links[out_offsets[n]:out_offsets[n + 1]]
+
+    Each link of the scenario becomes two directed links, created one after
+    the other. The second one goes in the opposite direction and gets the
+    next id after the highest link id in the scenario.
+    '''
+
+    def __init__(self, net_data):
+        # The scenario that this topology was loaded from
+        self.net_data = net_data
+
+        # The id, ip and kind (HOST or ROUTER) of every node, by index
+        self.node_ids = []
+        self.node_ips = []
+        self.node_kinds = None
+
+        # Maps the names that links may use for a node to its index. A node
+        # can be named by its ip, or by "H" or "R" followed by its id
+        self.node_index = {}
+
+        # The id of every directed link and the JSON link it comes from
+        self.link_ids = []
+        self.link_specs = []
+
+        # The source, destination and reverse link of every directed link
+        self.link_src = None
+        self.link_dst = None
+        self.link_reverse = None
+
+        # The links out of every node, see the class docstring
+        self.out_offsets = None
+        self.out_links = None
+
+        # The host or router object of every node and the Link object of
+        # every directed link, by index. Set by build
+        self.nodes = []
+        self.links = []
+
+        self.load_nodes()
+        self.load_links()
+        self.check_flows()
+        self.check_connected()
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_links(self):
+        return len(self.link_ids)
+
+    def load_nodes(self):
+        kinds = []
+        seen = set()
+        for kind, prefix, specs in ((HOST, "H", self.net_data["hosts"]),
+                                    (ROUTER, "R", self.net_data["routers"])):
+            for spec in specs:
+                if (prefix, str(spec["id"])) in seen:
+                    raise TopologyError("Duplicate node id: " + prefix +
+                                        str(spec["id"]))
+                seen.add((prefix, str(spec["id"])))
+                ip = str(spec["ip"])
+                if ip in self.node_index:
+                    raise TopologyError("Duplicate node ip: " + ip)
+                self.node_index[ip] = len(self.node_ids)
+                self.node_ids.append(parse_id(spec["id"]))
+                self.node_ips.append(ip)
+                kinds.append(kind)
+        self.node_kinds = np.array(kinds, dtype=np.int8)
+
+        # Links can also name a node by its kind and id, unless that is the
+        # ip of another node
+        for index, kind in enumerate(kinds):
+            prefix = "H" if kind == HOST else "R"
+            self.node_index.setdefault(prefix + str(self.node_ids[index]),
+                                       index)
+
+    def find_node(self, name, link_id):
+        index = self.node_index.get(str(name))
+        if index is None:
+            raise TopologyError("Link " + str(link_id) +
+                                " refers to unknown node " + str(name))
+        return index
+
+    def load_links(self):
+        links = self.net_data["links"]
+        if not links:
+            raise TopologyError("The scenario has no links")
+        ids = [parse_id(link["id"]) for link in links]
+        if len(set(ids)) != len(ids):
+            raise TopologyError("Duplicate link ids")
+        for link_id in ids:
+            if not isinstance(link_id, int):
+                raise TopologyError("Link ids must be integers: " + link_id)
+
+        num_links = 2 * len(links)
+        src = np.empty(num_links, dtype=np.int32)
+        dst = np.empty(num_links, dtype=np.int32)
+        reverse = np.empty(num_links, dtype=np.int32)
+        endpoints = set()
+        kinds = self.node_kinds.tolist()
+        num_host_links = [0] * self.num_nodes
+
+        # The links going the opposite direction get the ids after this
+        highest_link_id = max(ids)
+        for i, link in enumerate(links):
+            a = self.find_node(link["source"], ids[i])
+            b = self.find_node(link["sink"], ids[i])
+            if a == b:
+                raise TopologyError("Link " + str(ids[i]) + " is a loop")
+            if str(link.get("queue", "DropTail")).upper() not in \
+                    QUEUE_DISCIPLINES:
+                raise TopologyError("Link " + str(ids[i]) +
+                                    " has unknown queue discipline " +
+                                    str(link["queue"]))
+            pair = (min(a, b), max(a, b))
+            if pair in endpoints:
+                raise TopologyError("Duplicate link between " +
+                                    self.node_ips[a] + " and " +
+                                    self.node_ips[b])
+            endpoints.add(pair)
+            for node in (a, b):
+                if kinds[node] == HOST:
+                    num_host_links[node] += 1
+                    if num_host_links[node] > 1:
+                        raise TopologyError("Host " + self.node_ips[node] +
+                                            " has more than one link")
+
+            highest_link_id += 1
+            self.link_ids.append(ids[i])
+            self.link_ids.append(highest_link_id)
+            self.link_specs.append(link)
+            self.link_specs.append(link)
+            src[2 * i], dst[2 * i] = a, b
+            src[2 * i + 1], dst[2 * i + 1] = b, a
+            reverse[2 * i], reverse[2 * i + 1] = 2 * i + 1, 2 * i
+
+        self.link_src = src
+        self.link_dst = dst
+        self.link_reverse = reverse
+
+        order = np.argsort(src, kind="stable")
+        self.out_links = order.astype(np.int32)
+        self.out_offsets = np.zeros(self.num_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=self.num_nodes),
+                  out=self.out_offsets[1:])
+
+    def check_flows(self):
+        hosts = set(str(spec["id"]) for spec in self.net_data["hosts"])
+        ids = set()
+        for flow in self.net_data["flows"]:
+            if str(flow["id"]) in ids:
+                raise TopologyError("Duplicate flow id: " + str(flow["id"]))
+            ids.add(str(flow["id"]))
+            for end in ("source", "dest"):
+                if str(flow[end]) not in hosts:
+                    raise TopologyError("Flow " + str(flow["id"]) +
+                                        " refers to unknown host " +
+                                        str(flow[end]))
+            if str(flow["protocol"]).upper() not in CONGESTION_CONTROLS:
+                raise TopologyError("Flow " + str(flow["id"]) +
+                                    " has unknown protocol " +
+                                    str(flow["protocol"]))
+
+    def check_connected(self):
+        '''
+        Every node must be reachable from every other one
+        '''
+        offsets = self.out_offsets.tolist()
+        out_links = self.out_links.tolist()
+        dst = self.link_dst.tolist()
+        seen = bytearray(self.num_nodes)
+        seen[0] = 1
+        todo = deque([0])
+        while todo:
+            node = todo.popleft()
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbor = dst[out_links[i]]
+                if not seen[neighbor]:
+                    seen[neighbor] = 1
+                    todo.append(neighbor)
+        if 0 in seen:
+            raise TopologyError("Node " + self.node_ips[seen.index(0)] +
+                                " is not connected to the rest of the network")
+
+    def build(self, network):
+        '''
+        Create the hosts, routers, flows and links in network and wire them
+        together
+        '''
+        net_data = self.net_data
+        kinds = self.node_kinds.tolist()
+        nodes = []
+        for index in range(self.num_nodes):
+            if kinds[index] == HOST:
+                nodes.append(network.create_host(self.node_ips[index],
+                                                 self.node_ids[index]))
+            else:
+                nodes.append(network.create_router(self.node_ips[index],
+                                                   self.node_ids[index]))
+
+        for flow in net_data["flows"]:
+            src = network.hosts[parse_id(flow["source"])]
+            dest = network.hosts[parse_id(flow["dest"])]
+            new_flow = network.create_flow(
+                convert_to_bits(float(flow["data_amount"]), MB),
+                src, dest,
+                float(flow["start_time"]),
+                float(flow["window"]),
+                flow["protocol"],
+                parse_id(flow["id"]))
+            # The FAST parameters can be overridden per flow
+            if "alpha" in flow:
+                new_flow.alpha = float(flow["alpha"])
+            if "gamma" in flow:
+                new_flow.gamma = float(flow["gamma"])
+            if "th" in flow:
+                new_flow.th = float(flow["th"])
+            src.flows.append(new_flow)
+
+        has_routers = len(net_data["routers"]) > 0
+        src_list = self.link_src.tolist()
+        dst_list = self.link_dst.tolist()
+        links = []
+        for index in range(self.num_links):
+            spec = self.link_specs[index]
+            src = nodes[src_list[index]]
+            sink = nodes[dst_list[index]]
+            # The queue discipline of the link buffers is drop tail unless
+            # the link has a "queue" field. Each direction gets its own state
+            link = network.create_link(src, sink, \
+                convert_to_bits(float(spec["buff_size"]), KB), \
+                convert_to_bits(float(spec["link_rate"]), Mb), \
+                convert_to_seconds(float(spec["prop_delay"])), \
+                self.link_ids[index], \
+                create_queue_discipline(spec.get("queue", "DropTail")))
+            links.append(link)
+
+            if kinds[src_list[index]] == HOST:
+                src.outgoing_link = link
+                if has_routers:
+                    src.router = sink
+            else:
+                src.outgoing_links.append(link)
+                src.neighbors.append(sink)
+            if kinds[dst_list[index]] == HOST:
+                sink.incoming_link = link
+            else:
+                sink.incoming_links.append(link)
+
+        reverse = self.link_reverse.tolist()
+        for index, link in enumerate(links):
+            link.reverse = links[reverse[index]]
+        self.nodes = nodes
+        self.links = links
+        network.topology = self
+
+
+def load_topology(net_data):
+    '''
+    Check and number the topology of a scenario loaded from JSON. Raises
+    TopologyError if the scenario is not a valid network.
+    '''
+    return Topology(net_data)
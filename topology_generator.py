@@ -0,0 +1,319 @@
+import sys
+import math
+import json
+import random
+import argparse
+
+# Writes scenario JSON for large synthetic topologies, in the same schema as
+# the bundled scenarios. Nodes, links and flows are generated one at a time
+# and written as they are generated, so only what a topology needs to stay
+# consistent (node degrees, positions, ...) is ever kept in memory.
+#
+# Each topology function returns (number of hosts, number of routers, links)
+# where links is an iterator of (source, sink) node names. Hosts are named
+# H1..Hn and routers R1..Rn.
+
+
+def host(i):
+    return "H" + str(i)
+
+def router(i):
+    return "R" + str(i)
+
+
+def parse_distribution(spec):
+    '''
+    Returns a function that draws a value with a random.Random. spec is a
+    number, "uniform:LOW:HIGH", "choice:A,B,C" or "exponential:MEAN"
+    '''
+    spec = str(spec)
+    if ":" not in spec:
+        value = float(spec)
+        return lambda rng: value
+    kind, args = spec.split(":", 1)
+    if kind == "uniform":
+        low, high = (float(x) for x in args.split(":"))
+        return lambda rng: rng.uniform(low, high)
+    if kind == "choice":
+        values = [float(x) for x in args.split(",")]
+        return lambda rng: rng.choice(values)
+    if kind == "exponential":
+        mean = float(args)
+        return lambda rng: rng.expovariate(1 / mean)
+    raise ValueError("Unknown distribution: " + spec)
+
+
+def attach_hosts(num_routers, hosts_per_router):
+    '''
+    Attach hosts_per_router hosts to each router in turn
+    '''
+    num = 1
+    for r in range(1, num_routers + 1):
+        for _ in range(hosts_per_router):
+            yield host(num), router(r)
+            num += 1
+
+
+def dumbbell(hosts_per_side):
+    '''
+    Two routers joined by a single bottleneck link, with hosts_per_side
+    hosts on each of them
+    '''
+    def links():
+        yield router(1), router(2)
+        for i in range(1, hosts_per_side + 1):
+            yield host(i), router(1)
+            yield host(hosts_per_side + i), router(2)
+    return 2 * hosts_per_side, 2, links()
+
+
+def ring(num_routers, hosts_per_router=1):
+    def links():
+        for r in range(1, num_routers + 1):
+            yield router(r), router(r % num_routers + 1)
+        yield from attach_hosts(num_routers, hosts_per_router)
+    if num_routers < 3:
+        raise ValueError("A ring needs at least 3 routers")
+    return num_routers * hosts_per_router, num_routers, links()
+
+
+def grid(rows, cols, hosts_per_router=1):
+    def links():
+        for row in range(rows):
+            for col in range(cols):
+                r = row * cols + col + 1
+                if col + 1 < cols:
+                    yield router(r), router(r + 1)
+                if row + 1 < rows:
+                    yield router(r), router(r + cols)
+        yield from attach_hosts(rows * cols, hosts_per_router)
+    return rows * cols * hosts_per_router, rows * cols, links()
+
+
+def fat_tree(k):
+    '''
+    A k-ary fat tree: (k/2)^2 core routers and k pods of k/2 aggregation
+    and k/2 edge routers, with k/2 hosts on every edge router
+    '''
+    if k < 2 or k % 2:
+        raise ValueError("k must be even")
+    half = k // 2
+    num_core = half * half
+    # Routers are numbered core first, then pod by pod aggregation and edge
+    def aggregation(pod, i):
+        return router(num_core + pod * k + i + 1)
+    def edge(pod, i):
+        return router(num_core + pod * k + half + i + 1)
+
+    def links():
+        for pod in range(k):
+            for i in range(half):
+                # Aggregation router i of every pod connects to the core
+                # routers i * half .. (i + 1) * half - 1
+                for j in range(half):
+                    yield aggregation(pod, i), router(i * half + j + 1)
+                for j in range(half):
+                    yield edge(pod, j), aggregation(pod, i)
+        num = 1
+        for pod in range(k):
+            for i in range(half):
+                for _ in range(half):
+                    yield host(num), edge(pod, i)
+                    num += 1
+    return k * half * half, num_core + k * k, links()
+
+
+def waxman(num_routers, alpha=0.4, beta=0.1, hosts_per_router=1, rng=None):
+    '''
+    Routers are placed uniformly in the unit square and each pair is linked
+    with probability alpha * exp(-d / (beta * L)), where d is their distance
+    and L the largest possible distance. A random spanning tree is added
+    first so that the network is always connected.
+    '''
+    rng = rng or random.Random()
+    xs = [rng.random() for _ in range(num_routers)]
+    ys = [rng.random() for _ in range(num_routers)]
+    # Each router after the first hangs off a random earlier router
+    parents = [-1] + [rng.randrange(i) for i in range(1, num_routers)]
+    scale = beta * math.sqrt(2)
+
+    def links():
+        for i in range(1, num_routers):
+            yield router(i + 1), router(parents[i] + 1)
+        for i in range(num_routers):
+            for j in range(i + 1, num_routers):
+                if parents[j] == i:
+                    continue
+                d = math.hypot(xs[i] - xs[j], ys[i] - ys[j])
+                if rng.random() < alpha * math.exp(-d / scale):
+                    yield router(i + 1), router(j + 1)
+        yield from attach_hosts(num_routers, hosts_per_router)
+    return num_routers * hosts_per_router, num_routers, links()
+
+
+def barabasi_albert(num_routers, m=2, hosts_per_router=1, rng=None):
+    '''
+    Preferential attachment: every new router links to m distinct existing
+    routers, chosen with probability proportional to their degree
+    '''
+    rng = rng or random.Random()
+    if num_routers <= m:
+        raise ValueError("Need more routers than m")
+
+    def links():
+        # Every router appears here once per link end, so picking a random
+        # entry picks a router proportionally to its degree
+        ends = []
+        # Start from a clique of m + 1 routers
+        for i in range(1, m + 2):
+            for j in range(i + 1, m + 2):
+                yield router(i), router(j)
+                ends.extend((i, j))
+        for new in range(m + 2, num_routers + 1):
+            targets = set()
+            while len(targets) < m:
+                targets.add(rng.choice(ends))
+            for target in sorted(targets):
+                yield router(new), router(target)
+                ends.extend((new, target))
+        yield from attach_hosts(num_routers, hosts_per_router)
+    return num_routers * hosts_per_router, num_routers, links()
+
+
+def write_array(f, name, items, first=False):
+    '''
+    Write "name": [items...] one item at a time
+    '''
+    if not first:
+        f.write(",\n")
+    f.write('    "' + name + '": [')
+    sep = "\n"
+    for item in items:
+        f.write(sep + "        " + json.dumps(item))
+        sep = ",\n"
+    f.write("\n    ]")
+
+
+def write_scenario(f, topology, num_flows=1, rate="10", delay="10",
+                   buffer="64", data="uniform:1:20", start="uniform:1:5",
+                   window="1", protocols=("FAST",), seed=None, extra=None):
+    '''
+    Write a scenario for topology, as returned by one of the topology
+    functions, to the file f. rate (Mbps), delay (ms), buffer (KB), data
+    (MB), start (s) and window are distributions, see parse_distribution.
+    extra holds more top level fields, like "routing".
+    '''
+    rng = random.Random(seed)
+    num_hosts, num_routers, links = topology
+    if num_flows and num_hosts < 2:
+        raise ValueError("Flows need at least two hosts")
+    rate = parse_distribution(rate)
+    delay = parse_distribution(delay)
+    buffer = parse_distribution(buffer)
+    data = parse_distribution(data)
+    start = parse_distribution(start)
+    window = parse_distribution(window)
+
+    def hosts():
+        for i in range(1, num_hosts + 1):
+            yield {"id": str(i), "ip": host(i)}
+
+    def routers():
+        for i in range(1, num_routers + 1):
+            yield {"id": str(i), "ip": router(i)}
+
+    def link_specs():
+        for link_id, (source, sink) in enumerate(links, 1):
+            yield {
+                "id": str(link_id),
+                "link_rate": "%g" % rate(rng),
+                "prop_delay": "%g" % delay(rng),
+                "buff_size": "%g" % buffer(rng),
+                "source": source,
+                "sink": sink
+            }
+
+    def flows():
+        for flow_id in range(1, num_flows + 1):
+            source, dest = rng.sample(range(1, num_hosts + 1), 2)
+            yield {
+                "id": str(flow_id),
+                "data_amount": "%g" % data(rng),
+                "start_time": "%g" % start(rng),
+                "source": str(source),
+                "dest": str(dest),
+                "window": "%g" % window(rng),
+                "protocol": rng.choice(protocols)
+            }
+
+    f.write("{\n")
+    write_array(f, "hosts", hosts(), first=True)
+    write_array(f, "routers", routers())
+    write_array(f, "links", link_specs())
+    write_array(f, "flows", flows())
+    for name, value in (extra or {}).items():
+        f.write(',\n    "' + name + '": ' + json.dumps(value))
+    f.write("\n}\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Generate a large synthetic scenario")
+    parser.add_argument("topology", choices=["dumbbell", "ring", "grid",
+                                             "fat_tree", "waxman", "barabasi"])
+    parser.add_argument("-n", type=int, default=16,
+                        help="routers (ring, waxman, barabasi), hosts per "
+                             "side (dumbbell), rows (grid) or k (fat_tree)")
+    parser.add_argument("--cols", type=int, default=None,
+                        help="grid columns, default the same as -n")
+    parser.add_argument("--hosts-per-router", type=int, default=1)
+    parser.add_argument("--m", type=int, default=2,
+                        help="links added per router (barabasi)")
+    parser.add_argument("--alpha", type=float, default=0.4, help="waxman alpha")
+    parser.add_argument("--beta", type=float, default=0.1, help="waxman beta")
+    parser.add_argument("--flows", type=int, default=1)
+    parser.add_argument("--rate", default="10", help="link rate in Mbps")
+    parser.add_argument("--delay", default="10", help="propagation delay in ms")
+    parser.add_argument("--buffer", default="64", help="buffer size in KB")
+    parser.add_argument("--data", default="uniform:1:20", help="flow size in MB")
+    parser.add_argument("--start", default="uniform:1:5",
+                        help="flow start time in s. Packets sent before the "
+                             "first routing flood has converged have no "
+                             "route, so leave some time or use oracle "
+                             "routing")
+    parser.add_argument("--window", default="1", help="initial window")
+    parser.add_argument("--protocols", default="FAST",
+                        help='comma separated, e.g. "FAST,RENO"')
+    parser.add_argument("--routing", choices=["distance_vector", "oracle"],
+                        default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-o", "--output", help="output file, default stdout")
+    args = parser.parse_args()
+
+    # The topology and the parameters have their own streams, so the same
+    # seed gives the same topology whatever the other options are
+    topology_rng = random.Random(args.seed)
+    if args.topology == "dumbbell":
+        topology = dumbbell(args.n)
+    elif args.topology == "ring":
+        topology = ring(args.n, args.hosts_per_router)
+    elif args.topology == "grid":
+        topology = grid(args.n, args.cols or args.n, args.hosts_per_router)
+    elif args.topology == "fat_tree":
+        topology = fat_tree(args.n)
+    elif args.topology == "waxman":
+        topology = waxman(args.n, args.alpha, args.beta,
+                          args.hosts_per_router, topology_rng)
+    else:
+        topology = barabasi_albert(args.n, args.m, args.hosts_per_router,
+                                   topology_rng)
+
+    extra = {"routing": args.routing} if args.routing else None
+    f = open(args.output, "w") if args.output else sys.stdout
+    try:
+        write_scenario(f, topology, args.flows, args.rate, args.delay,
+                       args.buffer, args.data, args.start, args.window,
+                       args.protocols.split(","), args.seed, extra)
+    finally:
+        if f is not sys.stdout:
+            f.close()
@@ -19,9 +19,31 @@ PACKET_SIZE = 1024 * 8
 ACK_SIZE = 64 * 8
 MESSAGE_SIZE = 32 * 8
 
+# Maximum number of released packets that the network keeps for reuse
+MAX_PACKET_POOL_SIZE = 100000
+
+# Default routing epochs, in number of timesteps. Messages are flooded every
+# ROUTING_PERIOD timesteps and the routing tables are rebuilt ROUTING_SETTLE
+# timesteps after the flood. Scenarios can give the epochs in seconds
+# instead with the "routing_period" and "routing_settle" fields
+ROUTING_PERIOD = 220000
+ROUTING_SETTLE = 30000
+
+# The stepped engine only runs the links that are due, instead of all of
+# them at every timestep, when there are at least this many links. Below
+# that, finding the due links costs more than running them all
+MIN_VECTORIZED_LINKS = 24
+
+# Default number of simulated seconds between samples of the graphing logs
+LINK_SAMPLE_INTERVAL = 0.2
+WINDOW_SAMPLE_INTERVAL = 0.02
+FLOW_RATE_SAMPLE_INTERVAL = 0.1
+
 INDIV_SERIES = 1
 INDIV_GRAPHS = 1
 GRAPHS_TOGETHER = 1
 PLOT_PARALLEL = 1
 TEST_2_DIRECTION = 1
-ISOLATE_LINKS = 1
\ No newline at end of file
+ISOLATE_LINKS = 1
+# Series with more points than this are downsampled before they are plotted
+MAX_PLOT_POINTS = 2000